@@ -0,0 +1,65 @@
+"""
+Benchmark: DataCleaner table cleaning, per-cell clean_text vs. batch clean_cells.
+
+Запуск из каталога сервиса:
+    python benchmarks/bench_data_cleaner.py
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.data_cleaner import DataCleaner
+
+ROWS = 100000
+COLUMNS = 10
+
+
+def make_table(rows: int, columns: int, seed: int = 42):
+    """Синтетическая таблица: числа, короткие строки, даты, редкие "грязные" ячейки."""
+    rng = random.Random(seed)
+    words = ['Москва', 'поставка', 'договор', 'оплачено', 'Invoice', 'pending', 'ООО «Ромашка»']
+    
+    def cell():
+        kind = rng.random()
+        if kind < 0.3:
+            return str(rng.randint(0, 10 ** 6))
+        if kind < 0.5:
+            return f"{rng.randint(1, 28):02d}.{rng.randint(1, 12):02d}.2024"
+        if kind < 0.95:
+            return ' '.join(rng.choices(words, k=rng.randint(1, 3)))
+        if kind < 0.99:
+            return f"  {rng.choice(words)}  \n{rng.choice(words).lower()} "
+        return None
+    
+    return [[cell() for _ in range(columns)] for _ in range(rows)]
+
+
+def main():
+    cleaner = DataCleaner()
+    table = make_table(ROWS, COLUMNS)
+    
+    start = time.perf_counter()
+    per_cell = [
+        ['' if c is None else cleaner.clean_text(c) if isinstance(c, str) else str(c) for c in row]
+        for row in table
+    ]
+    per_cell_time = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    batch = cleaner.clean_table_data(table)
+    batch_time = time.perf_counter() - start
+    
+    assert batch == [row for row in per_cell if any(c.strip() for c in row)]
+    
+    cells = ROWS * COLUMNS
+    print(f"cells: {cells}")
+    print(f"per-cell clean_text: {per_cell_time:.2f} s ({cells / per_cell_time:,.0f} cells/s)")
+    print(f"clean_table_data:    {batch_time:.2f} s ({cells / batch_time:,.0f} cells/s)")
+
+
+if __name__ == '__main__':
+    main()
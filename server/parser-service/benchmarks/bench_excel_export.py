@@ -0,0 +1,104 @@
+"""
+Benchmark: ExcelExporter - рабочая книга в памяти (in_memory) и построчная запись (constant_memory).
+
+Экспортируется результат парсинга CSV на ROWS строк (CSVParser). Каждый режим
+выполняется в дочернем процессе (fork после парсинга); измеряется время экспорта
+и пик памяти сверх уже занятой результатом парсинга.
+
+Запуск из каталога сервиса (Linux, нужен /proc):
+    python benchmarks/bench_excel_export.py [строк]
+"""
+
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ROWS = 1_000_000
+
+
+def memory_mb(field: str) -> float:
+    """Значение из /proc/self/status (VmRSS, VmHWM), МБ."""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def make_csv(file_path: str, rows: int, seed: int = 42) -> None:
+    """CSV с заголовком: номер, наименование, количество, цена, дата."""
+    rng = random.Random(seed)
+    with open(file_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['id', 'name', 'quantity', 'price', 'date'])
+        for i in range(rows):
+            writer.writerow([
+                i, f'Товар {rng.randint(1, 10000)}', rng.randint(1, 100),
+                f'{rng.random() * 1000:.2f}', f'2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+            ])
+
+
+def export(result: dict, constant_memory: bool, tmpdir: str) -> dict:
+    """Экспорт в файл в дочернем процессе: время, пик памяти сверх текущей, размер файла."""
+    import openpyxl
+    from exporters.excel_exporter import ExcelExporter
+    
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        # Сброс пика RSS (VmHWM) до текущего значения
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        rss = memory_mb('VmRSS')
+        
+        file_path = os.path.join(tmpdir, f'export-{constant_memory}.xlsx')
+        start = time.perf_counter()
+        ExcelExporter().export_to_file(result, file_path, {'constant_memory': constant_memory})
+        report = {
+            'time': time.perf_counter() - start,
+            'peak': memory_mb('VmHWM') - rss,
+            'size': os.path.getsize(file_path) / (1024 * 1024),
+            'sheets': len(openpyxl.load_workbook(file_path, read_only=True).sheetnames),
+        }
+        os.write(write_fd, json.dumps(report).encode())
+        os._exit(0)
+    
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        report = json.loads(f.read())
+    os.waitpid(pid, 0)
+    
+    return report
+
+
+def main():
+    from parsers.csv_parser import CSVParser
+    
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else ROWS
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        csv_path = os.path.join(tmpdir, 'data.csv')
+        make_csv(csv_path, rows)
+        
+        start = time.perf_counter()
+        result = CSVParser().parse(csv_path)
+        print(f"CSV: {rows} rows, parsed in {time.perf_counter() - start:.1f}s, "
+              f"parser RSS {memory_mb('VmRSS'):.0f} MB")
+        
+        print(f"{'mode':>16} {'export, s':>10} {'peak extra, MB':>15} {'file, MB':>9} {'sheets':>7}")
+        for constant_memory in (False, True):
+            report = export(result, constant_memory, tmpdir)
+            mode = 'constant_memory' if constant_memory else 'in_memory'
+            print(f"{mode:>16} {report['time']:>10.1f} {report['peak']:>15.0f} "
+                  f"{report['size']:>9.1f} {report['sheets']:>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark: response/export/Celery serialization - stdlib json vs. orjson.
+
+Запуск из каталога сервиса:
+    python benchmarks/bench_serialization.py
+"""
+
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.serialization import dumps, loads
+
+PAGE_COUNTS = [10, 100, 1000]
+REPEATS = 5
+
+
+def make_result(n_pages: int, seed: int = 42) -> dict:
+    """Синтетический результат парсинга PDF: текст, структура страниц, таблицы."""
+    rng = random.Random(seed)
+    alphabet = 'абвгдежзиклмнопрстуфхцчшэюя'
+    
+    def sentence() -> str:
+        words = (''.join(rng.choice(alphabet) for _ in range(rng.randint(3, 10))) for _ in range(rng.randint(8, 20)))
+        return ' '.join(words).capitalize() + '.'
+    
+    structure = []
+    text = []
+    for page in range(1, n_pages + 1):
+        elements = [
+            {'type': 'paragraph', 'text': sentence(), 'font_size': 11.0, 'bbox': [72.0, 100.0 + i * 14, 540.0, 112.0 + i * 14]}
+            for i in range(30)
+        ]
+        structure.append({'page': page, 'width': 595.0, 'height': 842.0, 'elements': elements})
+        text.extend(element['text'] for element in elements)
+    
+    tables = [
+        {
+            'page': page,
+            'headers': ['Наименование', 'Количество', 'Цена', 'Сумма'],
+            'rows': [[sentence()[:30], str(rng.randint(1, 100)), f"{rng.random() * 1000:.2f}", f"{rng.random() * 1e5:.2f}"]
+                     for _ in range(20)],
+        }
+        for page in range(1, n_pages + 1, 5)
+    ]
+    
+    return {
+        'metadata': {'type': 'pdf', 'pages': n_pages, 'ocr_confidence': float(np.float64(87.5))},
+        'content': {'text': '\n'.join(text), 'structure': structure, 'tables': tables},
+        'analysis': {'language': {'language': 'ru', 'confidence': 0.99}},
+    }
+
+
+def stdlib_response(data: dict) -> bytes:
+    """Кодирование ответа так же, как JSONResponse Starlette."""
+    return json.dumps(data, ensure_ascii=False, allow_nan=False, indent=None, separators=(',', ':')).encode('utf-8')
+
+
+def stdlib_export(data: dict) -> bytes:
+    """Прежний путь /export?format=json: dumps(indent=2), loads и снова кодирование ответа."""
+    return stdlib_response(json.loads(json.dumps(data, ensure_ascii=False, indent=2)))
+
+
+def stdlib_roundtrip(data: dict) -> dict:
+    """Сериализатор json Celery: кодирование и разбор результата задачи."""
+    return json.loads(json.dumps(data))
+
+
+def measure(func, data) -> float:
+    """Медианное время вызова, мс."""
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        func(data)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def main():
+    cases = [
+        ('response', stdlib_response, dumps),
+        ('export', stdlib_export, lambda data: dumps(data, indent=True)),
+        ('celery', stdlib_roundtrip, lambda data: loads(dumps(data))),
+    ]
+    
+    print(f"{'pages':>6} {'MB':>7} {'case':>9} {'json, ms':>10} {'orjson, ms':>11} {'speedup':>8}")
+    
+    for n_pages in PAGE_COUNTS:
+        data = make_result(n_pages)
+        size_mb = len(dumps(data)) / (1024 * 1024)
+        
+        for name, baseline, candidate in cases:
+            baseline_time = measure(baseline, data)
+            candidate_time = measure(candidate, data)
+            print(f"{n_pages:>6} {size_mb:>7.1f} {name:>9} {baseline_time:>10.1f} {candidate_time:>11.1f} "
+                  f"{baseline_time / candidate_time:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark: TextRank summarizer latency vs. document length.
+
+Запуск из каталога сервиса:
+    python benchmarks/bench_summarizer.py
+"""
+
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.analysis_context import AnalysisContext
+from utils.corpus_idf import CorpusIDF
+from utils.summarizer import TextRankSummarizer
+
+SENTENCE_COUNTS = [100, 1000, 5000, 10000, 20000]
+REPEATS = 3
+
+
+def make_document(n_sentences: int, seed: int = 42) -> str:
+    """Синтетический документ: предложения из словаря с zipf-подобным распределением."""
+    rng = random.Random(seed)
+    alphabet = 'абвгдежзиклмнопрстуфхцчшэюя'
+    vocabulary = [
+        ''.join(rng.choice(alphabet) for _ in range(rng.randint(3, 10)))
+        for _ in range(5000)
+    ]
+    weights = [1.0 / (rank + 1) for rank in range(len(vocabulary))]
+    
+    sentences = []
+    for _ in range(n_sentences):
+        words = rng.choices(vocabulary, weights=weights, k=rng.randint(8, 20))
+        sentences.append(' '.join(words).capitalize() + '.')
+    
+    return ' '.join(sentences)
+
+
+def build_context(text: str) -> AnalysisContext:
+    """Контекст с уже посчитанными токенами и предложениями."""
+    ctx = AnalysisContext(text)
+    ctx.token_spans
+    ctx.sentence_spans
+    return ctx
+
+
+def main():
+    corpus_idf = CorpusIDF(stopwords=[], model_path=None)
+    summarizer = TextRankSummarizer(corpus_idf)
+    
+    print(f"{'sentences':>10} {'chars':>10} {'context, ms':>12} {'summary, ms':>12}")
+    
+    for n_sentences in SENTENCE_COUNTS:
+        text = make_document(n_sentences)
+        corpus_idf.partial_fit(text)
+        
+        context_times = []
+        summary_times = []
+        for _ in range(REPEATS):
+            start = time.perf_counter()
+            ctx = build_context(text)
+            context_times.append(time.perf_counter() - start)
+            
+            start = time.perf_counter()
+            summarizer.summarize(ctx, sentences=3)
+            summary_times.append(time.perf_counter() - start)
+        
+        context_time = statistics.median(context_times)
+        summary_time = statistics.median(summary_times)
+        
+        print(f"{n_sentences:>10} {len(text):>10} {context_time * 1000:>12.1f} {summary_time * 1000:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
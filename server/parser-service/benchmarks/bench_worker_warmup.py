@@ -0,0 +1,117 @@
+"""
+Benchmark: дочерние процессы воркера без предзагрузки и с предзагрузкой (services.warmup).
+
+Родитель форкает CHILDREN процессов, как пул prefork Celery; каждый выполняет
+первую задачу (парсинг файла и все этапы анализа). Измеряется время первой
+задачи и собственная (не разделяемая с родителем) память процесса.
+
+Запуск из каталога сервиса (Linux, нужен /proc):
+    python benchmarks/bench_worker_warmup.py
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CHILDREN = 4
+
+
+def memory_mb() -> dict:
+    """RSS, PSS и собственная память (USS) процесса, МБ."""
+    values = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ('Rss:', 'Pss:', 'Private_Clean:', 'Private_Dirty:'):
+                values[parts[0][:-1]] = int(parts[1]) / 1024
+    return {
+        'rss': values['Rss'],
+        'pss': values['Pss'],
+        'uss': values['Private_Clean'] + values['Private_Dirty'],
+    }
+
+
+def first_task(file_path: str) -> None:
+    """Первая задача дочернего процесса: парсинг и все этапы анализа."""
+    from services.pipeline import STAGES, build_context, parse_file, run_stage
+    
+    result = parse_file(file_path, 'sample.txt', document_id='benchmark')
+    ctx = build_context(result)
+    options = {option: True for option, _, _ in STAGES.values()}
+    for name in STAGES:
+        run_stage(name, ctx, options)
+
+
+def run(preload: bool, file_path: str) -> dict:
+    """Родитель (с предзагрузкой или без) и CHILDREN дочерних процессов."""
+    import celery_app  # noqa: F401
+    from services.warmup import warmup
+    
+    start = time.perf_counter()
+    if preload:
+        warmup()
+    parent = {'startup': time.perf_counter() - start, **memory_mb()}
+    
+    children = []
+    for _ in range(CHILDREN):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            start = time.perf_counter()
+            first_task(file_path)
+            report = {'first_task': time.perf_counter() - start, **memory_mb()}
+            os.write(write_fd, json.dumps(report).encode())
+            os._exit(0)
+        
+        os.close(write_fd)
+        with os.fdopen(read_fd) as f:
+            children.append(json.loads(f.read()))
+        os.waitpid(pid, 0)
+    
+    return {'parent': parent, 'children': children}
+
+
+def main():
+    if len(sys.argv) == 3:
+        # Каждый режим - в отдельном интерпретаторе, чтобы импорты не пересекались
+        print(json.dumps(run(sys.argv[1] == 'warm', sys.argv[2])))
+        return
+    
+    from services.warmup import WARMUP_TEXT
+    
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+        f.write('\n'.join([WARMUP_TEXT] * 50))
+        file_path = f.name
+    
+    try:
+        print(f"{'mode':>5} {'parent startup, s':>18} {'parent RSS, MB':>15} {'first task, s':>14} "
+              f"{'child USS, MB':>14} {'child PSS, MB':>14} {'total PSS, MB':>14}")
+        
+        for mode in ('cold', 'warm'):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), mode, file_path],
+                capture_output=True, text=True, check=True
+            ).stdout
+            report = json.loads(output.strip().splitlines()[-1])
+            
+            parent, children = report['parent'], report['children']
+            first_task_time = statistics.median(child['first_task'] for child in children)
+            child_uss = statistics.median(child['uss'] for child in children)
+            child_pss = statistics.median(child['pss'] for child in children)
+            total_pss = parent['pss'] + sum(child['pss'] for child in children)
+            
+            print(f"{mode:>5} {parent['startup']:>18.2f} {parent['rss']:>15.0f} {first_task_time:>14.2f} "
+                  f"{child_uss:>14.0f} {child_pss:>14.0f} {total_pss:>14.0f}")
+    finally:
+        os.unlink(file_path)
+
+
+if __name__ == '__main__':
+    main()
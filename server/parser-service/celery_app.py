@@ -1,8 +1,28 @@
-from celery import Celery
+from celery import Celery, chain, chord, group
+from celery.signals import worker_init, worker_process_init, worker_process_shutdown
+from kombu import Queue
 import os
+import time
+from datetime import datetime, timezone
+
+from utils.serialization import register_celery_serializer
+from services.blob_store import blob_store, offload
+from services.scratch_space import scratch_space
 
 REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379')
 
+# json (по умолчанию) или orjson - быстрее для многомегабайтных результатов парсинга;
+# принимаются оба, поэтому воркеры и клиенты можно переключать по очереди
+CELERY_SERIALIZER = os.getenv('CELERY_SERIALIZER', 'json')
+register_celery_serializer('orjson')
+
+# Очереди: каждый пул воркеров масштабируется отдельно (WORKER_QUEUES в worker.py)
+QUEUE_DEFAULT = 'celery'
+QUEUE_PARSE = 'parse'        # парсинг документов
+QUEUE_OCR = 'ocr'            # парсинг изображений (OCR, тяжелый)
+QUEUE_ANALYSIS = 'analysis'  # легкие этапы анализа: язык, NER, классификация
+QUEUE_SEMANTIC = 'semantic'  # семантический анализ (тяжелый)
+
 app = Celery(
     'parser_tasks',
     broker=REDIS_URL,
@@ -10,38 +30,87 @@ app = Celery(
 )
 
 app.conf.update(
-    task_serializer='json',
-    accept_content=['json'],
-    result_serializer='json',
+    task_serializer=CELERY_SERIALIZER,
+    accept_content=['json', 'orjson'],
+    result_serializer=CELERY_SERIALIZER,
+    result_accept_content=['json', 'orjson'],
     timezone='UTC',
     enable_utc=True,
     task_track_started=True,
     task_time_limit=300,
     task_soft_time_limit=240,
+    task_queues=[Queue(name, routing_key=name) for name in (QUEUE_DEFAULT, QUEUE_PARSE, QUEUE_OCR, QUEUE_ANALYSIS, QUEUE_SEMANTIC)],
+    task_default_queue=QUEUE_DEFAULT,
+    task_routes={
+        'pipeline.parse': {'queue': QUEUE_PARSE},
+        'pipeline.parse_unit': {'queue': QUEUE_PARSE},
+        'pipeline.reduce': {'queue': QUEUE_PARSE},
+        'pipeline.language': {'queue': QUEUE_ANALYSIS},
+        'pipeline.entities': {'queue': QUEUE_ANALYSIS},
+        'pipeline.classification': {'queue': QUEUE_ANALYSIS},
+        'pipeline.semantic': {'queue': QUEUE_SEMANTIC},
+        'pipeline.merge': {'queue': QUEUE_ANALYSIS},
+    },
 )
 
+@worker_init.connect
+def preload_worker(**kwargs):
+    """Предзагрузка парсеров и моделей в родительском процессе воркера (до fork пула)."""
+    from services.warmup import WORKER_PRELOAD, warmup
+    
+    if WORKER_PRELOAD:
+        warmup()
+
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    """Дочерний процесс пула: при WORKER_PRELOAD все уже загружено в родителе, иначе - прогрев здесь."""
+    from services.warmup import warmup
+    
+    warmup()
+
+@worker_process_shutdown.connect
+def save_worker_models(**kwargs):
+    """Дочерний процесс пула: документы корпуса, учтенные с прошлого сохранения, - на диск."""
+    from utils.semantic_analyzer import semantic_analyzer
+    
+    semantic_analyzer.save_models()
+
+# Минимальный интервал между обновлениями прогресса парсинга (секунды)
+PROGRESS_INTERVAL = float(os.getenv('PROGRESS_INTERVAL', '0.5'))
+
+def _update_progress(task, progress: int, status: str, message: str, **extra):
+    """update_state(PROGRESS); при локальном (eager) выполнении backend не нужен - пропускаем."""
+    if task.request.is_eager:
+        return
+    
+    task.update_state(
+        state='PROGRESS',
+        meta={'progress': progress, 'status': status, 'message': message, **extra}
+    )
+
+def _progress_callback(task, status: str, start: int, end: int):
+    """
+    Колбэк прогресса парсера (страницы PDF, файлы архива) для задачи.
+    
+    Прогресс парсера переводится в диапазон start..end; обновления чаще
+    PROGRESS_INTERVAL пропускаются (кроме последнего), чтобы не нагружать Redis.
+    """
+    last_update = [0.0]
+    
+    def callback(current: int, total: int, message: str = ''):
+        now = time.monotonic()
+        if current < total and now - last_update[0] < PROGRESS_INTERVAL:
+            return
+        last_update[0] = now
+        
+        progress = start + (end - start) * current // max(total, 1)
+        _update_progress(task, progress, status, message, current=current, total=total)
+    
+    return callback
+
 @app.task(bind=True, name='parse_document')
 def parse_document_task(self, file_path: str, file_type: str):
-    from parsers.pdf_parser import PDFParser
-    from parsers.docx_parser import DOCXParser
-    from parsers.xlsx_parser import XLSXParser
-    from parsers.txt_parser import TXTParser
-    from parsers.html_parser import HTMLParser
-    from parsers.image_parser import ImageParser
-    
-    PARSERS = {
-        'pdf': PDFParser,
-        'docx': DOCXParser,
-        'xlsx': XLSXParser,
-        'txt': TXTParser,
-        'html': HTMLParser,
-        'htm': HTMLParser,
-        'png': ImageParser,
-        'jpg': ImageParser,
-        'jpeg': ImageParser,
-        'bmp': ImageParser,
-        'tiff': ImageParser,
-    }
+    from parsers.registry import PARSERS
     
     try:
         self.update_state(
@@ -59,6 +128,7 @@ def parse_document_task(self, file_path: str, file_type: str):
         
         parser_class = PARSERS[file_type]
         parser = parser_class()
+        parser.progress_callback = _progress_callback(self, 'parsing', 30, 90)
         result = parser.parse(file_path)
         
         self.update_state(
@@ -66,11 +136,15 @@ def parse_document_task(self, file_path: str, file_type: str):
             meta={'progress': 90, 'status': 'finalizing', 'message': 'Finalizing results...'}
         )
         
+        # Большие результаты - в хранилище блобов, через Redis только ссылка
+        result, result_ref = offload(blob_store, result, 'application/json')
+        
         return {
             'status': 'completed',
-            'result': result
+            'result': result,
+            'result_ref': result_ref,
         }
-        
+    
     except Exception as e:
         self.update_state(
             state='FAILURE',
@@ -85,6 +159,8 @@ def export_document_task(self, data: dict, export_format: str, options: dict = N
     from exporters.markdown_exporter import MarkdownExporter
     from exporters.excel_exporter import ExcelExporter
     from exporters.html_exporter import HTMLExporter
+    from exporters.parquet_exporter import ParquetExporter
+    from exporters.arrow_exporter import ArrowExporter
     
     EXPORTERS = {
         'json': JSONExporter,
@@ -92,6 +168,8 @@ def export_document_task(self, data: dict, export_format: str, options: dict = N
         'markdown': MarkdownExporter,
         'excel': ExcelExporter,
         'html': HTMLExporter,
+        'parquet': ParquetExporter,
+        'arrow': ArrowExporter,
     }
     
     try:
@@ -112,12 +190,15 @@ def export_document_task(self, data: dict, export_format: str, options: dict = N
             meta={'progress': 90, 'status': 'finalizing', 'message': 'Finalizing export...'}
         )
         
+        result, result_ref = offload(blob_store, result, exporter.get_mime_type(options))
+        
         return {
             'status': 'completed',
             'result': result,
+            'result_ref': result_ref,
             'format': export_format
         }
-        
+    
     except Exception as e:
         self.update_state(
             state='FAILURE',
@@ -125,32 +206,314 @@ def export_document_task(self, data: dict, export_format: str, options: dict = N
         )
         raise
 
+def _run_pipeline_stage(name: str, run_id: str, options: dict = None) -> dict:
+    """Этап анализа над результатом парсинга запуска из промежуточного хранилища."""
+    from services.pipeline import build_context, enabled_stages, run_language, run_stage
+    from services.result_store import pipeline_store
+    
+    options = options or {}
+    result = pipeline_store.get(run_id)
+    if result is None:
+        raise ValueError(f"Parse result not found for run {run_id}")
+    
+    ctx = build_context(result)
+    if name not in enabled_stages(ctx.text, options) or 'error' in result['metadata']:
+        return {}
+    
+    # Язык определяется параллельно с этим этапом; для разбиения на
+    # предложения он нужен здесь - определяем заново (дешево, с кешем)
+    if name == 'semantic' and ctx.language is None and 'language' in enabled_stages(ctx.text, options):
+        run_language(ctx, options)
+    
+    return run_stage(name, ctx, options)
+
+def _store_parsed(task, result: dict, run_id: str, options: dict) -> None:
+    """
+    Очистка текста и сохранение результата парсинга для этапов анализа - под ID
+    запуска; общее хранилище результатов пишет только pipeline.merge.
+    """
+    from services.pipeline import prepare_text
+    from services.result_store import pipeline_store
+    
+    if options['clean_text']:
+        _update_progress(task, 90, 'cleaning', 'Cleaning text...')
+    prepare_text(result, options['clean_text'])
+    pipeline_store.put(run_id, result)
+
+@app.task(bind=True, name='pipeline.parse')
+def pipeline_parse_task(self, file_path: str, filename: str, document_id: str, run_id: str, options: dict = None):
+    """
+    Парсинг и очистка текста; результат кладется в промежуточное хранилище
+    под ID запуска для этапов анализа.
+    
+    Большой документ (несколько частей по split парсера: страницы PDF, листы
+    XLSX, блоки строк CSV, файлы архива) заменяется на chord задач частей и
+    сборки (pipeline.reduce) с тем же ID задачи - цепочка продолжается после сборки.
+    """
+    from services.pipeline import DEFAULT_OPTIONS, add_file_metadata, get_parser
+    
+    options = {**DEFAULT_OPTIONS, **(options or {})}
+    
+    _update_progress(self, 0, 'parsing', 'Parsing document...')
+    parser = get_parser(file_path, filename)
+    
+    units = parser.split(file_path)
+    if len(units) > 1:
+        _update_progress(self, 0, 'parsing', f"Split into {len(units)} units", current=0, total=len(units))
+        return self.replace(chord(
+            [pipeline_parse_unit_task.si(file_path, filename, run_id, index, unit, self.request.id, len(units))
+             for index, unit in enumerate(units)],
+            pipeline_reduce_task.si(file_path, filename, document_id, run_id, units, options)
+        ))
+    
+    parser.progress_callback = _progress_callback(self, 'parsing', 0, 90)
+    result = parser.parse(file_path)
+    add_file_metadata(result, file_path, filename, document_id)
+    
+    _store_parsed(self, result, run_id, options)
+    
+    return document_id
+
+@app.task(bind=True, name='pipeline.parse_unit', acks_late=True, reject_on_worker_lost=True)
+def pipeline_parse_unit_task(self, file_path: str, filename: str, run_id: str, index: int, unit: dict,
+                             progress_id: str = None, total: int = None):
+    """
+    Парсинг одной части документа с чекпойнтом запуска.
+    
+    Готовая часть (чекпойнт уже есть - повторная доставка задачи) пропускается.
+    acks_late: если воркер упал посреди части, сообщение вернется в очередь
+    и часть выполнит другой воркер.
+    """
+    from parsers.registry import PARSERS, file_extension
+    from services.checkpoint_store import checkpoint_store
+    
+    if not checkpoint_store.exists(run_id, index, unit):
+        parser = PARSERS[file_extension(filename)]()
+        checkpoint_store.put(run_id, index, unit, parser.parse_unit(file_path, unit))
+    
+    # Прогресс - в задаче pipeline.parse, которую заменили части
+    if progress_id and not self.request.is_eager:
+        done = min(checkpoint_store.count(run_id), total)
+        app.backend.store_result(progress_id, {
+            'progress': 90 * done // total,
+            'status': 'parsing',
+            'message': f"Units {done}/{total}",
+            'current': done,
+            'total': total,
+        }, 'PROGRESS')
+    
+    return index
+
+@app.task(bind=True, name='pipeline.reduce')
+def pipeline_reduce_task(self, file_path: str, filename: str, document_id: str, run_id: str, units: list,
+                         options: dict = None):
+    """Сборка результатов частей в результат документа (продолжение pipeline.parse)."""
+    from parsers.registry import PARSERS, file_extension
+    from services.checkpoint_store import checkpoint_store
+    from services.pipeline import DEFAULT_OPTIONS, add_file_metadata
+    
+    options = {**DEFAULT_OPTIONS, **(options or {})}
+    
+    _update_progress(self, 90, 'merging', f"Merging {len(units)} units...")
+    
+    results = [checkpoint_store.get(run_id, index, unit) for index, unit in enumerate(units)]
+    missing = [index for index, result in enumerate(results) if result is None]
+    if missing:
+        raise ValueError(f"Missing parsed units for {document_id}: {missing}")
+    
+    parser = PARSERS[file_extension(filename)]()
+    result = parser.merge(results)
+    add_file_metadata(result, file_path, filename, document_id)
+    
+    _store_parsed(self, result, run_id, options)
+    checkpoint_store.clear(run_id)
+    
+    return document_id
+
+@app.task(name='pipeline.language')
+def pipeline_language_task(run_id: str, options: dict = None):
+    return _run_pipeline_stage('language', run_id, options)
+
+@app.task(name='pipeline.entities')
+def pipeline_entities_task(run_id: str, options: dict = None):
+    return _run_pipeline_stage('entities', run_id, options)
+
+@app.task(name='pipeline.classification')
+def pipeline_classification_task(run_id: str, options: dict = None):
+    return _run_pipeline_stage('classification', run_id, options)
+
+@app.task(name='pipeline.semantic')
+def pipeline_semantic_task(run_id: str, options: dict = None):
+    return _run_pipeline_stage('semantic', run_id, options)
+
+@app.task(name='pipeline.merge')
+def pipeline_merge_task(stage_results: list, document_id: str, run_id: str, options: dict = None):
+    """
+    Сборка секций анализа, сохранение и индексация итогового результата;
+    промежуточный результат запуска удаляется.
+    """
+    from services.pipeline import finalize_result
+    from services.result_store import pipeline_store, result_store
+    
+    stored = pipeline_store.get(run_id)
+    if stored is None:
+        raise ValueError(f"Parse result not found for run {run_id}")
+    
+    # Результаты из хранилища общие - собираем новый словарь
+    result = {**stored, 'metadata': dict(stored['metadata'])}
+    analysis = {}
+    for sections in stage_results:
+        analysis.update(sections or {})
+    if analysis:
+        result['analysis'] = analysis
+    
+    # Как в /parse: ошибка парсинга не сохраняется, документ без текста - без индексации
+    if 'error' not in result['metadata']:
+        if result.get('content', {}).get('text'):
+            finalize_result(result, options or {})
+        else:
+            result_store.put(document_id, result)
+    
+    pipeline_store.delete(run_id)
+    
+    result, result_ref = offload(blob_store, result, 'application/json')
+    
+    return {
+        'status': 'completed',
+        'document_id': document_id,
+        'result': result,
+        'result_ref': result_ref,
+    }
+
+@app.task(name='pipeline.discard_upload')
+def discard_upload_task(file_path: str):
+    """Удаление области временных файлов с загруженным файлом задания."""
+    scratch_space.discard(file_path)
+
+# Задачи этапов анализа в порядке services.pipeline.STAGES
+STAGE_TASKS = {
+    'language': pipeline_language_task,
+    'entities': pipeline_entities_task,
+    'classification': pipeline_classification_task,
+    'semantic': pipeline_semantic_task,
+}
+
+def analysis_pipeline(file_path: str, filename: str, options: dict = None,
+                      document_id: str = None, job_id: str = None):
+    """
+    Полная обработка документа как цепочка задач (аналог синхронного /parse).
+    
+    parse (очередь parse или ocr) -> chord(этапы анализа параллельно:
+    analysis/semantic) -> merge. Между задачами передается только ID запуска,
+    результат парсинга - через промежуточное хранилище (DATA_DIR общий для
+    воркеров); в общее хранилище результатов пишет только merge.
+    
+    Args:
+        file_path: Путь к файлу (доступный воркерам)
+        filename: Исходное имя файла
+        options: Параметры обработки как у /parse
+        document_id: sha256 файла, если уже посчитан
+        job_id: ID задания - задачи получают ID services.job_store.task_id(job_id, имя),
+            по которым собирается статус задания
+    
+    Returns:
+        Canvas Celery; запуск - .apply_async()
+    """
+    from parsers.registry import OCR_FORMATS, file_extension
+    from services.job_store import task_id
+    from services.pipeline import DEFAULT_OPTIONS, enabled_stages, file_document_id, pipeline_run_id
+    
+    options = {**DEFAULT_OPTIONS, **(options or {})}
+    document_id = document_id or file_document_id(file_path)
+    run_id = pipeline_run_id(document_id, job_id)
+    
+    def with_id(signature, name: str):
+        return signature.set(task_id=task_id(job_id, name)) if job_id else signature
+    
+    parse = with_id(pipeline_parse_task.si(file_path, filename, document_id, run_id, options), 'parse')
+    if file_extension(filename) in OCR_FORMATS:
+        parse = parse.set(queue=QUEUE_OCR)
+    
+    stages = [with_id(STAGE_TASKS[name].si(run_id, options), name) for name in enabled_stages(None, options)]
+    merge = (pipeline_merge_task.s(document_id, run_id, options) if stages
+             else pipeline_merge_task.si([], document_id, run_id, options))
+    merge = with_id(merge, 'merge')
+    
+    # Загруженный файл в области временных файлов API удаляется после сборки результата
+    # или после ошибки любой задачи (errback цепочки вешается на каждую задачу)
+    discard = discard_upload_task.si(file_path) if scratch_space.owns(file_path) else None
+    if discard is not None:
+        merge = merge.set(link=discard)
+    
+    canvas = chain(parse, merge) if not stages else chain(parse, chord(group(stages), merge))
+    if discard is not None:
+        canvas.link_error(discard)
+    
+    return canvas
+
+def get_job_status(job: dict) -> dict:
+    """Сводный статус задания по состояниям его задач в result backend."""
+    from services.job_store import job_status, job_tasks, task_id
+    
+    tasks = {}
+    for name in job_tasks(job):
+        result = app.AsyncResult(task_id(job['job_id'], name))
+        tasks[name] = {'state': result.state, 'info': result.info}
+    
+    return job_status(job, tasks)
+
+def job_finished_at(job_id: str):
+    """
+    Время завершения задания (time.time()) или None, пока оно выполняется.
+    
+    Задание завершено, когда merge выполнена или любая задача завершилась ошибкой;
+    задание без записи (удалена по JOB_TTL или с прошлого запуска) считается
+    завершенным давно.
+    """
+    from services.job_store import FAILED_STATES, job_store, job_tasks, task_id
+    
+    job = job_store.get(job_id)
+    if job is None:
+        return 0.0
+    
+    for name in job_tasks(job):
+        result = app.AsyncResult(task_id(job_id, name))
+        if result.state in FAILED_STATES or (name == 'merge' and result.state == 'SUCCESS'):
+            date_done = result.date_done
+            if date_done is None:
+                return 0.0
+            if isinstance(date_done, str):
+                date_done = datetime.fromisoformat(date_done)
+            # date_done Celery - UTC
+            if date_done.tzinfo is None:
+                date_done = date_done.replace(tzinfo=timezone.utc)
+            return date_done.timestamp()
+    
+    return None
+
 @app.task(name='cleanup_old_files')
 def cleanup_old_files():
-    import os
-    import time
-    from pathlib import Path
-    
-    upload_dir = Path('/app/uploads')
-    max_age = 3600  # 1 hour
-    
-    if not upload_dir.exists():
-        return {'cleaned': 0}
-    
-    current_time = time.time()
-    cleaned = 0
-    
-    for file_path in upload_dir.glob('*'):
-        if file_path.is_file():
-            file_age = current_time - file_path.stat().st_mtime
-            if file_age > max_age:
-                try:
-                    file_path.unlink()
-                    cleaned += 1
-                except Exception as e:
-                    print(f"Failed to delete {file_path}: {e}")
-    
-    return {'cleaned': cleaned}
+    # Загруженные файлы удаляются по событиям (services.scratch_space), здесь -
+    # просроченные блобы результатов, записи заданий, чекпойнты и промежуточные
+    # результаты брошенных запусков (живут столько же, сколько записи заданий)
+    from services.checkpoint_store import checkpoint_store
+    from services.export_cache import export_cache
+    from services.job_store import JOB_TTL, job_store
+    from services.result_store import pipeline_store
+    
+    blobs_cleaned = blob_store.cleanup()
+    jobs_cleaned = job_store.cleanup()
+    checkpoints_cleaned = checkpoint_store.cleanup()
+    pipeline_cleaned = pipeline_store.cleanup(JOB_TTL)
+    exports_cleaned = export_cache.cleanup()
+    
+    return {
+        'blobs_cleaned': blobs_cleaned,
+        'jobs_cleaned': jobs_cleaned,
+        'checkpoints_cleaned': checkpoints_cleaned,
+        'pipeline_cleaned': pipeline_cleaned,
+        'exports_cleaned': exports_cleaned,
+    }
 
 app.conf.beat_schedule = {
     'cleanup-every-hour': {
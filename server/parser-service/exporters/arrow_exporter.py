@@ -0,0 +1,19 @@
+import pyarrow as pa
+from typing import Dict, Any
+from .columnar_exporter import ColumnarExporter
+
+class ArrowExporter(ColumnarExporter):
+    """Arrow IPC: формат файла (произвольный доступ к батчам), options['stream'] - потоковый формат."""
+    
+    def _write(self, table: pa.Table, sink: Any, options: Dict[str, Any]) -> None:
+        new_writer = pa.ipc.new_stream if options.get('stream') else pa.ipc.new_file
+        with new_writer(sink, table.schema) as writer:
+            writer.write_table(table)
+    
+    def get_extension(self, options: Dict[str, Any] = None) -> str:
+        return 'arrows' if (options or {}).get('stream') else 'arrow'
+    
+    def get_mime_type(self, options: Dict[str, Any] = None) -> str:
+        if (options or {}).get('stream'):
+            return 'application/vnd.apache.arrow.stream'
+        return 'application/vnd.apache.arrow.file'
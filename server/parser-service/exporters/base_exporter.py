@@ -1,15 +1,49 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from typing import Dict, Any, Iterable, Iterator
+
+# Символов в одной части потокового экспорта
+EXPORT_CHUNK_SIZE = 65536
+
+def join_lines(lines: Iterable[str], chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[str]:
+    """То же, что '\\n'.join(lines), но частями по chunk_size символов по мере генерации строк."""
+    buffer = []
+    size = 0
+    separator = ''
+    
+    for line in lines:
+        buffer.append(separator)
+        buffer.append(line)
+        separator = '\n'
+        size += len(line) + 1
+        if size >= chunk_size:
+            yield ''.join(buffer)
+            buffer = []
+            size = 0
+    
+    if buffer:
+        yield ''.join(buffer)
 
 class BaseExporter(ABC):
+    # Экспорт отдается частями (iter_export) без сборки результата целиком
+    streaming = False
+    
     @abstractmethod
     def export(self, data: Dict[str, Any], options: Dict[str, Any] = None) -> Any:
         pass
     
+    def iter_export(self, data: Dict[str, Any], options: Dict[str, Any] = None) -> Iterator[Any]:
+        yield self.export(data, options)
+    
+    def export_to_file(self, data: Dict[str, Any], file_path: str, options: Dict[str, Any] = None) -> None:
+        with open(file_path, 'wb') as f:
+            for chunk in self.iter_export(data, options):
+                f.write(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+    
+    # Расширение и MIME-тип могут зависеть от параметров экспорта (Arrow: stream)
     @abstractmethod
-    def get_extension(self) -> str:
+    def get_extension(self, options: Dict[str, Any] = None) -> str:
         pass
     
     @abstractmethod
-    def get_mime_type(self) -> str:
+    def get_mime_type(self, options: Dict[str, Any] = None) -> str:
         pass
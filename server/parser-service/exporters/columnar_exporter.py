@@ -0,0 +1,132 @@
+import io
+from abc import abstractmethod
+import pandas as pd
+import pyarrow as pa
+from typing import Dict, Any, List, Optional
+from .base_exporter import BaseExporter
+
+# Свойства таблицы результата, сохраняемые в метаданных схемы
+TABLE_PROPERTIES = ('table_index', 'sheet', 'page')
+
+class ColumnarExporter(BaseExporter):
+    """
+    Таблица результата (content.tables[options['table']], по умолчанию первая)
+    в колоночном формате с типами столбцов.
+    
+    Типы берутся из dtypes таблицы (XLSXParser), для остальных таблиц
+    определяются по значениям: числовые столбцы - int64/float64, прочие - строки.
+    Пустые ячейки числовых столбцов и дат - null.
+    """
+    
+    def export(self, data: Dict[str, Any], options: Dict[str, Any] = None) -> bytes:
+        sink = io.BytesIO()
+        self._write(self.to_arrow(data, options), sink, options or {})
+        return sink.getvalue()
+    
+    def export_to_file(self, data: Dict[str, Any], file_path: str, options: Dict[str, Any] = None) -> None:
+        self._write(self.to_arrow(data, options), file_path, options or {})
+    
+    @abstractmethod
+    def _write(self, table: pa.Table, sink: Any, options: Dict[str, Any]) -> None:
+        """Запись таблицы в sink (путь к файлу или поток) в формате экспортера."""
+    
+    def to_arrow(self, data: Dict[str, Any], options: Dict[str, Any] = None) -> pa.Table:
+        options = options or {}
+        tables = data.get('content', {}).get('tables', [])
+        index = int(options.get('table', 0))
+        
+        if not 0 <= index < len(tables):
+            raise ValueError(f"Table {index} not found: document has {len(tables)} tables")
+        
+        table = tables[index]
+        
+        # DataFrame (вызов из кода сервиса) - без преобразования: числовые столбцы без копирования
+        if isinstance(table, pd.DataFrame):
+            return pa.Table.from_pandas(table, preserve_index=False)
+        
+        frame = self.to_frame(table)
+        arrow_table = pa.Table.from_pandas(frame, preserve_index=False)
+        
+        metadata = {key: str(table[key]) for key in TABLE_PROPERTIES if key in table}
+        if data.get('metadata', {}).get('document_id'):
+            metadata['document_id'] = data['metadata']['document_id']
+        
+        return arrow_table.replace_schema_metadata({**(arrow_table.schema.metadata or {}), **metadata})
+    
+    def to_frame(self, table: Dict[str, Any]) -> pd.DataFrame:
+        """DataFrame таблицы результата с типами столбцов."""
+        rows = table.get('rows', [])
+        
+        # Заголовок - headers таблицы, если парсер выделил их из строк, иначе первая строка
+        if 'headers' in table:
+            headers, data_rows = table['headers'], rows
+        else:
+            headers, data_rows = (rows[0], rows[1:]) if rows else ([], [])
+        
+        width = max([len(headers)] + [len(row) for row in data_rows])
+        names = self._column_names(list(headers) + [''] * (width - len(headers)))
+        # Ключи dtypes после сохранения результата в JSON - строки
+        dtypes = {str(column): dtype for column, dtype in (table.get('dtypes') or {}).items()}
+        
+        columns = {}
+        for col_idx, name in enumerate(names):
+            values = pd.Series(
+                [row[col_idx] if col_idx < len(row) else '' for row in data_rows],
+                dtype=object
+            )
+            header = headers[col_idx] if col_idx < len(headers) else None
+            columns[name] = self._convert(values, dtypes.get(str(header)) if header is not None else None)
+        
+        return pd.DataFrame(columns)
+    
+    @staticmethod
+    def _column_names(headers: List[Any]) -> List[str]:
+        """Уникальные непустые имена столбцов."""
+        names = []
+        seen = set()
+        
+        for col_idx, header in enumerate(headers):
+            name = str(header).strip() if header is not None and str(header).strip() else f'column_{col_idx + 1}'
+            base, suffix = name, 1
+            while name in seen:
+                name = f'{base}_{suffix}'
+                suffix += 1
+            seen.add(name)
+            names.append(name)
+        
+        return names
+    
+    @staticmethod
+    def _convert(values: pd.Series, dtype: Optional[str]) -> pd.Series:
+        """
+        Строковые значения столбца в тип dtype (pandas) или в тип по значениям;
+        если значения не приводятся к типу - столбец остается строковым.
+        """
+        values = values.map(lambda value: '' if value is None else str(value))
+        blank = values.str.strip() == ''
+        
+        if dtype and dtype.startswith('datetime'):
+            converted = pd.to_datetime(values.mask(blank), errors='coerce')
+            return values if (converted.isna() & ~blank).any() else converted
+        
+        if dtype == 'bool':
+            mapped = values.map({'True': True, 'False': False})
+            return values if (mapped.isna() & ~blank).any() else mapped.astype('boolean')
+        
+        if dtype and not dtype.startswith(('int', 'uint', 'float')):
+            return values
+        
+        # Числовой тип из dtypes или определение по значениям; ведущие нули
+        # (коды, ИНН, телефоны) - признак строкового столбца
+        if blank.all() or (dtype is None and values.str.match(r'^[+-]?0\d').any()):
+            return values
+        
+        numbers = pd.to_numeric(values.mask(blank), errors='coerce')
+        if (numbers.isna() & ~blank).any():
+            return values
+        
+        integral = (numbers.dropna() % 1 == 0).all()
+        if integral and not (dtype or '').startswith('float'):
+            return numbers.astype('Int64') if blank.any() else numbers.astype('int64')
+        
+        return numbers.astype('float64')
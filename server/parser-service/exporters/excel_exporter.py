@@ -1,12 +1,29 @@
-import io
+import os
+import tempfile
 import xlsxwriter
-from typing import Dict, Any
+from typing import Dict, Any, Iterable, Iterator, List, Optional
 from .base_exporter import BaseExporter
 
 class ExcelExporter(BaseExporter):
+    # Строк на листе Excel (с заголовком); длинные таблицы продолжаются на листах "Имя (2)", ...
+    MAX_ROWS = 1048576
+    
     def export(self, data: Dict[str, Any], options: Dict[str, Any] = None) -> bytes:
-        output = io.BytesIO()
-        workbook = xlsxwriter.Workbook(output, {'in_memory': True})
+        with tempfile.TemporaryDirectory() as tmpdir:
+            file_path = os.path.join(tmpdir, f'export.{self.get_extension()}')
+            self.export_to_file(data, file_path, options)
+            with open(file_path, 'rb') as f:
+                return f.read()
+    
+    def export_to_file(self, data: Dict[str, Any], file_path: str, options: Dict[str, Any] = None) -> None:
+        options = options or {}
+        
+        # constant_memory: строки пишутся во временные файлы рядом с file_path по мере записи,
+        # в памяти - только текущая строка каждого листа
+        workbook = xlsxwriter.Workbook(file_path, {
+            'constant_memory': options.get('constant_memory', True),
+            'tmpdir': os.path.dirname(os.path.abspath(file_path)),
+        })
         
         bold = workbook.add_format({'bold': True, 'bg_color': '#D9E1F2'})
         header = workbook.add_format({
@@ -20,6 +37,8 @@ class ExcelExporter(BaseExporter):
         content = data.get('content', {})
         
         toc_sheet = workbook.add_worksheet('Contents')
+        toc_sheet.set_column(0, 0, 20)
+        toc_sheet.set_column(1, 1, 50)
         toc_sheet.write(0, 0, 'Document Structure', bold)
         toc_sheet.write(1, 0, 'Section', header)
         toc_sheet.write(1, 1, 'Description', header)
@@ -41,31 +60,32 @@ class ExcelExporter(BaseExporter):
         
         text = content.get('text', '')
         if text:
-            text_sheet = workbook.add_worksheet('Text Content')
-            text_sheet.write(0, 0, 'Full Text', bold)
-            
-            lines = text.split('\n')
-            for i, line in enumerate(lines[:1000], start=1):
-                text_sheet.write(i, 0, line)
+            line_count = text.count('\n') + 1
+            self._write_sheets(
+                workbook, 'Text Content', [('Full Text', bold)],
+                ([line] for line in self._iter_lines(text))
+            )
             
             toc_sheet.write(row, 0, 'Text Content')
-            toc_sheet.write(row, 1, f'{len(lines)} lines of text')
+            toc_sheet.write(row, 1, f'{line_count} lines of text')
             row += 1
         
         tables = content.get('tables', [])
         if tables:
-            for i, table in enumerate(tables[:10], start=1):
+            for i, table in enumerate(tables, start=1):
                 sheet_name = f'Table {i}'
-                table_sheet = workbook.add_worksheet(sheet_name)
                 
+                # Заголовок - headers таблицы, если парсер выделил их из строк, иначе первая строка
                 rows = table.get('rows', [])
-                if rows:
-                    for col_idx, cell in enumerate(rows[0]):
-                        table_sheet.write(0, col_idx, str(cell), header)
-                    
-                    for row_idx, row_data in enumerate(rows[1:], start=1):
-                        for col_idx, cell in enumerate(row_data):
-                            table_sheet.write(row_idx, col_idx, str(cell))
+                if 'headers' in table:
+                    headers, data_rows = table['headers'], rows
+                else:
+                    headers, data_rows = (rows[0], rows[1:]) if rows else ([], [])
+                
+                self._write_sheets(
+                    workbook, sheet_name, [(str(cell), header) for cell in headers],
+                    ([str(cell) for cell in row_data] for row_data in data_rows)
+                )
                 
                 page = table.get('page', '')
                 toc_sheet.write(row, 0, sheet_name)
@@ -74,38 +94,76 @@ class ExcelExporter(BaseExporter):
         
         structure = content.get('structure', [])
         if structure and isinstance(structure, list):
-            struct_sheet = workbook.add_worksheet('Structure')
-            struct_sheet.write(0, 0, 'Type', header)
-            struct_sheet.write(0, 1, 'Content', header)
-            struct_sheet.write(0, 2, 'Details', header)
+            def structure_rows() -> Iterator[List[str]]:
+                for element in structure:
+                    if isinstance(element, dict):
+                        elem_type = element.get('type', 'unknown')
+                        text = element.get('text', '')
+                        details = ', '.join([f"{k}: {v}" for k, v in element.items()
+                                            if k not in ['type', 'text', 'elements']])
+                        yield [elem_type, text[:500] if text else '', details]
             
-            struct_row = 1
-            for element in structure[:500]:
-                if isinstance(element, dict):
-                    elem_type = element.get('type', 'unknown')
-                    text = element.get('text', '')
-                    details = ', '.join([f"{k}: {v}" for k, v in element.items() 
-                                        if k not in ['type', 'text', 'elements']])
-                    
-                    struct_sheet.write(struct_row, 0, elem_type)
-                    struct_sheet.write(struct_row, 1, text[:500] if text else '')
-                    struct_sheet.write(struct_row, 2, details)
-                    struct_row += 1
+            self._write_sheets(
+                workbook, 'Structure',
+                [('Type', header), ('Content', header), ('Details', header)],
+                structure_rows()
+            )
             
             toc_sheet.write(row, 0, 'Structure')
             toc_sheet.write(row, 1, f'{len(structure)} structural elements')
             row += 1
         
-        toc_sheet.set_column(0, 0, 20)
-        toc_sheet.set_column(1, 1, 50)
-        
         workbook.close()
-        output.seek(0)
+    
+    def _write_sheets(self, workbook, title: str, header_cells: List[tuple],
+                      rows: Iterable[List[Any]]) -> int:
+        """
+        Строки с заголовком на листе title; после MAX_ROWS строк - продолжение
+        на листах "title (2)", "title (3)", ... с тем же заголовком.
         
-        return output.read()
+        Returns:
+            Количество листов
+        """
+        sheets = 0
+        sheet: Optional[Any] = None
+        row_idx = self.MAX_ROWS
+        
+        for row_data in rows:
+            if row_idx >= self.MAX_ROWS:
+                sheets += 1
+                sheet = self._add_sheet(workbook, title if sheets == 1 else f'{title} ({sheets})', header_cells)
+                row_idx = 1
+            
+            for col_idx, cell in enumerate(row_data):
+                sheet.write(row_idx, col_idx, cell)
+            row_idx += 1
+        
+        if sheet is None:
+            self._add_sheet(workbook, title, header_cells)
+            sheets = 1
+        
+        return sheets
+    
+    def _add_sheet(self, workbook, name: str, header_cells: List[tuple]):
+        sheet = workbook.add_worksheet(name)
+        for col_idx, (cell, cell_format) in enumerate(header_cells):
+            sheet.write(0, col_idx, cell, cell_format)
+        return sheet
+    
+    @staticmethod
+    def _iter_lines(text: str) -> Iterator[str]:
+        """Строки текста (как text.split('\\n')) без создания списка."""
+        start = 0
+        while True:
+            end = text.find('\n', start)
+            if end == -1:
+                yield text[start:]
+                return
+            yield text[start:end]
+            start = end + 1
     
-    def get_extension(self) -> str:
+    def get_extension(self, options: Dict[str, Any] = None) -> str:
         return 'xlsx'
     
-    def get_mime_type(self) -> str:
+    def get_mime_type(self, options: Dict[str, Any] = None) -> str:
         return 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
@@ -1,48 +1,56 @@
-from typing import Dict, Any
-from .base_exporter import BaseExporter
+from typing import Dict, Any, Iterator
+from .base_exporter import BaseExporter, join_lines
 
 class HTMLExporter(BaseExporter):
+    streaming = True
+    
     def export(self, data: Dict[str, Any], options: Dict[str, Any] = None) -> str:
+        return ''.join(self.iter_export(data, options))
+    
+    def iter_export(self, data: Dict[str, Any], options: Dict[str, Any] = None) -> Iterator[str]:
+        return join_lines(self._iter_parts(data))
+    
+    def _iter_parts(self, data: Dict[str, Any]) -> Iterator[str]:
         metadata = data.get('metadata', {})
         content = data.get('content', {})
         
-        html_parts = []
-        html_parts.append('<!DOCTYPE html>')
-        html_parts.append('<html lang="en">')
-        html_parts.append('<head>')
-        html_parts.append('    <meta charset="UTF-8">')
-        html_parts.append('    <meta name="viewport" content="width=device-width, initial-scale=1.0">')
-        html_parts.append(f'    <title>{metadata.get("title", "Document")}</title>')
-        html_parts.append('    <style>')
-        html_parts.append(self._get_css())
-        html_parts.append('    </style>')
-        html_parts.append('</head>')
-        html_parts.append('<body>')
-        html_parts.append('    <div class="container">')
+        yield '<!DOCTYPE html>'
+        yield '<html lang="en">'
+        yield '<head>'
+        yield '    <meta charset="UTF-8">'
+        yield '    <meta name="viewport" content="width=device-width, initial-scale=1.0">'
+        yield f'    <title>{metadata.get("title", "Document")}</title>'
+        yield '    <style>'
+        yield self._get_css()
+        yield '    </style>'
+        yield '</head>'
+        yield '<body>'
+        yield '    <div class="container">'
         
         if metadata.get('title'):
-            html_parts.append(f'        <h1 class="doc-title">{metadata["title"]}</h1>')
+            yield f'        <h1 class="doc-title">{metadata["title"]}</h1>'
         
         if metadata.get('author'):
-            html_parts.append(f'        <p class="doc-meta">Author: {metadata["author"]}</p>')
+            yield f'        <p class="doc-meta">Author: {metadata["author"]}</p>'
         
         structure = content.get('structure', [])
         for element in structure:
             if isinstance(element, dict):
-                html_parts.append(self._element_to_html(element))
+                yield self._element_to_html(element)
         
         tables = content.get('tables', [])
         if tables:
-            html_parts.append('        <h2>Tables</h2>')
+            yield '        <h2>Tables</h2>'
             for i, table in enumerate(tables, start=1):
-                html_parts.append(f'        <h3>Table {i}</h3>')
-                html_parts.append(self._table_to_html(table))
-        
-        html_parts.append('    </div>')
-        html_parts.append('</body>')
-        html_parts.append('</html>')
-        
-        return '\n'.join(html_parts)
+                yield f'        <h3>Table {i}</h3>'
+                if table.get('rows'):
+                    yield from self._iter_table_html(table)
+                else:
+                    yield ''
+        
+        yield '    </div>'
+        yield '</body>'
+        yield '</html>'
     
     def _element_to_html(self, element: Dict[str, Any]) -> str:
         element_type = element.get('type', 'paragraph')
@@ -79,30 +87,31 @@ class HTMLExporter(BaseExporter):
         return ''
     
     def _table_to_html(self, table: Dict[str, Any]) -> str:
+        return '\n'.join(self._iter_table_html(table))
+    
+    def _iter_table_html(self, table: Dict[str, Any]) -> Iterator[str]:
         rows = table.get('rows', [])
         if not rows:
-            return ''
+            return
         
-        html = ['        <table class="data-table">']
+        yield '        <table class="data-table">'
         
-        html.append('            <thead>')
-        html.append('                <tr>')
+        yield '            <thead>'
+        yield '                <tr>'
         for cell in rows[0]:
-            html.append(f'                    <th>{cell}</th>')
-        html.append('                </tr>')
-        html.append('            </thead>')
+            yield f'                    <th>{cell}</th>'
+        yield '                </tr>'
+        yield '            </thead>'
         
-        html.append('            <tbody>')
+        yield '            <tbody>'
         for row in rows[1:]:
-            html.append('                <tr>')
+            yield '                <tr>'
             for cell in row:
-                html.append(f'                    <td>{cell}</td>')
-            html.append('                </tr>')
-        html.append('            </tbody>')
-        
-        html.append('        </table>')
+                yield f'                    <td>{cell}</td>'
+            yield '                </tr>'
+        yield '            </tbody>'
         
-        return '\n'.join(html)
+        yield '        </table>'
     
     def _get_css(self) -> str:
         return '''
@@ -168,8 +177,8 @@ class HTMLExporter(BaseExporter):
         }
         '''
     
-    def get_extension(self) -> str:
+    def get_extension(self, options: Dict[str, Any] = None) -> str:
         return 'html'
     
-    def get_mime_type(self) -> str:
+    def get_mime_type(self, options: Dict[str, Any] = None) -> str:
         return 'text/html'
@@ -1,16 +1,17 @@
-import json
 from typing import Dict, Any
 from .base_exporter import BaseExporter
+from utils.serialization import dumps
 
 class JSONExporter(BaseExporter):
     def export(self, data: Dict[str, Any], options: Dict[str, Any] = None) -> str:
         options = options or {}
+        # orjson поддерживает только отступ в 2 пробела: любой indent > 0 - форматированный вывод
         indent = options.get('indent', 2)
         
-        return json.dumps(data, ensure_ascii=False, indent=indent)
+        return dumps(data, indent=bool(indent)).decode('utf-8')
     
-    def get_extension(self) -> str:
+    def get_extension(self, options: Dict[str, Any] = None) -> str:
         return 'json'
     
-    def get_mime_type(self) -> str:
+    def get_mime_type(self, options: Dict[str, Any] = None) -> str:
         return 'application/json'
@@ -1,13 +1,19 @@
-from typing import Dict, Any, List
-from .base_exporter import BaseExporter
+from typing import Dict, Any, Iterator
+from .base_exporter import BaseExporter, join_lines
 
 class MarkdownExporter(BaseExporter):
+    streaming = True
+    
     def export(self, data: Dict[str, Any], options: Dict[str, Any] = None) -> str:
-        lines = []
-        
+        return ''.join(self.iter_export(data, options))
+    
+    def iter_export(self, data: Dict[str, Any], options: Dict[str, Any] = None) -> Iterator[str]:
+        return join_lines(self._iter_lines(data))
+    
+    def _iter_lines(self, data: Dict[str, Any]) -> Iterator[str]:
         metadata = data.get('metadata', {})
         if metadata.get('title'):
-            lines.append(f"# {metadata['title']}\n")
+            yield f"# {metadata['title']}\n"
         
         content = data.get('content', {})
         structure = content.get('structure', [])
@@ -19,61 +25,60 @@ class MarkdownExporter(BaseExporter):
                 
                 if element_type == 'heading':
                     level = element.get('level', 1)
-                    lines.append(f"{'#' * level} {text}\n")
+                    yield f"{'#' * level} {text}\n"
                 
                 elif element_type == 'paragraph':
-                    lines.append(f"{text}\n")
+                    yield f"{text}\n"
                 
                 elif element_type == 'list_item':
-                    lines.append(f"- {text}")
+                    yield f"- {text}"
                 
                 elif element_type == 'bold':
-                    lines.append(f"**{text}**")
+                    yield f"**{text}**"
                 
                 elif 'elements' in element:
                     page = element.get('page', 0)
                     if page:
-                        lines.append(f"\n## Page {page}\n")
+                        yield f"\n## Page {page}\n"
                     
                     for el in element.get('elements', []):
                         el_text = el.get('text', '')
                         el_type = el.get('type', 'paragraph')
                         
                         if el_type == 'heading':
-                            lines.append(f"### {el_text}\n")
+                            yield f"### {el_text}\n"
                         elif el_type == 'bold':
-                            lines.append(f"**{el_text}**\n")
+                            yield f"**{el_text}**\n"
                         else:
-                            lines.append(f"{el_text}\n")
+                            yield f"{el_text}\n"
         
         tables = content.get('tables', [])
         if tables:
-            lines.append("\n## Tables\n")
+            yield "\n## Tables\n"
             for i, table in enumerate(tables, start=1):
-                lines.append(f"\n### Table {i}\n")
-                lines.append(self._table_to_markdown(table))
-        
-        return '\n'.join(lines)
+                yield f"\n### Table {i}\n"
+                if table.get('rows'):
+                    yield from self._iter_table_lines(table)
+                else:
+                    yield ''
     
     def _table_to_markdown(self, table: Dict[str, Any]) -> str:
+        return '\n'.join(self._iter_table_lines(table))
+    
+    def _iter_table_lines(self, table: Dict[str, Any]) -> Iterator[str]:
         rows = table.get('rows', [])
         if not rows:
-            return ''
-        
-        md_lines = []
+            return
         
-        if rows:
-            header = rows[0]
-            md_lines.append('| ' + ' | '.join(str(cell) for cell in header) + ' |')
-            md_lines.append('| ' + ' | '.join(['---'] * len(header)) + ' |')
-            
-            for row in rows[1:]:
-                md_lines.append('| ' + ' | '.join(str(cell) for cell in row) + ' |')
+        header = rows[0]
+        yield '| ' + ' | '.join(str(cell) for cell in header) + ' |'
+        yield '| ' + ' | '.join(['---'] * len(header)) + ' |'
         
-        return '\n'.join(md_lines)
+        for row in rows[1:]:
+            yield '| ' + ' | '.join(str(cell) for cell in row) + ' |'
     
-    def get_extension(self) -> str:
+    def get_extension(self, options: Dict[str, Any] = None) -> str:
         return 'md'
     
-    def get_mime_type(self) -> str:
+    def get_mime_type(self, options: Dict[str, Any] = None) -> str:
         return 'text/markdown'
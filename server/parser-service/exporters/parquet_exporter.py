@@ -0,0 +1,14 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+from typing import Dict, Any
+from .columnar_exporter import ColumnarExporter
+
+class ParquetExporter(ColumnarExporter):
+    def _write(self, table: pa.Table, sink: Any, options: Dict[str, Any]) -> None:
+        pq.write_table(table, sink, compression=options.get('compression', 'snappy'))
+    
+    def get_extension(self, options: Dict[str, Any] = None) -> str:
+        return 'parquet'
+    
+    def get_mime_type(self, options: Dict[str, Any] = None) -> str:
+        return 'application/vnd.apache.parquet'
@@ -1,36 +1,43 @@
-from typing import Dict, Any
-from .base_exporter import BaseExporter
+from typing import Dict, Any, Iterator
+from .base_exporter import BaseExporter, EXPORT_CHUNK_SIZE, join_lines
 
 class TextExporter(BaseExporter):
+    streaming = True
+    
     def export(self, data: Dict[str, Any], options: Dict[str, Any] = None) -> str:
+        return ''.join(self.iter_export(data, options))
+    
+    def iter_export(self, data: Dict[str, Any], options: Dict[str, Any] = None) -> Iterator[str]:
         options = options or {}
         preserve_structure = options.get('preserve_structure', False)
         
         if preserve_structure:
-            lines = []
-            structure = data.get('content', {}).get('structure', [])
-            
-            for element in structure:
-                if isinstance(element, dict):
-                    if element.get('type') == 'heading':
-                        level = element.get('level', 1)
-                        lines.append('\n' + '=' * 50)
-                        lines.append(element.get('text', ''))
-                        lines.append('=' * 50 + '\n')
-                    elif element.get('type') == 'paragraph':
-                        lines.append(element.get('text', ''))
-                        lines.append('')
-                    elif 'elements' in element:
-                        for el in element.get('elements', []):
-                            if el.get('text'):
-                                lines.append(el['text'])
-            
-            return '\n'.join(lines)
+            yield from join_lines(self._iter_lines(data))
         else:
-            return data.get('content', {}).get('text', '')
+            text = data.get('content', {}).get('text', '')
+            for start in range(0, len(text), EXPORT_CHUNK_SIZE):
+                yield text[start:start + EXPORT_CHUNK_SIZE]
+    
+    def _iter_lines(self, data: Dict[str, Any]) -> Iterator[str]:
+        structure = data.get('content', {}).get('structure', [])
+        
+        for element in structure:
+            if isinstance(element, dict):
+                if element.get('type') == 'heading':
+                    level = element.get('level', 1)
+                    yield '\n' + '=' * 50
+                    yield element.get('text', '')
+                    yield '=' * 50 + '\n'
+                elif element.get('type') == 'paragraph':
+                    yield element.get('text', '')
+                    yield ''
+                elif 'elements' in element:
+                    for el in element.get('elements', []):
+                        if el.get('text'):
+                            yield el['text']
     
-    def get_extension(self) -> str:
+    def get_extension(self, options: Dict[str, Any] = None) -> str:
         return 'txt'
     
-    def get_mime_type(self) -> str:
+    def get_mime_type(self, options: Dict[str, Any] = None) -> str:
         return 'text/plain'
@@ -1,37 +1,44 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import Response, FileResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
-import tempfile
+from fastapi.concurrency import run_in_threadpool
+from starlette.background import BackgroundTask
+from typing import Optional, Dict, Any, List, Tuple
+import asyncio
+import time
 import os
-import json
+import hashlib
+import zipfile
+import mimetypes
+from urllib.parse import quote
 from datetime import datetime
 
-from parsers.pdf_parser import PDFParser
-from parsers.docx_parser import DOCXParser
-from parsers.xlsx_parser import XLSXParser
-from parsers.txt_parser import TXTParser
-from parsers.html_parser import HTMLParser
-from parsers.image_parser import ImageParser
-from parsers.csv_parser import CSVParser
-from parsers.rtf_parser import RTFParser
-from parsers.odt_parser import ODTParser
-from parsers.eml_parser import EMLParser
-from parsers.archive_parser import ArchiveParser
+from parsers.registry import PARSERS, file_extension
 from exporters.json_exporter import JSONExporter
 from exporters.text_exporter import TextExporter
 from exporters.markdown_exporter import MarkdownExporter
 from exporters.excel_exporter import ExcelExporter
 from exporters.html_exporter import HTMLExporter
+from exporters.parquet_exporter import ParquetExporter
+from exporters.arrow_exporter import ArrowExporter
 
 # Утилиты для анализа
-from utils.ner import ner_extractor
-from utils.language_detector import language_detector
-from utils.document_classifier import document_classifier
 from utils.semantic_analyzer import semantic_analyzer
-from utils.data_cleaner import data_cleaner
-from utils.validators import file_validator
+from services.pipeline import parse_file, analyze_result, enabled_stages, InvalidDocumentError
+from services.batch_processor import batch_processor
+from services.blob_store import blob_store, parse_range, RangeNotSatisfiable
+from services.duplicate_index import duplicate_index
+from services.entity_index import entity_index, ENTITY_KINDS
+from services.export_cache import export_cache
+from services.job_store import job_store
+from services.result_store import result_store
+from services.scratch_space import scratch_space, ScratchQuotaExceeded
+from services.search_index import search_index, SearchQueryError
+from utils.structure_diff import diff_documents
+from utils.result_stream import parse_fields, select_fields, iter_result_records, encode_record
+from utils.serialization import ORJSONResponse, dumps, loads
+import celery_app
 
 import logging
 
@@ -42,7 +49,7 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Document Parser Service")
+app = FastAPI(title="Document Parser Service", default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -52,35 +59,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-PARSERS = {
-    'pdf': PDFParser,
-    'docx': DOCXParser,
-    'xlsx': XLSXParser,
-    'txt': TXTParser,
-    'html': HTMLParser,
-    'htm': HTMLParser,
-    'png': ImageParser,
-    'jpg': ImageParser,
-    'jpeg': ImageParser,
-    'bmp': ImageParser,
-    'tiff': ImageParser,
-    'csv': CSVParser,
-    'rtf': RTFParser,
-    'odt': ODTParser,
-    'eml': EMLParser,
-    'zip': ArchiveParser,
-    '7z': ArchiveParser,
-    'rar': ArchiveParser,
-}
-
 EXPORTERS = {
     'json': JSONExporter,
     'text': TextExporter,
     'markdown': MarkdownExporter,
     'excel': ExcelExporter,
     'html': HTMLExporter,
+    'parquet': ParquetExporter,
+    'arrow': ArrowExporter,
 }
 
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Максимум файлов в пакете /parse/batch (загруженных или внутри ZIP)
+BATCH_MAX_FILES = int(os.getenv('BATCH_MAX_FILES', '100'))
+
+# Интервал опроса статуса задания для потока событий и интервал keep-alive (секунды)
+JOB_POLL_INTERVAL = 0.5
+JOB_KEEPALIVE_INTERVAL = 15
+
 class ParseRequest(BaseModel):
     file_id: str
     options: Optional[Dict[str, Any]] = {}
@@ -90,6 +87,7 @@ class ParseOptions(BaseModel):
     enable_classification: bool = True
     enable_semantic_analysis: bool = True
     enable_language_detection: bool = True
+    enable_language_segmentation: bool = False
     clean_text: bool = True
 
 class ExportRequest(BaseModel):
@@ -97,10 +95,50 @@ class ExportRequest(BaseModel):
     format: str
     options: Optional[Dict[str, Any]] = {}
 
+@app.on_event("startup")
+async def load_scratch_space():
+    # Области заданий удаляются только после их завершения (по состояниям задач Celery)
+    scratch_space.finished_at = celery_app.job_finished_at
+    scratch_space.load()
+
+@app.on_event("shutdown")
+async def save_models():
+    semantic_analyzer.save_models()
+
 @app.get("/health")
 async def health_check():
     return {"status": "ok", "timestamp": datetime.utcnow().isoformat()}
 
+def parse_content(content: bytes, filename: str) -> Dict[str, Any]:
+    """
+    Валидация и базовый парсинг загруженного файла (без анализа).
+    
+    Args:
+        content: Содержимое файла
+        filename: Имя файла (по расширению выбирается парсер)
+    
+    Returns:
+        Результат парсинга с метаданными файла и document_id
+    """
+    file_ext = file_extension(filename)
+    
+    if file_ext not in PARSERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported file format: {file_ext}. Supported: {list(PARSERS.keys())}"
+        )
+    
+    try:
+        with scratch_space.scope() as scope_id:
+            tmp_path = scratch_space.write(scope_id, f"upload.{file_ext}", content)
+            return parse_file(tmp_path, filename, document_id=hashlib.sha256(content).hexdigest())
+    
+    except InvalidDocumentError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    except ScratchQuotaExceeded as e:
+        raise HTTPException(status_code=507, detail=str(e))
+
 @app.post("/parse")
 async def parse_document(
     file: UploadFile = File(...),
@@ -108,7 +146,10 @@ async def parse_document(
     enable_classification: bool = True,
     enable_semantic_analysis: bool = False,
     enable_language_detection: bool = True,
+    enable_language_segmentation: bool = False,
     clean_text: bool = False,
+    response_format: str = 'json',
+    fields: Optional[str] = None,
 ):
     """
     Парсинг документа с опциональным расширенным анализом.
@@ -119,118 +160,45 @@ async def parse_document(
         enable_classification: Включить классификацию документа
         enable_semantic_analysis: Включить семантический анализ
         enable_language_detection: Включить определение языка
+        enable_language_segmentation: Определять язык по абзацам (смешанные документы)
         clean_text: Включить очистку текста
+        response_format: json - один объект; ndjson - поток записей по мере готовности
+            (metadata, text, structure, table, table_rows, analysis, end)
+        fields: Выбор полей через запятую (text,tables,analysis.entities); metadata - всегда
     """
+    if response_format not in ('json', 'ndjson'):
+        raise HTTPException(status_code=400, detail=f"Unsupported response format: {response_format}")
+    
+    paths = parse_fields(fields)
+    
     try:
-        file_ext = file.filename.split('.')[-1].lower()
+        content = await file.read()
         
-        if file_ext not in PARSERS:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Unsupported file format: {file_ext}. Supported: {list(PARSERS.keys())}"
-            )
+        # 1-3. Валидация, базовый парсинг, метаданные
+        result = await run_in_threadpool(parse_content, content, file.filename)
         
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{file_ext}') as tmp:
-            content = await file.read()
-            tmp.write(content)
-            tmp_path = tmp.name
+        stages = analyze_result(
+            result,
+            file.filename,
+            enable_ner=enable_ner,
+            enable_classification=enable_classification,
+            enable_semantic_analysis=enable_semantic_analysis,
+            enable_language_detection=enable_language_detection,
+            enable_language_segmentation=enable_language_segmentation,
+            clean_text=clean_text,
+        )
         
-        try:
-            # 1. Валидация файла
-            validation = file_validator.validate_file(tmp_path)
-            if not validation['is_valid']:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"File validation failed: {validation['errors']}"
-                )
-            
-            # 2. Базовый парсинг
-            parser_class = PARSERS[file_ext]
-            parser = parser_class()
-            result = parser.parse(tmp_path)
-            
-            # 3. Добавление метаданных
-            result['metadata']['filename'] = file.filename
-            result['metadata']['size'] = len(content)
-            result['metadata']['size_mb'] = round(len(content) / (1024 * 1024), 2)
-            result['metadata']['parsed_at'] = datetime.utcnow().isoformat()
-            
-            # Проверка на ошибки парсинга
-            if 'error' in result['metadata']:
-                logger.warning(f"Parsing error for {file.filename}: {result['metadata']['error']}")
-                return JSONResponse(content=result, status_code=200)
-            
-            # 4. Получение текста
-            text = result.get('content', {}).get('text', '')
-            
-            if not text:
-                logger.warning(f"No text extracted from {file.filename}")
-                return JSONResponse(content=result)
-            
-            # 5. Очистка текста (опционально)
-            if clean_text:
-                text = data_cleaner.clean_text(text, aggressive=False)
-                result['content']['text'] = text
-                result['metadata']['text_cleaned'] = True
-            
-            # 6. Определение языка (опционально)
-            if enable_language_detection and len(text) > 20:
-                try:
-                    lang_info = language_detector.detect_language(text)
-                    result['analysis'] = result.get('analysis', {})
-                    result['analysis']['language'] = lang_info
-                    logger.info(f"Detected language: {lang_info.get('language', 'unknown')}")
-                except Exception as e:
-                    logger.error(f"Language detection failed: {e}")
-            
-            # 7. NER - Named Entity Recognition (опционально)
-            if enable_ner and len(text) > 20:
-                try:
-                    entities = ner_extractor.extract_all(text)
-                    result['analysis'] = result.get('analysis', {})
-                    result['analysis']['entities'] = entities
-                    logger.info(f"Extracted {entities['statistics']['total_entities']} entities")
-                except Exception as e:
-                    logger.error(f"NER failed: {e}")
-            
-            # 8. Классификация документа (опционально)
-            if enable_classification and len(text) > 50:
-                try:
-                    classification = document_classifier.classify(
-                        text,
-                        metadata=result.get('metadata', {})
-                    )
-                    result['analysis'] = result.get('analysis', {})
-                    result['analysis']['classification'] = classification
-                    logger.info(f"Classified as: {classification.get('document_type', 'unknown')}")
-                except Exception as e:
-                    logger.error(f"Classification failed: {e}")
-            
-            # 9. Семантический анализ (опционально, ресурсоемко)
-            if enable_semantic_analysis and len(text) > 100:
-                try:
-                    semantic = semantic_analyzer.analyze(text)
-                    result['analysis'] = result.get('analysis', {})
-                    result['analysis']['semantic'] = semantic
-                    logger.info(f"Semantic analysis: {len(semantic.get('keywords', []))} keywords")
-                except Exception as e:
-                    logger.error(f"Semantic analysis failed: {e}")
-            
-            # 10. Финальная статистика
-            if 'analysis' in result:
-                result['metadata']['analysis_performed'] = {
-                    'ner': enable_ner,
-                    'classification': enable_classification,
-                    'semantic': enable_semantic_analysis,
-                    'language': enable_language_detection,
-                }
-            
-            logger.info(f"Successfully parsed {file.filename}: {len(text)} chars")
-            return JSONResponse(content=result)
+        # Потоковый ответ: анализ выполняется по мере чтения ответа клиентом
+        if response_format == 'ndjson':
+            return StreamingResponse(
+                iter_result_records(result, stages, paths),
+                media_type='application/x-ndjson'
+            )
+        
+        for _ in stages:
+            pass
         
-        finally:
-            if os.path.exists(tmp_path):
-                os.unlink(tmp_path)
+        return ORJSONResponse(content=select_fields(result, paths))
     
     except HTTPException:
         raise
@@ -238,6 +206,139 @@ async def parse_document(
         logger.error(f"Unexpected error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+def extract_batch_archive(archive_path: str, scope_id: str) -> List[Tuple[str, str]]:
+    """
+    Файлы ZIP-пакета в области временных файлов.
+    
+    Returns:
+        Пары (путь к файлу, имя в архиве)
+    """
+    items = []
+    
+    with zipfile.ZipFile(archive_path) as zf:
+        members = [info for info in zf.infolist() if not info.is_dir()]
+        if len(members) > BATCH_MAX_FILES:
+            raise HTTPException(status_code=400, detail=f"Too many files in batch: {len(members)} > {BATCH_MAX_FILES}")
+        
+        for index, info in enumerate(members):
+            # Имя в области - по номеру: имена из архива не используются как пути
+            scratch_space.reserve(scope_id, info.file_size)
+            file_path = scratch_space.path(scope_id, f"{index}.{file_extension(info.filename)}")
+            
+            # Место учтено по размеру из заголовка архива: запись прерывается,
+            # как только распакованные данные его превышают
+            copied = 0
+            with zf.open(info) as src, open(file_path, 'wb') as dst:
+                while True:
+                    chunk = src.read(UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    copied += len(chunk)
+                    if copied > info.file_size:
+                        raise HTTPException(
+                            status_code=400,
+                            detail=f"Invalid archive: {info.filename} is larger than its declared size {info.file_size}"
+                        )
+                    dst.write(chunk)
+            items.append((file_path, info.filename))
+    
+    return items
+
+async def iter_batch_records(items: List[Tuple[str, str]], options: Dict[str, Any], paths: list):
+    """Записи NDJSON пакетной обработки: batch, result/error по мере готовности, end."""
+    def process(file_path: str, filename: str) -> Dict[str, Any]:
+        result = parse_file(file_path, filename)
+        for _ in analyze_result(result, filename, **options):
+            pass
+        return select_fields(result, paths)
+    
+    yield encode_record({'type': 'batch', 'files': [filename for _, filename in items]})
+    
+    failed = 0
+    async for index, result, error in batch_processor.process_files(items, process):
+        filename = items[index][1]
+        if error is not None:
+            failed += 1
+            yield encode_record({'type': 'error', 'index': index, 'filename': filename, 'detail': error})
+        else:
+            failed += 'error' in result['metadata']
+            yield encode_record({'type': 'result', 'index': index, 'filename': filename, 'data': result})
+    
+    yield encode_record({'type': 'end', 'total': len(items), 'failed': failed})
+
+@app.post("/parse/batch")
+async def parse_batch(
+    files: List[UploadFile] = File(...),
+    enable_ner: bool = True,
+    enable_classification: bool = True,
+    enable_semantic_analysis: bool = False,
+    enable_language_detection: bool = True,
+    enable_language_segmentation: bool = False,
+    clean_text: bool = False,
+    fields: Optional[str] = None,
+    unpack_archive: bool = True,
+):
+    """
+    Пакетный парсинг (вложения сообщения): файлы обрабатываются параллельно,
+    результаты - NDJSON по мере готовности.
+    
+    Записи: batch (имена файлов), result (index, filename, data) или
+    error (index, filename, detail) для каждого файла, end (total, failed).
+    
+    Args:
+        files: Файлы пакета
+        unpack_archive: Один ZIP - пакет его файлов, а не документ-архив
+        fields: Выбор полей результата как у /parse
+        Остальные параметры - как у /parse
+    """
+    if len(files) > BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"Too many files in batch: {len(files)} > {BATCH_MAX_FILES}")
+    
+    paths = parse_fields(fields)
+    options = {
+        'enable_ner': enable_ner,
+        'enable_classification': enable_classification,
+        'enable_semantic_analysis': enable_semantic_analysis,
+        'enable_language_detection': enable_language_detection,
+        'enable_language_segmentation': enable_language_segmentation,
+        'clean_text': clean_text,
+    }
+    
+    # Все файлы пакета - в одной области, она удаляется после отправки ответа.
+    # Учет места - в пуле потоков: при нехватке квоты запрашиваются состояния заданий Celery
+    scope_id = await run_in_threadpool(scratch_space.create)
+    try:
+        items = []
+        for index, file in enumerate(files):
+            file_path = scratch_space.path(scope_id, f"{index}.{file_extension(file.filename)}")
+            with open(file_path, 'wb') as f:
+                while True:
+                    chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    await run_in_threadpool(scratch_space.reserve, scope_id, len(chunk))
+                    f.write(chunk)
+            items.append((file_path, file.filename))
+        
+        if unpack_archive and len(items) == 1 and file_extension(items[0][1]) == 'zip':
+            items = await run_in_threadpool(extract_batch_archive, items[0][0], scope_id)
+    
+    except HTTPException:
+        scratch_space.release(scope_id)
+        raise
+    except ScratchQuotaExceeded as e:
+        scratch_space.release(scope_id)
+        raise HTTPException(status_code=507, detail=str(e))
+    except zipfile.BadZipFile as e:
+        scratch_space.release(scope_id)
+        raise HTTPException(status_code=400, detail=f"Invalid archive: {e}")
+    
+    return StreamingResponse(
+        iter_batch_records(items, options, paths),
+        media_type='application/x-ndjson',
+        background=BackgroundTask(scratch_space.release, scope_id)
+    )
+
 @app.post("/export")
 async def export_document(request: ExportRequest):
     try:
@@ -251,32 +352,472 @@ async def export_document(request: ExportRequest):
         
         exporter_class = EXPORTERS[export_format]
         exporter = exporter_class()
-        result = exporter.export(request.data, request.options)
+        filename = f"export.{exporter.get_extension(request.options)}"
         
-        if export_format == 'json':
-            return JSONResponse(content=json.loads(result))
-        else:
-            with tempfile.NamedTemporaryFile(
-                delete=False, 
-                suffix=f'.{exporter.get_extension()}',
-                mode='wb' if export_format == 'excel' else 'w',
-                encoding=None if export_format == 'excel' else 'utf-8'
-            ) as tmp:
-                if export_format == 'excel':
-                    tmp.write(result)
-                else:
-                    tmp.write(result.encode('utf-8') if isinstance(result, str) else result)
-                tmp_path = tmp.name
-            
-            return FileResponse(
-                tmp_path,
-                media_type=exporter.get_mime_type(),
-                filename=f"export.{exporter.get_extension()}"
+        # Текстовые форматы - потоком по мере генерации, без сборки файла целиком
+        if exporter.streaming:
+            return StreamingResponse(
+                exporter.iter_export(request.data, request.options),
+                media_type=exporter.get_mime_type(request.options),
+                headers={'Content-Disposition': f'attachment; filename="{filename}"'}
             )
+        
+        if export_format == 'json':
+            # Экспорт уже сериализован - отдается как есть, без повторного разбора
+            result = exporter.export(request.data, request.options)
+            return Response(content=result, media_type=exporter.get_mime_type(request.options))
+        
+        # Экспорт пишется сразу в файл (Excel - построчно), файл удаляется после отправки ответа
+        scope_id = await run_in_threadpool(scratch_space.create)
+        try:
+            tmp_path = scratch_space.path(scope_id, filename)
+            await run_in_threadpool(export_to_scratch, exporter, request.data, tmp_path, request.options, scope_id)
+        except Exception:
+            scratch_space.release(scope_id)
+            raise
+        
+        return FileResponse(
+            tmp_path,
+            media_type=exporter.get_mime_type(request.options),
+            filename=filename,
+            background=BackgroundTask(scratch_space.release, scope_id)
+        )
+    
+    except HTTPException:
+        raise
+    except ScratchQuotaExceeded as e:
+        raise HTTPException(status_code=507, detail=str(e))
+    except ValueError as e:
+        # Неверные параметры экспорта (например, номер таблицы)
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def export_to_scratch(exporter, data: Dict[str, Any], tmp_path: str, options: Dict[str, Any], scope_id: str) -> None:
+    """
+    Экспорт в файл области временных файлов.
+    
+    Место резервируется до записи - по размеру данных в JSON (колоночные
+    форматы и xlsx обычно не больше), после записи резерв уточняется по
+    размеру файла.
+    """
+    estimate = len(dumps(data))
+    scratch_space.reserve(scope_id, estimate)
+    exporter.export_to_file(data, tmp_path, options)
+    scratch_space.reserve(scope_id, os.path.getsize(tmp_path) - estimate)
+
+def iter_export_cached(exporter, result: Dict[str, Any], options: Dict[str, Any],
+                       tmp_path: str, scope_id: str, cache_key: Optional[str], filename: str):
+    """Части экспорта для ответа; параллельно пишутся в файл, который после полной отдачи кешируется."""
+    with open(tmp_path, 'wb') as f:
+        for chunk in exporter.iter_export(result, options):
+            data = chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+            scratch_space.reserve(scope_id, len(data))
+            f.write(data)
+            yield data
+    
+    # Клиент отключился раньше - генератор закрыт, неполный экспорт не кешируется
+    if cache_key is not None:
+        export_cache.put_file(cache_key, tmp_path, exporter.get_mime_type(options), filename)
+
+@app.get("/export/{result_id}")
+async def export_result(request: Request, result_id: str, format: str = 'json', options: Optional[str] = None):
+    """
+    Экспорт сохраненного результата парсинга без передачи его клиентом.
+    
+    Повторный экспорт той же версии результата в том же формате с теми же
+    параметрами отдается из кеша (хранилище блобов, поддерживается Range).
+    
+    Args:
+        result_id: document_id результата (sha256 файла)
+        format: Формат экспорта, как у POST /export
+        options: Параметры экспортера - JSON-объект
+    """
+    export_format = format.lower()
+    if export_format not in EXPORTERS:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format: {export_format}")
+    
+    try:
+        export_options = loads(options) if options else {}
+    except ValueError:
+        export_options = None
+    if not isinstance(export_options, dict):
+        raise HTTPException(status_code=400, detail="options must be a JSON object")
+    
+    exporter = EXPORTERS[export_format]()
+    media_type = exporter.get_mime_type(export_options)
+    
+    # Кеш проверяется до загрузки результата: версия - по stat файла результата,
+    # имя файла для ответа хранится в ссылке кеша. Результат без версии
+    # (нет на диске) не кешируется
+    version = result_store.version(result_id)
+    cache_key = export_cache.key(result_id, version, export_format, export_options) if version else None
+    
+    ref = await run_in_threadpool(export_cache.get, cache_key) if cache_key else None
+    if ref is not None:
+        return blob_response(ref['blob'], request, media_type, content_disposition(ref['filename']))
+    
+    # Экспорт кешируется под версией прочитанного результата: если результат
+    # перезаписали после проверки кеша, ключ соответствует новому содержимому
+    version, result = await run_in_threadpool(result_store.get_with_version, result_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Result not found: {result_id}")
+    cache_key = export_cache.key(result_id, version, export_format, export_options) if version else None
     
+    stem = os.path.splitext(os.path.basename(result.get('metadata', {}).get('filename') or 'export'))[0]
+    filename = f'{stem}.{exporter.get_extension(export_options)}'
+    headers = content_disposition(filename)
+    
+    scope_id = await run_in_threadpool(scratch_space.create)
+    tmp_path = scratch_space.path(scope_id, f"export.{exporter.get_extension(export_options)}")
+    
+    # Текстовые форматы - потоком сразу, с записью в кеш по окончании
+    if exporter.streaming:
+        return StreamingResponse(
+            iter_export_cached(exporter, result, export_options, tmp_path, scope_id, cache_key, filename),
+            media_type=media_type,
+            headers=headers,
+            background=BackgroundTask(scratch_space.release, scope_id)
+        )
+    
+    try:
+        await run_in_threadpool(export_to_scratch, exporter, result, tmp_path, export_options, scope_id)
+        ref = await run_in_threadpool(export_cache.put_file, cache_key, tmp_path, media_type, filename)
+    except ScratchQuotaExceeded as e:
+        raise HTTPException(status_code=507, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        scratch_space.release(scope_id)
+    
+    return blob_response(ref['blob'], request, media_type, headers)
+
+async def load_version(file: Optional[UploadFile], document_id: Optional[str]) -> Dict[str, Any]:
+    """
+    Результат парсинга версии документа для сравнения.
+    
+    Сначала ищется в хранилище результатов (по document_id или sha256 файла),
+    файл парсится только если его там нет. Результат одного парсинга сохраняется
+    без замены: полный результат /parse, записанный тем временем, остается.
+    """
+    if document_id:
+        result = result_store.get(document_id)
+        if result is None:
+            raise HTTPException(status_code=404, detail=f"Parse result not found: {document_id}")
+        return result
+    
+    if file is None:
+        raise HTTPException(status_code=400, detail="Either a file or a document_id is required for each version")
+    
+    content = await file.read()
+    result = result_store.get(hashlib.sha256(content).hexdigest())
+    
+    if result is None:
+        result = await run_in_threadpool(parse_content, content, file.filename)
+        if 'error' in result['metadata']:
+            raise HTTPException(status_code=422, detail=f"Parsing failed: {result['metadata']['error']}")
+        result_store.put(result['metadata']['document_id'], result, overwrite=False)
+    
+    return result
+
+@app.post("/diff")
+async def diff_versions(
+    file_a: Optional[UploadFile] = File(None),
+    file_b: Optional[UploadFile] = File(None),
+    document_id_a: Optional[str] = None,
+    document_id_b: Optional[str] = None,
+):
+    """
+    Структурное сравнение двух версий документа.
+    
+    Каждая версия задается файлом или document_id ранее разобранного документа.
+    
+    Args:
+        file_a: Старая версия (файл)
+        file_b: Новая версия (файл)
+        document_id_a: Старая версия (ID из хранилища результатов)
+        document_id_b: Новая версия (ID из хранилища результатов)
+    """
+    try:
+        result_a = await load_version(file_a, document_id_a)
+        result_b = await load_version(file_b, document_id_b)
+        
+        diff = diff_documents(result_a.get('content', {}), result_b.get('content', {}))
+        diff['document_id_a'] = result_a['metadata'].get('document_id')
+        diff['document_id_b'] = result_b['metadata'].get('document_id')
+        
+        logger.info(f"Diff: {diff['summary']}")
+        return ORJSONResponse(content=diff)
+    
+    except HTTPException:
+        raise
     except Exception as e:
+        logger.error(f"Diff failed: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/search")
+async def search_documents(
+    q: Optional[str] = None,
+    inn: Optional[str] = None,
+    kpp: Optional[str] = None,
+    ogrn: Optional[str] = None,
+    email: Optional[str] = None,
+    phone: Optional[str] = None,
+    fio: Optional[str] = None,
+    document_type: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0,
+):
+    """
+    Полнотекстовый поиск по разобранным документам (BM25).
+    
+    Args:
+        q: Запрос: слова, "фразы", AND/OR/NOT, префикс*
+        inn, kpp, ogrn, email, phone, fio: Фильтры по извлеченным сущностям
+        document_type: Фильтр по типу документа
+        limit: Размер страницы (1-100)
+        offset: Смещение страницы
+    """
+    if search_index is None:
+        raise HTTPException(status_code=503, detail="Search index is disabled")
+    
+    entities = {'inn': inn, 'kpp': kpp, 'ogrn': ogrn, 'email': email, 'phone': phone, 'fio': fio}
+    
+    try:
+        return search_index.search(
+            q,
+            entities={name: value for name, value in entities.items() if value},
+            document_type=document_type,
+            limit=max(1, min(limit, 100)),
+            offset=max(0, offset),
+        )
+    except SearchQueryError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid search query: {e}")
+
+@app.get("/entities/{kind}/{value}")
+async def find_documents_by_entity(kind: str, value: str, limit: int = 100, offset: int = 0):
+    """
+    Документы, в которых встречается сущность (ИНН, ОГРН, КПП, email, телефон, ФИО).
+    
+    Args:
+        kind: Вид сущности: inn, kpp, ogrn, email, phone, fio
+        value: Значение в любом формате (нормализуется)
+        limit: Размер страницы (1-1000)
+        offset: Смещение страницы
+    """
+    if kind not in ENTITY_KINDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown entity kind: {kind}. Supported: {', '.join(ENTITY_KINDS)}"
+        )
+    
+    try:
+        return entity_index.lookup(kind, value, limit=max(1, min(limit, 1000)), offset=max(0, offset))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/duplicates/{document_id}")
+async def find_duplicates(document_id: str, threshold: float = 0.5, limit: int = 20):
+    """
+    Почти-дубликаты ранее разобранного документа.
+    
+    Args:
+        document_id: ID документа (metadata.document_id из ответа /parse)
+        threshold: Минимальная оценка сходства Жаккара (0-1)
+        limit: Максимум результатов
+    """
+    duplicates = duplicate_index.find_duplicates(document_id, threshold=threshold, limit=limit)
+    
+    if duplicates is None:
+        raise HTTPException(status_code=404, detail=f"Document not indexed: {document_id}")
+    
+    return {
+        "document_id": document_id,
+        "duplicates": duplicates,
+        "total": len(duplicates),
+    }
+
+def content_disposition(filename: str) -> Dict[str, str]:
+    """Заголовок Content-Disposition для скачивания файла с именем filename (UTF-8)."""
+    return {'Content-Disposition': f"attachment; filename*=UTF-8''{quote(filename)}"}
+
+@app.get("/blobs/{blob_id}")
+async def get_blob(blob_id: str, request: Request, filename: Optional[str] = None):
+    """
+    Большой результат задачи Celery из хранилища блобов (поддерживается Range).
+    
+    Args:
+        blob_id: sha256 блоба (result_ref.blob в результате задачи)
+        filename: Имя файла для Content-Disposition (по расширению выбирается MIME-тип)
+    """
+    if not blob_store.exists(blob_id):
+        raise HTTPException(status_code=404, detail=f"Blob not found: {blob_id}")
+    
+    media_type = (mimetypes.guess_type(filename)[0] if filename else None) or 'application/octet-stream'
+    headers = content_disposition(os.path.basename(filename)) if filename else {}
+    
+    return blob_response(blob_id, request, media_type, headers)
+
+def blob_response(blob_id: str, request: Request, media_type: str, headers: Dict[str, str]) -> StreamingResponse:
+    """Потоковая отдача блоба целиком или диапазона из заголовка Range."""
+    size = blob_store.size(blob_id)
+    headers = {'Accept-Ranges': 'bytes', 'ETag': f'"{blob_id}"', **headers}
+    
+    try:
+        byte_range = parse_range(request.headers.get('range'), size)
+    except RangeNotSatisfiable:
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={'Content-Range': f"bytes */{size}"})
+    
+    if byte_range is None:
+        headers['Content-Length'] = str(size)
+        return StreamingResponse(blob_store.iter_range(blob_id), media_type=media_type, headers=headers)
+    
+    start, end = byte_range
+    headers['Content-Range'] = f"bytes {start}-{end}/{size}"
+    headers['Content-Length'] = str(end - start + 1)
+    return StreamingResponse(
+        blob_store.iter_range(blob_id, start, end),
+        status_code=206,
+        media_type=media_type,
+        headers=headers
+    )
+
+@app.post("/jobs", status_code=202)
+async def create_job(
+    file: UploadFile = File(...),
+    enable_ner: bool = True,
+    enable_classification: bool = True,
+    enable_semantic_analysis: bool = False,
+    enable_language_detection: bool = True,
+    enable_language_segmentation: bool = False,
+    clean_text: bool = False,
+):
+    """
+    Асинхронная обработка документа цепочкой задач Celery (параметры как у /parse).
+    
+    Returns:
+        job_id и адреса статуса (GET /jobs/{job_id}) и потока прогресса (GET /jobs/{job_id}/events)
+    """
+    file_ext = file_extension(file.filename)
+    if file_ext not in PARSERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported file format: {file_ext}. Supported: {list(PARSERS.keys())}"
+        )
+    
+    options = {
+        'enable_ner': enable_ner,
+        'enable_classification': enable_classification,
+        'enable_semantic_analysis': enable_semantic_analysis,
+        'enable_language_detection': enable_language_detection,
+        'enable_language_segmentation': enable_language_segmentation,
+        'clean_text': clean_text,
+    }
+    job = job_store.create(file.filename, options, enabled_stages(None, options))
+    job_id = job['job_id']
+    
+    # Файл пишется частями с подсчетом sha256 (document_id) на лету в область
+    # задания; воркер удаляет ее после обработки (pipeline.discard_upload)
+    await run_in_threadpool(scratch_space.create, job_id)
+    file_path = scratch_space.path(job_id, f"upload.{file_ext}")
+    digest = hashlib.sha256()
+    
+    try:
+        with open(file_path, 'wb') as f:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                await run_in_threadpool(scratch_space.reserve, job_id, len(chunk))
+                digest.update(chunk)
+                f.write(chunk)
+    except ScratchQuotaExceeded as e:
+        scratch_space.release(job_id)
+        raise HTTPException(status_code=507, detail=str(e))
+    except Exception:
+        scratch_space.release(job_id)
+        raise
+    
+    try:
+        pipeline = celery_app.analysis_pipeline(
+            file_path, file.filename, options,
+            document_id=digest.hexdigest(), job_id=job_id
+        )
+        await run_in_threadpool(pipeline.apply_async)
+    except Exception as e:
+        logger.error(f"Failed to submit job {job_id}: {e}")
+        scratch_space.release(job_id)
+        raise HTTPException(status_code=503, detail="Task queue unavailable")
+    
+    scratch_space.detach(job_id)
+    
+    return {
+        "job_id": job_id,
+        "status": "pending",
+        "status_url": f"/jobs/{job_id}",
+        "events_url": f"/jobs/{job_id}/events",
+    }
+
+def get_job(job_id: str) -> Dict[str, Any]:
+    """Запись задания или 404."""
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job
+
+@app.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """
+    Статус задания: pending/running/completed/failed, прогресс 0-100, текущий этап,
+    состояния задач; после завершения - document_id и result (или result_ref).
+    """
+    job = get_job(job_id)
+    return await run_in_threadpool(celery_app.get_job_status, job)
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, request: Request):
+    """
+    Поток прогресса задания (Server-Sent Events).
+    
+    При каждом изменении статуса - событие progress со статусом как у
+    GET /jobs/{job_id}; в конце - событие completed или failed, после
+    чего поток закрывается.
+    """
+    job = get_job(job_id)
+    
+    async def events():
+        last_status = None
+        last_sent = time.monotonic()
+        
+        while not await request.is_disconnected():
+            status = await run_in_threadpool(celery_app.get_job_status, job)
+            finished = status['status'] in ('completed', 'failed')
+            
+            if finished:
+                yield f"event: {status['status']}\ndata: {dumps(status).decode()}\n\n"
+                return
+            
+            if status != last_status:
+                yield f"event: progress\ndata: {dumps(status).decode()}\n\n"
+                last_status = status
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent > JOB_KEEPALIVE_INTERVAL:
+                yield ": keep-alive\n\n"
+                last_sent = time.monotonic()
+            
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+    
+    return StreamingResponse(
+        events(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.get("/scratch/stats")
+async def get_scratch_stats():
+    """Метрики временных файлов: области, занятое место, квота, удаления и вытеснения."""
+    return scratch_space.stats()
+
 @app.get("/formats")
 async def get_supported_formats():
     return {
@@ -7,7 +7,7 @@ import logging
 import os
 import tempfile
 import zipfile
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from .base_parser import BaseParser
 
 logger = logging.getLogger(__name__)
@@ -36,6 +36,9 @@ class ArchiveParser(BaseParser):
         'rtf', 'odt', 'eml', 'png', 'jpg', 'jpeg',
     }
     
+    # Файлов архива в одной части при парсинге по частям
+    UNIT_SIZE = 10
+    
     def __init__(self):
         """Инициализация парсера."""
         super().__init__()
@@ -53,6 +56,46 @@ class ArchiveParser(BaseParser):
         Returns:
             Структурированные данные
         """
+        return self._parse(file_path, depth)
+    
+    def split(self, file_path: str, unit_size: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Диапазоны [start, end) списка файлов архива по unit_size файлов."""
+        unit_size = unit_size or self.UNIT_SIZE
+        
+        archive_type = self._detect_archive_type(file_path)
+        if not archive_type:
+            return [{}]
+        
+        total = len(self._get_file_list(file_path, archive_type))
+        if total <= unit_size:
+            return [{}]
+        
+        return [{'members': [start, min(start + unit_size, total)]} for start in range(0, total, unit_size)]
+    
+    def parse_unit(self, file_path: str, unit: Dict[str, Any]) -> Dict[str, Any]:
+        return self._parse(file_path, members=unit.get('members'))
+    
+    def merge(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        failed = next((r for r in results if 'error' in r['metadata']), None)
+        if failed is not None:
+            return failed
+        
+        # Лимит max_files - на весь архив: файлы после max_files-го распарсенного отбрасываются
+        extracted_files = []
+        parsed_count = 0
+        for file_entry in (entry for r in results for entry in r['content']['files']):
+            if parsed_count >= self.max_files:
+                break
+            extracted_files.append(file_entry)
+            parsed_count += bool(file_entry.get('parsed'))
+        
+        result = self.create_result_structure()
+        result['metadata'] = dict(results[0]['metadata'])
+        self._finalize(result, extracted_files)
+        return result
+    
+    def _parse(self, file_path: str, depth: int = 0, members: Optional[List[int]] = None) -> Dict[str, Any]:
+        """Парсинг файлов архива members = [start, end) (по умолчанию - всех); метаданные - всего архива."""
         result = self.create_result_structure()
         
         # Защита от слишком глубокой вложенности
@@ -85,14 +128,19 @@ class ArchiveParser(BaseParser):
             # Извлечение и парсинг файлов
             extracted_files = []
             
+            selected = file_list[members[0]:members[1]] if members else file_list
+            
             with tempfile.TemporaryDirectory() as temp_dir:
-                # Извлечение архива
-                self._extract_archive(file_path, temp_dir, archive_type)
+                # Извлечение архива (только выбранных файлов)
+                self._extract_archive(file_path, temp_dir, archive_type,
+                                      [f['filename'] for f in selected] if members else None)
                 
                 # Обработка извлеченных файлов
                 parsed_count = 0
                 
-                for file_info in file_list:
+                for index, file_info in enumerate(selected, start=1):
+                    self.report_progress(index - 1, len(selected), f"File {index}/{len(selected)}: {file_info['filename']}")
+                    
                     if parsed_count >= self.max_files:
                         logger.warning(f"Reached max files limit: {self.max_files}")
                         break
@@ -127,25 +175,18 @@ class ArchiveParser(BaseParser):
                             file_entry['parse_error'] = str(e)
                     
                     extracted_files.append(file_entry)
+                
+                self.report_progress(len(selected), len(selected), "Archive extracted")
             
-            # Формирование текста (содержимое всех файлов)
-            text_parts = []
-            for file_entry in extracted_files:
-                if file_entry.get('parsed') and 'content' in file_entry:
-                    text_parts.append(f"\n=== {file_entry['filename']} ===\n")
-                    text_parts.append(file_entry['content'].get('text', ''))
-            
-            result['content']['text'] = '\n'.join(text_parts)
-            result['content']['files'] = extracted_files
+            self._finalize(result, extracted_files)
             
-            # Статистика
-            result['metadata']['parsed_files'] = parsed_count
+            # Статистика по всему архиву
             result['metadata']['total_size'] = sum(f.get('size', 0) for f in file_list)
             result['metadata']['total_size_mb'] = round(
                 result['metadata']['total_size'] / (1024 * 1024), 2
             )
             
-            logger.info(f"Archive parsed: {archive_type}, {len(file_list)} files, {parsed_count} parsed")
+            logger.info(f"Archive parsed: {archive_type}, {len(selected)} files, {parsed_count} parsed")
             
         except Exception as e:
             logger.error(f"Archive parsing error: {e}")
@@ -153,6 +194,18 @@ class ArchiveParser(BaseParser):
         
         return result
     
+    def _finalize(self, result: Dict[str, Any], extracted_files: List[Dict[str, Any]]) -> None:
+        """Текст (содержимое всех файлов), список файлов и число распарсенных."""
+        text_parts = []
+        for file_entry in extracted_files:
+            if file_entry.get('parsed') and 'content' in file_entry:
+                text_parts.append(f"\n=== {file_entry['filename']} ===\n")
+                text_parts.append(file_entry['content'].get('text', ''))
+        
+        result['content']['text'] = '\n'.join(text_parts)
+        result['content']['files'] = extracted_files
+        result['metadata']['parsed_files'] = sum(1 for f in extracted_files if f.get('parsed'))
+    
     def _detect_archive_type(self, file_path: str) -> str:
         """Определение типа архива."""
         ext = os.path.splitext(file_path)[1].lower()
@@ -214,20 +267,24 @@ class ArchiveParser(BaseParser):
         
         return file_list
     
-    def _extract_archive(self, file_path: str, extract_to: str, archive_type: str):
-        """Извлечение архива."""
+    def _extract_archive(self, file_path: str, extract_to: str, archive_type: str,
+                         members: Optional[List[str]] = None):
+        """Извлечение архива (members - только эти файлы)."""
         try:
             if archive_type == 'zip':
                 with zipfile.ZipFile(file_path, 'r') as zf:
-                    zf.extractall(extract_to)
+                    zf.extractall(extract_to, members)
             
             elif archive_type == '7z' and PY7ZR_AVAILABLE:
                 with py7zr.SevenZipFile(file_path, 'r') as szf:
-                    szf.extractall(extract_to)
+                    if members is None:
+                        szf.extractall(extract_to)
+                    else:
+                        szf.extract(extract_to, targets=members)
             
             elif archive_type == 'rar' and RARFILE_AVAILABLE:
                 with rarfile.RarFile(file_path, 'r') as rf:
-                    rf.extractall(extract_to)
+                    rf.extractall(extract_to, members)
         
         except Exception as e:
             logger.error(f"Archive extraction failed: {e}")
@@ -1,11 +1,75 @@
+import logging
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Колбэк прогресса парсинга: (обработано, всего, сообщение)
+ProgressCallback = Callable[[int, int, str], None]
 
 class BaseParser(ABC):
+    # Устанавливается вызывающим кодом (задачи Celery), по умолчанию прогресс не сообщается
+    progress_callback: Optional[ProgressCallback] = None
+    
     @abstractmethod
     def parse(self, file_path: str) -> Dict[str, Any]:
         pass
     
+    def report_progress(self, current: int, total: int, message: str = '') -> None:
+        """Сообщение о прогрессе (страница PDF, файл архива); ошибки колбэка не прерывают парсинг."""
+        if self.progress_callback is None:
+            return
+        
+        try:
+            self.progress_callback(current, total, message)
+        except Exception as e:
+            logger.warning(f"Progress callback failed: {e}")
+    
+    # Парсинг по частям (work units): задачи Celery разбивают большой документ
+    # на части (split), парсят их независимо (parse_unit) и собирают (merge).
+    # По умолчанию документ не делится - одна часть, это обычный parse.
+    
+    def split(self, file_path: str, unit_size: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Описания частей документа (JSON-совместимые, передаются в задачи).
+        
+        Args:
+            file_path: Путь к файлу
+            unit_size: Размер части в единицах формата (страницы, листы, строки, файлы);
+                None - по умолчанию для формата
+        
+        Returns:
+            Список частей; одна часть - документ не делится
+        """
+        return [{}]
+    
+    def parse_unit(self, file_path: str, unit: Dict[str, Any]) -> Dict[str, Any]:
+        """Парсинг одной части (результат той же структуры, что и parse)."""
+        return self.parse(file_path)
+    
+    def merge(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Сборка результатов частей (в порядке split) в результат документа."""
+        return results[0]
+    
+    def merge_content(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Общая сборка частей: метаданные первой части (или первая ошибка),
+        непустые тексты через перевод строки, списки content - подряд.
+        """
+        failed = next((r for r in results if 'error' in r['metadata']), None)
+        if failed is not None:
+            return failed
+        
+        text = '\n'.join(r['content']['text'] for r in results if r['content'].get('text'))
+        merged = {'metadata': dict(results[0]['metadata']), 'content': {'text': text}}
+        
+        for result in results:
+            for key, value in result['content'].items():
+                if isinstance(value, list):
+                    merged['content'].setdefault(key, []).extend(value)
+        
+        return merged
+    
     def create_result_structure(self) -> Dict[str, Any]:
         return {
             'metadata': {},
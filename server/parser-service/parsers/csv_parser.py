@@ -5,7 +5,7 @@ CSV Parser with automatic delimiter detection.
 
 import csv
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, BinaryIO, Iterable, Iterator, List, Optional, Tuple
 import chardet
 from .base_parser import BaseParser
 
@@ -15,6 +15,9 @@ logger = logging.getLogger(__name__)
 class CSVParser(BaseParser):
     """Парсер CSV файлов с авто-определением разделителя и кодировки."""
     
+    # Строк данных в одной части при парсинге по частям
+    UNIT_SIZE = 100000
+    
     def parse(self, file_path: str) -> Dict[str, Any]:
         """
         Парсинг CSV файла.
@@ -28,30 +31,12 @@ class CSVParser(BaseParser):
         result = self.create_result_structure()
         
         try:
-            # 1. Определение кодировки
-            encoding = self._detect_encoding(file_path)
-            logger.info(f"Detected encoding: {encoding}")
-            
-            # 2. Чтение первых строк для определения разделителя
-            with open(file_path, 'r', encoding=encoding, errors='replace') as f:
-                sample = f.read(4096)  # Читаем первые 4KB
-            
-            # 3. Определение разделителя
-            delimiter = self._detect_delimiter(sample)
-            logger.info(f"Detected delimiter: {repr(delimiter)}")
+            # 1-3. Кодировка и разделитель
+            encoding, delimiter = self._detect_format(file_path)
             
             # 4. Парсинг файла
-            rows = []
             with open(file_path, 'r', encoding=encoding, errors='replace', newline='') as f:
-                reader = csv.reader(f, delimiter=delimiter, quotechar='"', skipinitialspace=True)
-                
-                for row_idx, row in enumerate(reader):
-                    # Очистка пустых ячеек в конце
-                    while row and not row[-1].strip():
-                        row.pop()
-                    
-                    if row:  # Добавляем только непустые строки
-                        rows.append([cell.strip() for cell in row])
+                rows = list(self._iter_rows(f, delimiter))
             
             if not rows:
                 result['metadata']['error'] = 'Empty CSV file'
@@ -69,64 +54,214 @@ class CSVParser(BaseParser):
                 headers = [f'Column_{i+1}' for i in range(len(headers))]
                 data_rows = rows
             
-            # 6. Формирование результата
-            result['metadata'] = {
-                'type': 'csv',
+            self._build_result(result, encoding, delimiter, has_headers, headers, data_rows)
+            
+        except Exception as e:
+            logger.error(f"CSV parsing error: {e}")
+            result['metadata']['error'] = str(e)
+        
+        return result
+    
+    def split(self, file_path: str, unit_size: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Блоки по unit_size строк данных.
+        
+        Один проход по файлу: для начала каждого блока запоминается смещение
+        в байтах, поэтому часть читается с seek, а не с начала файла.
+        """
+        unit_size = unit_size or self.UNIT_SIZE
+        
+        try:
+            encoding, delimiter = self._detect_format(file_path)
+            if encoding.lower().replace('-', '').startswith(('utf16', 'utf32')):
+                # Построчное чтение байтов не подходит для многобайтовых переводов строк
+                return [{}]
+            
+            header_row = None
+            has_headers = None
+            offsets = []
+            data_count = 0
+            
+            with open(file_path, 'rb') as f:
+                row_start = 0
+                for row, row_end in self._iter_rows_with_offsets(f, encoding, delimiter):
+                    if header_row is None:
+                        header_row = row
+                        row_start = row_end
+                        continue
+                    
+                    if has_headers is None:
+                        # Заголовки определяются по первым двум строкам, как в parse
+                        has_headers = self._detect_headers([header_row, row])
+                        if not has_headers:
+                            offsets.append(0)
+                            data_count = 1
+                    
+                    if data_count % unit_size == 0:
+                        offsets.append(row_start)
+                    data_count += 1
+                    row_start = row_end
+        
+        except Exception as e:
+            logger.warning(f"CSV split failed, parsing as a whole: {e}")
+            return [{}]
+        
+        if has_headers is None or data_count <= unit_size:
+            return [{}]
+        
+        headers = header_row if has_headers else [f'Column_{i+1}' for i in range(len(header_row))]
+        
+        return [
+            {
+                'offset': offset,
+                'rows': min(unit_size, data_count - index * unit_size),
                 'encoding': encoding,
                 'delimiter': delimiter,
                 'has_headers': has_headers,
-                'row_count': len(data_rows),
-                'column_count': len(headers),
                 'headers': headers,
             }
+            for index, offset in enumerate(offsets)
+        ]
+    
+    def parse_unit(self, file_path: str, unit: Dict[str, Any]) -> Dict[str, Any]:
+        if 'offset' not in unit:
+            return self.parse(file_path)
+        
+        result = self.create_result_structure()
+        
+        try:
+            data_rows = []
+            with open(file_path, 'rb') as f:
+                f.seek(unit['offset'])
+                for row, _ in self._iter_rows_with_offsets(f, unit['encoding'], unit['delimiter']):
+                    data_rows.append(row)
+                    if len(data_rows) == unit['rows']:
+                        break
             
-            # 7. Преобразование в словари
-            structured_data = []
-            for row in data_rows:
-                # Дополняем строку пустыми значениями если нужно
-                while len(row) < len(headers):
-                    row.append('')
-                
-                row_dict = {
-                    headers[i]: row[i] if i < len(row) else ''
-                    for i in range(len(headers))
-                }
-                structured_data.append(row_dict)
-            
-            # 8. Текстовое представление
-            text_lines = []
-            text_lines.append(' | '.join(headers))
-            text_lines.append('-' * (len(' | '.join(headers))))
-            
-            for row in data_rows[:100]:  # Первые 100 строк в текст
-                text_lines.append(' | '.join(row))
-            
-            result['content']['text'] = '\n'.join(text_lines)
-            
-            # 9. Таблица
-            result['content']['tables'] = [{
-                'table_index': 0,
-                'headers': headers,
-                'rows': data_rows,
-                'row_count': len(data_rows),
-                'col_count': len(headers),
-                'data': structured_data,
-            }]
-            
-            # 10. Статистика
-            result['metadata']['total_cells'] = len(data_rows) * len(headers)
-            result['metadata']['empty_cells'] = sum(
-                1 for row in data_rows for cell in row if not cell.strip()
-            )
-            
-            logger.info(f"CSV parsed successfully: {len(data_rows)} rows, {len(headers)} columns")
-            
+            self._build_result(result, unit['encoding'], unit['delimiter'], unit['has_headers'],
+                               unit['headers'], data_rows)
+        
         except Exception as e:
             logger.error(f"CSV parsing error: {e}")
             result['metadata']['error'] = str(e)
         
         return result
     
+    def merge(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        failed = next((r for r in results if 'error' in r['metadata']), None)
+        if failed is not None:
+            return failed
+        
+        metadata = results[0]['metadata']
+        data_rows = [row for r in results for row in r['content']['tables'][0]['rows']]
+        
+        result = self.create_result_structure()
+        self._build_result(result, metadata['encoding'], metadata['delimiter'], metadata['has_headers'],
+                           metadata['headers'], data_rows)
+        return result
+    
+    def _detect_format(self, file_path: str) -> Tuple[str, str]:
+        """Кодировка и разделитель файла."""
+        # 1. Определение кодировки
+        encoding = self._detect_encoding(file_path)
+        logger.info(f"Detected encoding: {encoding}")
+        
+        # 2. Чтение первых строк для определения разделителя
+        with open(file_path, 'r', encoding=encoding, errors='replace') as f:
+            sample = f.read(4096)  # Читаем первые 4KB
+        
+        # 3. Определение разделителя
+        delimiter = self._detect_delimiter(sample)
+        logger.info(f"Detected delimiter: {repr(delimiter)}")
+        
+        return encoding, delimiter
+    
+    def _iter_rows(self, lines: Iterable[str], delimiter: str) -> Iterator[List[str]]:
+        """Непустые строки CSV с очищенными ячейками."""
+        reader = csv.reader(lines, delimiter=delimiter, quotechar='"', skipinitialspace=True)
+        
+        for row in reader:
+            # Очистка пустых ячеек в конце
+            while row and not row[-1].strip():
+                row.pop()
+            
+            if row:  # Добавляем только непустые строки
+                yield [cell.strip() for cell in row]
+    
+    def _iter_rows_with_offsets(self, f: BinaryIO, encoding: str, delimiter: str) -> Iterator[Tuple[List[str], int]]:
+        """
+        Непустые строки CSV из бинарного файла со смещением конца строки в байтах.
+        
+        csv.reader берет строки файла по одной (многострочные ячейки в
+        кавычках - несколько строк), поэтому после каждой строки CSV позиция
+        прочитанного - ровно ее конец.
+        """
+        position = f.tell()
+        
+        def lines() -> Iterator[str]:
+            nonlocal position
+            for line in iter(f.readline, b''):
+                position += len(line)
+                yield line.decode(encoding, errors='replace')
+        
+        for row in self._iter_rows(lines(), delimiter):
+            yield row, position
+    
+    def _build_result(self, result: Dict[str, Any], encoding: str, delimiter: str, has_headers: bool,
+                      headers: List[str], data_rows: List[List[str]]) -> None:
+        """Метаданные, таблица и текстовое представление по строкам данных (шаги 6-10)."""
+        # 6. Формирование результата
+        result['metadata'] = {
+            'type': 'csv',
+            'encoding': encoding,
+            'delimiter': delimiter,
+            'has_headers': has_headers,
+            'row_count': len(data_rows),
+            'column_count': len(headers),
+            'headers': headers,
+        }
+        
+        # 7. Преобразование в словари
+        structured_data = []
+        for row in data_rows:
+            # Дополняем строку пустыми значениями если нужно
+            while len(row) < len(headers):
+                row.append('')
+            
+            row_dict = {
+                headers[i]: row[i] if i < len(row) else ''
+                for i in range(len(headers))
+            }
+            structured_data.append(row_dict)
+        
+        # 8. Текстовое представление
+        text_lines = []
+        text_lines.append(' | '.join(headers))
+        text_lines.append('-' * (len(' | '.join(headers))))
+        
+        for row in data_rows[:100]:  # Первые 100 строк в текст
+            text_lines.append(' | '.join(row))
+        
+        result['content']['text'] = '\n'.join(text_lines)
+        
+        # 9. Таблица
+        result['content']['tables'] = [{
+            'table_index': 0,
+            'headers': headers,
+            'rows': data_rows,
+            'row_count': len(data_rows),
+            'col_count': len(headers),
+            'data': structured_data,
+        }]
+        
+        # 10. Статистика
+        result['metadata']['total_cells'] = len(data_rows) * len(headers)
+        result['metadata']['empty_cells'] = sum(
+            1 for row in data_rows for cell in row if not cell.strip()
+        )
+        
+        logger.info(f"CSV parsed successfully: {len(data_rows)} rows, {len(headers)} columns")
+    
     def _detect_encoding(self, file_path: str) -> str:
         """Определение кодировки файла."""
         try:
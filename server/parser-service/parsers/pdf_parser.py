@@ -1,10 +1,45 @@
 import fitz
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from .base_parser import BaseParser
 import re
 
 class PDFParser(BaseParser):
+    # Страниц в одной части при парсинге по частям
+    UNIT_SIZE = 50
+    
     def parse(self, file_path: str) -> Dict[str, Any]:
+        return self._parse(file_path)
+    
+    def split(self, file_path: str, unit_size: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Диапазоны страниц [start, end) по unit_size страниц."""
+        unit_size = unit_size or self.UNIT_SIZE
+        
+        try:
+            with fitz.open(file_path) as doc:
+                page_count = len(doc)
+        except Exception:
+            return [{}]
+        
+        if page_count <= unit_size:
+            return [{}]
+        
+        return [{'pages': [start, min(start + unit_size, page_count)]} for start in range(0, page_count, unit_size)]
+    
+    def parse_unit(self, file_path: str, unit: Dict[str, Any]) -> Dict[str, Any]:
+        if 'pages' not in unit:
+            return self.parse(file_path)
+        
+        start, end = unit['pages']
+        return self._parse(file_path, start, end)
+    
+    def merge(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        result = self.merge_content(results)
+        if 'error' not in result['metadata']:
+            self._statistics(result)
+        return result
+    
+    def _parse(self, file_path: str, start: int = 0, end: Optional[int] = None) -> Dict[str, Any]:
+        """Парсинг страниц [start, end) (по умолчанию - всех); метаданные - всего документа."""
         result = self.create_result_structure()
         
         try:
@@ -32,7 +67,11 @@ class PDFParser(BaseParser):
             images = []
             links = []
             
-            for page_num, page in enumerate(doc, start=1):
+            end = len(doc) if end is None else min(end, len(doc))
+            
+            for page_num in range(start + 1, end + 1):
+                page = doc[page_num - 1]
+                
                 # Извлечение текста с улучшенной семантикой
                 page_dict = page.get_text("dict")
                 blocks = page_dict.get("blocks", [])
@@ -106,6 +145,8 @@ class PDFParser(BaseParser):
                 page_links = self._extract_links(page, page_num)
                 if page_links:
                     links.extend(page_links)
+                
+                self.report_progress(page_num - start, end - start, f"Page {page_num}/{len(doc)}")
             
             result['content']['text'] = '\n'.join(full_text)
             result['content']['structure'] = structure
@@ -113,12 +154,7 @@ class PDFParser(BaseParser):
             result['content']['images'] = images
             result['content']['links'] = links
             
-            # Статистика
-            result['metadata']['word_count'] = len(' '.join(full_text).split())
-            result['metadata']['character_count'] = len(' '.join(full_text))
-            result['metadata']['table_count'] = len(tables)
-            result['metadata']['image_count'] = len(images)
-            result['metadata']['link_count'] = len(links)
+            self._statistics(result)
             
             doc.close()
             
@@ -127,6 +163,16 @@ class PDFParser(BaseParser):
         
         return result
     
+    def _statistics(self, result: Dict[str, Any]) -> None:
+        """Статистика по содержимому (после парсинга или сборки частей)."""
+        content = result['content']
+        
+        result['metadata']['word_count'] = len(content['text'].split())
+        result['metadata']['character_count'] = len(content['text'])
+        result['metadata']['table_count'] = len(content['tables'])
+        result['metadata']['image_count'] = len(content['images'])
+        result['metadata']['link_count'] = len(content['links'])
+    
     def _classify_element(self, text: str, font_size: float, font_flags: int, font_name: str) -> str:
         """Классификация элемента на основе характеристик"""
         # Проверка заголовков
@@ -0,0 +1,48 @@
+"""
+Parser Registry.
+Соответствие расширений файлов парсерам (общее для API и воркеров Celery).
+"""
+
+from typing import Dict, Type
+
+from .base_parser import BaseParser
+from .pdf_parser import PDFParser
+from .docx_parser import DOCXParser
+from .xlsx_parser import XLSXParser
+from .txt_parser import TXTParser
+from .html_parser import HTMLParser
+from .image_parser import ImageParser
+from .csv_parser import CSVParser
+from .rtf_parser import RTFParser
+from .odt_parser import ODTParser
+from .eml_parser import EMLParser
+from .archive_parser import ArchiveParser
+
+PARSERS: Dict[str, Type[BaseParser]] = {
+    'pdf': PDFParser,
+    'docx': DOCXParser,
+    'xlsx': XLSXParser,
+    'txt': TXTParser,
+    'html': HTMLParser,
+    'htm': HTMLParser,
+    'png': ImageParser,
+    'jpg': ImageParser,
+    'jpeg': ImageParser,
+    'bmp': ImageParser,
+    'tiff': ImageParser,
+    'csv': CSVParser,
+    'rtf': RTFParser,
+    'odt': ODTParser,
+    'eml': EMLParser,
+    'zip': ArchiveParser,
+    '7z': ArchiveParser,
+    'rar': ArchiveParser,
+}
+
+# Форматы, парсинг которых - OCR (выполняется в отдельной очереди)
+OCR_FORMATS = frozenset(ext for ext, parser_class in PARSERS.items() if parser_class is ImageParser)
+
+
+def file_extension(filename: str) -> str:
+    """Расширение файла в нижнем регистре (по нему выбирается парсер)."""
+    return filename.split('.')[-1].lower()
@@ -1,11 +1,43 @@
 import pandas as pd
 from openpyxl import load_workbook
 from openpyxl.utils import get_column_letter
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from .base_parser import BaseParser
 
 class XLSXParser(BaseParser):
+    # Листов в одной части при парсинге по частям
+    UNIT_SIZE = 1
+    
     def parse(self, file_path: str) -> Dict[str, Any]:
+        return self._parse(file_path)
+    
+    def split(self, file_path: str, unit_size: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Группы по unit_size листов."""
+        unit_size = unit_size or self.UNIT_SIZE
+        
+        try:
+            wb = load_workbook(file_path, read_only=True)
+            sheet_names = wb.sheetnames
+            wb.close()
+        except Exception:
+            return [{}]
+        
+        if len(sheet_names) <= unit_size:
+            return [{}]
+        
+        return [{'sheets': sheet_names[i:i + unit_size]} for i in range(0, len(sheet_names), unit_size)]
+    
+    def parse_unit(self, file_path: str, unit: Dict[str, Any]) -> Dict[str, Any]:
+        return self._parse(file_path, unit.get('sheets'))
+    
+    def merge(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        result = self.merge_content(results)
+        if 'error' not in result['metadata']:
+            self._statistics(result)
+        return result
+    
+    def _parse(self, file_path: str, sheets: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Парсинг листов sheets (по умолчанию - всех); метаданные - всей книги."""
         result = self.create_result_structure()
         
         try:
@@ -31,7 +63,7 @@ class XLSXParser(BaseParser):
             tables = []
             charts = []
             
-            for sheet_name in wb_data.sheetnames:
+            for sheet_name in sheets or wb_data.sheetnames:
                 sheet_data = wb_data[sheet_name]
                 sheet_formulas = wb_formulas[sheet_name]
                 
@@ -118,11 +150,7 @@ class XLSXParser(BaseParser):
             result['content']['tables'] = tables
             result['content']['charts'] = charts
             
-            # Статистика
-            result['metadata']['table_count'] = len(tables)
-            result['metadata']['chart_count'] = len(charts)
-            result['metadata']['cell_count'] = sum(sheet['max_row'] * sheet['max_column'] for sheet in structure)
-            result['metadata']['word_count'] = len(' '.join(all_text).split())
+            self._statistics(result)
             
             wb_data.close()
             wb_formulas.close()
@@ -131,3 +159,12 @@ class XLSXParser(BaseParser):
             result['metadata']['error'] = str(e)
         
         return result
+    
+    def _statistics(self, result: Dict[str, Any]) -> None:
+        """Статистика по содержимому (после парсинга или сборки частей)."""
+        content = result['content']
+        
+        result['metadata']['table_count'] = len(content['tables'])
+        result['metadata']['chart_count'] = len(content['charts'])
+        result['metadata']['cell_count'] = sum(sheet['max_row'] * sheet['max_column'] for sheet in content['structure'])
+        result['metadata']['word_count'] = len(content['text'].split())
@@ -0,0 +1,82 @@
+"""
+Переиндексация из хранилища результатов парсинга.
+
+Запуск из каталога сервиса:
+    python reindex.py search
+    python reindex.py entities
+    python reindex.py duplicates
+"""
+
+import argparse
+import logging
+import sys
+import time
+
+from services.duplicate_index import duplicate_index
+from services.entity_index import entity_index
+from services.result_store import result_store
+from services.search_index import search_index
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('reindex')
+
+
+def reindex_search() -> int:
+    """Полнотекстовый индекс: потоковая индексация всех сохраненных результатов."""
+    if search_index is None:
+        logger.error("Search index is disabled (SEARCH_ENABLED)")
+        return 1
+    
+    start = time.perf_counter()
+    indexed = search_index.index_results(result for _, result in result_store.iter_results())
+    
+    logger.info(f"Search index: {indexed} documents in {time.perf_counter() - start:.1f} s")
+    return 0
+
+
+def reindex_entities() -> int:
+    """Индекс сущностей: потоковая перезапись вхождений всех сохраненных результатов."""
+    start = time.perf_counter()
+    written = entity_index.index_results(result for _, result in result_store.iter_results())
+    
+    logger.info(f"Entity index: {written} postings in {time.perf_counter() - start:.1f} s")
+    return 0
+
+
+def reindex_duplicates() -> int:
+    """Индекс почти-дубликатов: сигнатуры всех сохраненных результатов."""
+    start = time.perf_counter()
+    indexed = 0
+    
+    for document_id, result in result_store.iter_results():
+        metadata = result.get('metadata', {})
+        indexed += duplicate_index.add(document_id, result.get('content', {}).get('text', ''), {
+            'filename': metadata.get('filename'),
+            'type': metadata.get('type'),
+            'parsed_at': metadata.get('parsed_at'),
+        })
+    
+    logger.info(f"Duplicate index: {indexed} documents in {time.perf_counter() - start:.1f} s")
+    return 0
+
+
+COMMANDS = {
+    'duplicates': reindex_duplicates,
+    'entities': reindex_entities,
+    'search': reindex_search,
+}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Rebuild indexes from cached parse results")
+    parser.add_argument('index', choices=sorted(COMMANDS), help="Index to rebuild")
+    args = parser.parse_args()
+    
+    return COMMANDS[args.index]()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
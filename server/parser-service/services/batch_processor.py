@@ -5,13 +5,18 @@ Batch Processing Service.
 
 import logging
 import asyncio
-from typing import List, Dict, Any, Optional
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, AsyncIterator, Callable, Tuple
 from enum import Enum
 from datetime import datetime
 import uuid
 
 logger = logging.getLogger(__name__)
 
+# Параллельных задач пакетной обработки (потоков пула)
+BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', '4'))
+
 
 class TaskStatus(str, Enum):
     """Статусы задач."""
@@ -97,6 +102,52 @@ class BatchProcessor:
         self.tasks: Dict[str, BatchTask] = {}
         self.queue: List[BatchTask] = []
         self.active_tasks: Dict[str, BatchTask] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+    
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Пул потоков пакетной обработки (создается при первом обращении)."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='batch')
+        return self._executor
+    
+    async def process_files(
+        self,
+        items: List[Tuple[str, str]],
+        process: Callable[[str, str], Dict[str, Any]],
+    ) -> AsyncIterator[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]:
+        """
+        Параллельная обработка файлов в пуле потоков (не более max_workers сразу).
+        
+        Анализаторы (NER, классификатор, модели) - общие экземпляры процесса,
+        поэтому все файлы пакета используют уже загруженное состояние.
+        
+        Args:
+            items: Пары (путь к файлу, исходное имя)
+            process: Обработка одного файла: process(путь, имя) -> запись результата
+        
+        Yields:
+            (номер файла в items, запись, None) или (номер, None, ошибка)
+            по мере готовности
+        """
+        loop = asyncio.get_running_loop()
+        
+        async def run(index: int, file_path: str, file_name: str):
+            try:
+                return index, await loop.run_in_executor(self.executor, process, file_path, file_name), None
+            except Exception as e:
+                logger.error(f"Batch file failed: {file_name}, error: {e}")
+                return index, None, str(e)
+        
+        tasks = [asyncio.ensure_future(run(index, *item)) for index, item in enumerate(items)]
+        
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Клиент отключился: еще не начатые файлы не обрабатываются
+            for task in tasks:
+                task.cancel()
     
     async def add_task(self, task: BatchTask) -> str:
         """
@@ -311,4 +362,4 @@ class BatchProcessor:
 
 
 # Глобальный экземпляр
-batch_processor = BatchProcessor(max_workers=4)
+batch_processor = BatchProcessor(max_workers=BATCH_WORKERS)
@@ -0,0 +1,251 @@
+"""
+Blob Store.
+Контентно-адресуемое хранилище больших результатов (вне Redis result backend Celery).
+"""
+
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import time
+from typing import Dict, Any, Iterable, Iterator, Optional, Tuple, Union
+
+from utils.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.getenv('DATA_DIR', '/app/data')
+
+# Результаты больше порога кладутся в хранилище, в Celery возвращается ссылка
+BLOB_INLINE_LIMIT = int(os.getenv('BLOB_INLINE_LIMIT', str(256 * 1024)))
+
+# Время жизни блобов (секунды)
+BLOB_TTL = int(os.getenv('BLOB_TTL', str(24 * 3600)))
+
+# Размер блока при записи и чтении
+CHUNK_SIZE = 64 * 1024
+
+# Имя блоба - hex sha256 содержимого
+BLOB_ID_RE = re.compile(r'[0-9a-f]{64}')
+
+RANGE_RE = re.compile(r'bytes=(\d*)-(\d*)')
+
+
+class RangeNotSatisfiable(ValueError):
+    """Запрошенный диапазон байт вне блоба."""
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Разбор заголовка Range (один диапазон байт).
+    
+    Args:
+        header: Значение заголовка ("bytes=0-1023", "bytes=1024-", "bytes=-512")
+        size: Размер блоба
+    
+    Returns:
+        (start, end) включительно; None если заголовка нет или он не поддерживается
+        (несколько диапазонов) - тогда отдается блоб целиком
+    """
+    if not header:
+        return None
+    
+    match = RANGE_RE.fullmatch(header.strip())
+    if match is None:
+        return None
+    
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    
+    if not start:
+        # Суффикс: последние N байт
+        length = int(end)
+        if length == 0:
+            raise RangeNotSatisfiable(header)
+        return max(0, size - length), size - 1
+    
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise RangeNotSatisfiable(header)
+    
+    return start, end
+
+
+class BlobStore:
+    """
+    Контентно-адресуемое хранилище файлов.
+    
+    Блоб хранится в root/<первые 2 символа sha256>/<sha256>; одинаковое
+    содержимое записывается один раз. Запись идет во временный файл с
+    подсчетом хеша на лету и атомарным переименованием, поэтому блоб можно
+    записывать частями, не держа его целиком в памяти. Каталог должен быть
+    общим для API и воркеров Celery.
+    """
+    
+    def __init__(self, root: str, ttl: int = BLOB_TTL):
+        """
+        Инициализация хранилища.
+        
+        Args:
+            root: Каталог хранилища
+            ttl: Время жизни блобов в секундах (для cleanup)
+        """
+        self.root = root
+        self.ttl = ttl
+    
+    @staticmethod
+    def is_valid_id(blob_id: str) -> bool:
+        """Проверка формата ID блоба."""
+        return bool(blob_id) and BLOB_ID_RE.fullmatch(blob_id) is not None
+    
+    def put(self, data: Union[bytes, Iterable[bytes]], media_type: str = 'application/octet-stream') -> Dict[str, Any]:
+        """
+        Сохранение блоба.
+        
+        Args:
+            data: Содержимое целиком или итератор частей
+            media_type: MIME-тип (только для ссылки)
+        
+        Returns:
+            Ссылка на блоб: {'blob': sha256, 'size', 'media_type', 'location'}
+        """
+        chunks = [data] if isinstance(data, (bytes, bytearray, memoryview)) else data
+        
+        os.makedirs(self.root, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            
+            blob_id = digest.hexdigest()
+            path = self.path(blob_id)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            
+            if os.path.exists(path):
+                # Такое содержимое уже есть: продлеваем срок жизни
+                os.utime(path)
+                os.unlink(tmp_path)
+            else:
+                os.replace(tmp_path, path)
+        
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        
+        return {
+            'blob': blob_id,
+            'size': size,
+            'media_type': media_type,
+            'location': f"/blobs/{blob_id}",
+        }
+    
+    def path(self, blob_id: str) -> str:
+        """Путь к файлу блоба."""
+        return os.path.join(self.root, blob_id[:2], blob_id)
+    
+    def exists(self, blob_id: str) -> bool:
+        """Наличие блоба."""
+        return self.is_valid_id(blob_id) and os.path.isfile(self.path(blob_id))
+    
+    def size(self, blob_id: str) -> int:
+        """Размер блоба в байтах."""
+        return os.path.getsize(self.path(blob_id))
+    
+    def read(self, blob_id: str) -> bytes:
+        """Содержимое блоба целиком."""
+        with open(self.path(blob_id), 'rb') as f:
+            return f.read()
+    
+    def iter_range(self, blob_id: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """
+        Потоковое чтение диапазона байт блоба.
+        
+        Args:
+            blob_id: ID блоба
+            start: Первый байт
+            end: Последний байт включительно (None - до конца)
+        """
+        with open(self.path(blob_id), 'rb') as f:
+            f.seek(start)
+            remaining = (end - start + 1) if end is not None else None
+            
+            while remaining is None or remaining > 0:
+                chunk = f.read(CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+    
+    def delete(self, blob_id: str) -> bool:
+        """Удаление блоба."""
+        if not self.exists(blob_id):
+            return False
+        
+        os.unlink(self.path(blob_id))
+        return True
+    
+    def cleanup(self, max_age: Optional[int] = None) -> int:
+        """
+        Удаление блобов старше max_age секунд (и брошенных временных файлов).
+        
+        Returns:
+            Количество удаленных файлов
+        """
+        if not os.path.isdir(self.root):
+            return 0
+        
+        deadline = time.time() - (self.ttl if max_age is None else max_age)
+        removed = 0
+        
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    if os.path.getmtime(path) < deadline:
+                        os.unlink(path)
+                        removed += 1
+                except OSError as e:
+                    logger.error(f"Failed to remove blob {path}: {e}")
+        
+        return removed
+
+
+def offload(store: BlobStore, payload: Any, media_type: str,
+            inline_limit: int = BLOB_INLINE_LIMIT) -> Tuple[Optional[Any], Optional[Dict[str, Any]]]:
+    """
+    Вынос большого результата задачи в хранилище блобов.
+    
+    Args:
+        store: Хранилище блобов
+        payload: bytes, str или JSON-совместимый объект
+        media_type: MIME-тип содержимого
+        inline_limit: Максимальный размер результата, возвращаемого через Celery как есть
+    
+    Returns:
+        (payload, None) если результат небольшой и сериализуется в JSON;
+        (None, ссылка на блоб) иначе
+    """
+    if isinstance(payload, (bytes, bytearray)):
+        # bytes не проходят через json-сериализатор Celery - только ссылкой
+        return None, store.put(bytes(payload), media_type)
+    
+    data = payload.encode('utf-8') if isinstance(payload, str) else dumps(payload)
+    if len(data) <= inline_limit:
+        return payload, None
+    
+    return None, store.put(data, media_type)
+
+
+# Глобальный экземпляр
+blob_store = BlobStore(os.path.join(DATA_DIR, 'blobs'))
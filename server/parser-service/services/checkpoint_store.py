@@ -0,0 +1,111 @@
+"""
+Checkpoint Store.
+Результаты частей (work units) документа при парсинге по частям в Celery:
+повторная доставка задач запуска пропускает уже готовые части.
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Dict, Any, Optional
+
+from utils.serialization import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.getenv('DATA_DIR', '/app/data')
+
+# Время жизни брошенных чекпойнтов (секунды); после сборки документа они удаляются сразу
+CHECKPOINT_TTL = int(os.getenv('CHECKPOINT_TTL', str(24 * 3600)))
+
+
+class CheckpointStore:
+    """
+    Чекпойнты частей документа: root/<ID запуска>/<номер>-<хеш описания части>.json.
+    
+    Каталог принадлежит запуску цепочки задач (services.pipeline.pipeline_run_id),
+    а не документу: задания по одному файлу не видят и не удаляют чекпойнты
+    друг друга. Хеш описания части входит в имя файла: если разбиение изменилось
+    (другой размер части), старые чекпойнты не подходят и не используются.
+    """
+    
+    def __init__(self, root: str, ttl: int = CHECKPOINT_TTL):
+        """
+        Инициализация хранилища.
+        
+        Args:
+            root: Каталог чекпойнтов (общий для воркеров)
+            ttl: Время жизни чекпойнтов в секундах (для cleanup)
+        """
+        self.root = root
+        self.ttl = ttl
+    
+    def exists(self, run_id: str, index: int, unit: Dict[str, Any]) -> bool:
+        """Часть уже обработана."""
+        return os.path.exists(self._path(run_id, index, unit))
+    
+    def get(self, run_id: str, index: int, unit: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Результат части или None."""
+        path = self._path(run_id, index, unit)
+        if not os.path.exists(path):
+            return None
+        
+        try:
+            with open(path, 'rb') as f:
+                return loads(f.read())
+        except Exception as e:
+            logger.error(f"Failed to read checkpoint {path}: {e}")
+            return None
+    
+    def put(self, run_id: str, index: int, unit: Dict[str, Any], result: Dict[str, Any]) -> None:
+        """Сохранение результата части (атомарная запись файла)."""
+        path = self._path(run_id, index, unit)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        
+        with open(tmp_path, 'wb') as f:
+            f.write(dumps(result))
+        os.replace(tmp_path, path)
+    
+    def count(self, run_id: str) -> int:
+        """Количество готовых частей запуска."""
+        run_dir = os.path.join(self.root, run_id)
+        if not os.path.isdir(run_dir):
+            return 0
+        
+        return sum(1 for name in os.listdir(run_dir) if name.endswith('.json'))
+    
+    def clear(self, run_id: str) -> None:
+        """Удаление чекпойнтов запуска (после сборки)."""
+        shutil.rmtree(os.path.join(self.root, run_id), ignore_errors=True)
+    
+    def cleanup(self, max_age: Optional[int] = None) -> int:
+        """Удаление чекпойнтов запусков, не обновлявшихся max_age секунд."""
+        if not os.path.isdir(self.root):
+            return 0
+        
+        deadline = time.time() - (self.ttl if max_age is None else max_age)
+        removed = 0
+        
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            try:
+                if os.path.getmtime(path) < deadline:
+                    shutil.rmtree(path)
+                    removed += 1
+            except OSError as e:
+                logger.error(f"Failed to remove checkpoints {path}: {e}")
+        
+        return removed
+    
+    def _path(self, run_id: str, index: int, unit: Dict[str, Any]) -> str:
+        """Путь к чекпойнту части."""
+        unit_hash = hashlib.sha1(dumps(unit)).hexdigest()[:12]
+        return os.path.join(self.root, run_id, f"{index:06d}-{unit_hash}.json")
+
+
+# Глобальный экземпляр
+checkpoint_store = CheckpointStore(os.path.join(DATA_DIR, 'checkpoints'))
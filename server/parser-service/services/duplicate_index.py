@@ -0,0 +1,290 @@
+"""
+Near-duplicate Detection Service.
+Поиск почти-дубликатов документов: MinHash-сигнатуры шинглов текста и LSH-индекс.
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+from utils.serialization import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+try:
+    import Levenshtein
+    LEVENSHTEIN_AVAILABLE = True
+except ImportError:
+    logger.warning("python-Levenshtein not available, duplicates will not be verified")
+    LEVENSHTEIN_AVAILABLE = False
+
+DATA_DIR = os.getenv('DATA_DIR', '/app/data')
+
+# Все, кроме букв и цифр, для шинглов не важно (PDF/DOCX/скан различаются разметкой)
+NON_WORD_RE = re.compile(r'[\W_]+')
+
+# Множитель полиномиального хеша шинглов
+SHINGLE_BASE = np.uint64(1000003)
+
+# Шинглов в одном блоке вычисления сигнатуры (ограничивает память)
+SIGNATURE_CHUNK = 8192
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS settings (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS documents (
+    document_id TEXT PRIMARY KEY,
+    signature BLOB NOT NULL,
+    excerpt TEXT NOT NULL,
+    metadata BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS bands (
+    band INTEGER NOT NULL,
+    key BLOB NOT NULL,
+    document_id TEXT NOT NULL,
+    PRIMARY KEY (band, key, document_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS bands_document ON bands(document_id);
+"""
+
+
+class DuplicateIndex:
+    """
+    LSH-индекс MinHash-сигнатур документов.
+    
+    Текст нормализуется (регистр, только буквы и цифры) и разбивается на
+    символьные шинглы; сигнатура - минимумы num_perm хеш-функций по шинглам.
+    Сигнатура режется на bands полос, документы с совпадающей полосой
+    попадают в одну корзину - поэтому поиск кандидатов не зависит от размера
+    индекса. Кандидаты проверяются оценкой Жаккара по сигнатурам и
+    расстоянием Левенштейна по нормализованным фрагментам текста.
+    
+    Документы и корзины (таблица bands, ключ (полоса, ключ полосы)) хранятся
+    в SQLite и читаются при каждом поиске, поэтому API видит документы,
+    добавленные воркерами Celery. База открывается при первом обращении,
+    поэтому соединение не переживает fork.
+    """
+    
+    def __init__(
+        self,
+        index_path: Optional[str] = None,
+        num_perm: int = 128,
+        bands: int = 32,
+        shingle_size: int = 5,
+        verify_chars: int = 4000,
+        seed: int = 42,
+    ):
+        """
+        Инициализация индекса.
+        
+        Args:
+            index_path: Путь к базе SQLite индекса; None - только в памяти
+            num_perm: Длина MinHash-сигнатуры
+            bands: Количество полос LSH (num_perm должно делиться на bands)
+            shingle_size: Длина символьного шингла
+            verify_chars: Длина фрагмента нормализованного текста для проверки Левенштейном
+            seed: Seed хеш-функций (должен совпадать между перезапусками)
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        
+        self.index_path = index_path
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.verify_chars = verify_chars
+        self.seed = seed
+        
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 2 ** 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 2 ** 32, size=num_perm, dtype=np.uint64)
+        
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+    
+    def normalize(self, text: str) -> str:
+        """Нормализованный текст для шинглов и сравнения."""
+        return NON_WORD_RE.sub(' ', text.lower()).strip()
+    
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """
+        MinHash-сигнатура текста.
+        
+        Args:
+            text: Нормализованный текст
+        
+        Returns:
+            Массив uint32 длины num_perm или None, если текст короче шингла
+        """
+        codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+        k = self.shingle_size
+        if len(codes) < k:
+            return None
+        
+        # Полиномиальный хеш каждого k-грама (векторно, с переполнением по модулю 2^64)
+        hashes = np.zeros(len(codes) - k + 1, dtype=np.uint64)
+        with np.errstate(over='ignore'):
+            for offset in range(k):
+                hashes = hashes * SHINGLE_BASE + codes[offset:offset + len(hashes)]
+        
+        shingles = np.unique(hashes & np.uint64(0xFFFFFFFF))
+        
+        # Универсальное хеширование (a * x + b) mod 2^32 для каждой перестановки;
+        # блоками, чтобы матрица num_perm x шинглы не росла с размером документа
+        signature = np.full(self.num_perm, 0xFFFFFFFF, dtype=np.uint64)
+        with np.errstate(over='ignore'):
+            for start in range(0, len(shingles), SIGNATURE_CHUNK):
+                chunk = shingles[start:start + SIGNATURE_CHUNK]
+                permuted = (np.outer(self._a, chunk) + self._b[:, None]) & np.uint64(0xFFFFFFFF)
+                np.minimum(signature, permuted.min(axis=1), out=signature)
+        
+        return signature.astype(np.uint32)
+    
+    def add(self, document_id: str, text: str, metadata: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Добавление (или замена) документа в индексе.
+        
+        Args:
+            document_id: ID документа (sha256 содержимого файла)
+            text: Текст документа (content.text)
+            metadata: Краткие метаданные (имя файла, тип)
+        
+        Returns:
+            True если документ проиндексирован
+        """
+        normalized = self.normalize(text or '')
+        signature = self.signature(normalized)
+        if signature is None:
+            return False
+        
+        bands = [(band, key, document_id) for band, key in enumerate(self._band_keys(signature))]
+        
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute('DELETE FROM bands WHERE document_id = ?', (document_id,))
+                conn.execute(
+                    'INSERT OR REPLACE INTO documents (document_id, signature, excerpt, metadata) VALUES (?, ?, ?, ?)',
+                    (document_id, signature.tobytes(), normalized[:self.verify_chars], dumps(metadata or {})),
+                )
+                conn.executemany('INSERT OR IGNORE INTO bands (band, key, document_id) VALUES (?, ?, ?)', bands)
+        
+        return True
+    
+    def find_duplicates(self, document_id: str, threshold: float = 0.5,
+                        limit: int = 20) -> Optional[List[Dict[str, Any]]]:
+        """
+        Почти-дубликаты проиндексированного документа.
+        
+        Args:
+            document_id: ID документа
+            threshold: Минимальная оценка сходства Жаккара
+            limit: Максимум результатов
+        
+        Returns:
+            Список дубликатов по убыванию сходства; None если документа нет в индексе
+        """
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                'SELECT signature, excerpt FROM documents WHERE document_id = ?', (document_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            
+            signature, excerpt = np.frombuffer(row[0], dtype=np.uint32), row[1]
+            
+            # Кандидаты - документы хотя бы с одной общей полосой (поиск по ключу таблицы bands)
+            keys = self._band_keys(signature)
+            candidate_rows = conn.execute(
+                'WITH query(band, key) AS (VALUES ' + ', '.join(['(?, ?)'] * len(keys)) + ') '
+                'SELECT d.document_id, d.signature, d.excerpt, d.metadata FROM documents d '
+                'WHERE d.document_id != ? AND d.document_id IN '
+                '(SELECT b.document_id FROM query q JOIN bands b ON b.band = q.band AND b.key = q.key)',
+                [value for band, key in enumerate(keys) for value in (band, key)] + [document_id],
+            ).fetchall()
+        
+        duplicates = []
+        for doc_id, candidate_signature, candidate_excerpt, metadata in candidate_rows:
+            jaccard = float(np.mean(np.frombuffer(candidate_signature, dtype=np.uint32) == signature))
+            if jaccard < threshold:
+                continue
+            
+            duplicate = {
+                'document_id': doc_id,
+                'jaccard': round(jaccard, 4),
+                'metadata': loads(metadata),
+            }
+            if LEVENSHTEIN_AVAILABLE:
+                duplicate['similarity'] = round(Levenshtein.ratio(excerpt, candidate_excerpt), 4)
+            
+            duplicates.append(duplicate)
+        
+        duplicates.sort(key=lambda d: (d.get('similarity', d['jaccard']), d['jaccard']), reverse=True)
+        return duplicates[:limit]
+    
+    def remove(self, document_id: str) -> bool:
+        """Удаление документа из индекса."""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute('DELETE FROM bands WHERE document_id = ?', (document_id,))
+                cursor = conn.execute('DELETE FROM documents WHERE document_id = ?', (document_id,))
+        
+        return cursor.rowcount > 0
+    
+    def count(self) -> int:
+        """Количество документов в индексе."""
+        with self._lock:
+            return self._connection().execute('SELECT count(*) FROM documents').fetchone()[0]
+    
+    def _connection(self) -> sqlite3.Connection:
+        """
+        Ленивое открытие базы (вызывается под блокировкой); индекс с другими
+        параметрами сигнатур очищается (пересборка - reindex.py duplicates).
+        """
+        if self._conn is not None:
+            return self._conn
+        
+        db_path = self.index_path or ':memory:'
+        if self.index_path:
+            os.makedirs(os.path.dirname(self.index_path) or '.', exist_ok=True)
+        
+        conn = sqlite3.connect(db_path, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(SCHEMA)
+        
+        settings = {'num_perm': self.num_perm, 'bands': self.bands,
+                    'shingle_size': self.shingle_size, 'seed': self.seed}
+        with conn:
+            stored = dict(conn.execute('SELECT name, value FROM settings').fetchall())
+            if stored != settings:
+                if stored:
+                    logger.warning("Duplicate index does not match configuration; rebuilding")
+                conn.execute('DELETE FROM bands')
+                conn.execute('DELETE FROM documents')
+                conn.execute('DELETE FROM settings')
+                conn.executemany('INSERT OR REPLACE INTO settings (name, value) VALUES (?, ?)', settings.items())
+        
+        self._conn = conn
+        return conn
+    
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        """Ключи полос LSH."""
+        return [
+            signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            for band in range(self.bands)
+        ]
+
+
+# Глобальный экземпляр
+duplicate_index = DuplicateIndex(index_path=os.path.join(DATA_DIR, 'duplicates.db'))
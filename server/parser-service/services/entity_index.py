@@ -0,0 +1,287 @@
+"""
+Entity Index Service.
+Индекс вхождений сущностей (ИНН, ОГРН, КПП, email, телефоны, ФИО) по документам.
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, Any, Callable, Iterable, List, Optional, Set, Tuple
+
+import phonenumbers
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.getenv('DATA_DIR', '/app/data')
+
+NON_DIGIT_RE = re.compile(r'\D+')
+SPACE_RE = re.compile(r'\s+')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS postings (
+    kind TEXT NOT NULL,
+    value TEXT NOT NULL,
+    document_id TEXT NOT NULL,
+    PRIMARY KEY (kind, value, document_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_document ON postings(document_id);
+"""
+
+
+def _digits(value: Any, lengths: Tuple[int, ...]) -> Optional[str]:
+    """Цифровой регистрационный номер допустимой длины."""
+    digits = NON_DIGIT_RE.sub('', str(value))
+    return digits if len(digits) in lengths else None
+
+
+def normalize_inn(value: Any) -> Optional[str]:
+    """ИНН: 10 или 12 цифр."""
+    return _digits(value, (10, 12))
+
+
+def normalize_kpp(value: Any) -> Optional[str]:
+    """КПП: 9 цифр."""
+    return _digits(value, (9,))
+
+
+def normalize_ogrn(value: Any) -> Optional[str]:
+    """ОГРН: 13 цифр (ОГРНИП - 15)."""
+    return _digits(value, (13, 15))
+
+
+def normalize_email(value: Any) -> Optional[str]:
+    """Email в нижнем регистре."""
+    email = str(value).strip().lower()
+    return email if '@' in email else None
+
+
+def normalize_phone(value: Any) -> Optional[str]:
+    """Телефон в формате E.164 (+7XXXXXXXXXX); номера без кода страны считаются российскими."""
+    if isinstance(value, dict):
+        value = value.get('formatted') or value.get('raw', '')
+    
+    try:
+        number = phonenumbers.parse(str(value), 'RU')
+    except phonenumbers.NumberParseException:
+        return None
+    
+    if not phonenumbers.is_possible_number(number):
+        return None
+    
+    return phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.E164)
+
+
+def normalize_fio(value: Any) -> Optional[str]:
+    """ФИО: одиночные пробелы, каждое слово с заглавной, ё -> е."""
+    fio = SPACE_RE.sub(' ', str(value)).strip()
+    if not fio:
+        return None
+    
+    return fio.replace('ё', 'е').replace('Ё', 'Е').title()
+
+
+# Вид сущности -> (ключ в analysis.entities, нормализатор)
+ENTITY_KINDS: Dict[str, Tuple[str, Callable[[Any], Optional[str]]]] = {
+    'inn': ('inn', normalize_inn),
+    'kpp': ('kpp', normalize_kpp),
+    'ogrn': ('ogrn', normalize_ogrn),
+    'email': ('emails', normalize_email),
+    'phone': ('phones', normalize_phone),
+    'fio': ('fio', normalize_fio),
+}
+
+
+def normalize_entity(kind: str, value: Any) -> Optional[str]:
+    """
+    Нормализованное значение сущности.
+    
+    Args:
+        kind: Вид сущности (ключ ENTITY_KINDS)
+        value: Значение из NERExtractor или из запроса
+    
+    Returns:
+        Нормализованная строка или None, если значение некорректно
+    """
+    if kind not in ENTITY_KINDS or value is None:
+        return None
+    
+    return ENTITY_KINDS[kind][1](value)
+
+
+def document_entities(result: Dict[str, Any]) -> Set[Tuple[str, str]]:
+    """Уникальные пары (вид, нормализованное значение) из результата парсинга."""
+    entities = result.get('analysis', {}).get('entities', {})
+    
+    pairs = set()
+    for kind, (key, normalize) in ENTITY_KINDS.items():
+        for value in entities.get(key) or []:
+            normalized = normalize(value)
+            if normalized:
+                pairs.add((kind, normalized))
+    
+    return pairs
+
+
+class EntityIndex:
+    """
+    Постинг-список сущность -> документы на SQLite.
+    
+    Ключ таблицы (kind, value, document_id) хранится кластерно (WITHOUT ROWID),
+    поэтому поиск документов по сущности - один проход по диапазону B-дерева
+    и занимает O(k) для k документов. Запись идет батчами по batch_size
+    вхождений в транзакции, так что память при массовой индексации ограничена.
+    """
+    
+    def __init__(self, db_path: str = ':memory:', batch_size: int = 5000):
+        """
+        Инициализация индекса (соединение открывается при первом обращении).
+        
+        Args:
+            db_path: Путь к файлу базы SQLite; ':memory:' - только в памяти
+            batch_size: Вхождений сущностей в одной транзакции
+        """
+        self.db_path = db_path
+        self.batch_size = batch_size
+        
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+    
+    def _connection(self) -> sqlite3.Connection:
+        """Ленивое открытие базы и создание схемы (вызывается под блокировкой)."""
+        if self._conn is None:
+            if self.db_path != ':memory:':
+                os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        
+        return self._conn
+    
+    def index_result(self, result: Dict[str, Any]) -> int:
+        """
+        Замена вхождений сущностей документа по результату парсинга.
+        
+        Args:
+            result: Результат парсинга с metadata.document_id и analysis.entities
+        
+        Returns:
+            Количество записанных вхождений
+        """
+        return self.index_results([result])
+    
+    def index_results(self, results: Iterable[Dict[str, Any]]) -> int:
+        """
+        Массовая индексация (вхождения копятся до batch_size и пишутся одной транзакцией).
+        
+        Args:
+            results: Результаты парсинга
+        
+        Returns:
+            Количество записанных вхождений
+        """
+        written = 0
+        documents: List[str] = []
+        postings: List[Tuple[str, str, str]] = []
+        
+        for result in results:
+            document_id = result.get('metadata', {}).get('document_id')
+            if not document_id:
+                continue
+            
+            documents.append(document_id)
+            postings.extend((kind, value, document_id) for kind, value in document_entities(result))
+            
+            if len(postings) >= self.batch_size:
+                written += self._write_batch(documents, postings)
+                documents, postings = [], []
+        
+        if documents:
+            written += self._write_batch(documents, postings)
+        
+        return written
+    
+    def lookup(self, kind: str, value: str, limit: int = 100, offset: int = 0) -> Dict[str, Any]:
+        """
+        Документы, в которых встречается сущность.
+        
+        Args:
+            kind: Вид сущности (inn, kpp, ogrn, email, phone, fio)
+            value: Значение (нормализуется так же, как при индексации)
+            limit: Размер страницы
+            offset: Смещение страницы
+        
+        Returns:
+            Dict с нормализованным значением, общим количеством и страницей document_id
+        """
+        if kind not in ENTITY_KINDS:
+            raise ValueError(f"Unknown entity kind: {kind}")
+        
+        normalized = normalize_entity(kind, value)
+        if normalized is None:
+            raise ValueError(f"Invalid {kind} value: {value}")
+        
+        with self._lock:
+            conn = self._connection()
+            total = conn.execute(
+                'SELECT count(*) FROM postings WHERE kind = ? AND value = ?', (kind, normalized)
+            ).fetchone()[0]
+            rows = conn.execute(
+                'SELECT document_id FROM postings WHERE kind = ? AND value = ? '
+                'ORDER BY document_id LIMIT ? OFFSET ?',
+                (kind, normalized, limit, offset),
+            ).fetchall()
+        
+        return {
+            'kind': kind,
+            'value': normalized,
+            'total': total,
+            'limit': limit,
+            'offset': offset,
+            'document_ids': [row[0] for row in rows],
+        }
+    
+    def entities_of(self, document_id: str) -> Dict[str, List[str]]:
+        """Проиндексированные сущности документа по видам."""
+        with self._lock:
+            rows = self._connection().execute(
+                'SELECT kind, value FROM postings WHERE document_id = ? ORDER BY kind, value', (document_id,)
+            ).fetchall()
+        
+        entities: Dict[str, List[str]] = {}
+        for kind, value in rows:
+            entities.setdefault(kind, []).append(value)
+        
+        return entities
+    
+    def remove(self, document_id: str) -> bool:
+        """Удаление всех вхождений документа."""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                cursor = conn.execute('DELETE FROM postings WHERE document_id = ?', (document_id,))
+        
+        return cursor.rowcount > 0
+    
+    def count(self) -> int:
+        """Количество вхождений в индексе."""
+        with self._lock:
+            return self._connection().execute('SELECT count(*) FROM postings').fetchone()[0]
+    
+    def _write_batch(self, documents: List[str], postings: List[Tuple[str, str, str]]) -> int:
+        """Замена вхождений батча документов в одной транзакции."""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany('DELETE FROM postings WHERE document_id = ?', ((d,) for d in documents))
+                conn.executemany('INSERT OR IGNORE INTO postings (kind, value, document_id) VALUES (?, ?, ?)', postings)
+        
+        return len(postings)
+
+
+# Глобальный экземпляр
+entity_index = EntityIndex(os.path.join(DATA_DIR, 'entities.db'))
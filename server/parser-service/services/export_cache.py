@@ -0,0 +1,123 @@
+"""
+Export Cache.
+Кеш готовых экспортов сохраненных результатов парсинга: ключ (результат, его версия,
+формат, параметры) -> блоб в хранилище блобов.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Any, Optional
+
+from services.blob_store import BlobStore, blob_store, BLOB_TTL, CHUNK_SIZE
+from utils.serialization import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.getenv('DATA_DIR', '/app/data')
+
+
+class ExportCache:
+    """
+    Ссылки на экспорты: root/<первые 2 символа ключа>/<ключ>.json -> ссылка на блоб.
+    
+    Сам экспорт хранится в хранилище блобов (одинаковое содержимое - один файл)
+    и удаляется его cleanup; ссылка на удаленный блоб считается промахом.
+    В ключ входит версия результата, поэтому после повторного парсинга
+    документа старые экспорты не используются.
+    """
+    
+    def __init__(self, root: str, blobs: BlobStore, ttl: int = BLOB_TTL):
+        """
+        Инициализация кеша.
+        
+        Args:
+            root: Каталог ссылок
+            blobs: Хранилище блобов с содержимым экспортов
+            ttl: Время жизни ссылок в секундах (для cleanup)
+        """
+        self.root = root
+        self.blobs = blobs
+        self.ttl = ttl
+    
+    @staticmethod
+    def key(result_id: str, version: str, export_format: str, options: Dict[str, Any]) -> str:
+        """Ключ экспорта; порядок параметров не важен."""
+        options_json = json.dumps(options or {}, sort_keys=True, default=str)
+        return hashlib.sha256(f"{result_id}:{version}:{export_format}:{options_json}".encode('utf-8')).hexdigest()
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Ссылка на блоб экспорта или None."""
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        
+        try:
+            with open(path, 'rb') as f:
+                ref = loads(f.read())
+        except Exception as e:
+            logger.error(f"Failed to read export cache entry {key}: {e}")
+            return None
+        
+        return ref if self.blobs.exists(ref.get('blob')) else None
+    
+    def put_file(self, key: Optional[str], file_path: str, media_type: str,
+                 filename: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Сохранение файла экспорта в хранилище блобов и ссылки на него под ключом.
+        
+        Args:
+            key: Ключ экспорта; None - только сохранение блоба
+            file_path: Готовый файл экспорта
+            media_type: MIME-тип
+            filename: Имя файла для Content-Disposition (отдача из кеша без загрузки результата)
+        
+        Returns:
+            Ссылка на блоб
+        """
+        with open(file_path, 'rb') as f:
+            ref = self.blobs.put(iter(lambda: f.read(CHUNK_SIZE), b''), media_type)
+        
+        if filename is not None:
+            ref = {**ref, 'filename': filename}
+        
+        if key is not None:
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(dumps(ref))
+            os.replace(tmp_path, path)
+        
+        return ref
+    
+    def cleanup(self, max_age: Optional[int] = None) -> int:
+        """Удаление ссылок старше max_age секунд."""
+        if not os.path.isdir(self.root):
+            return 0
+        
+        deadline = time.time() - (self.ttl if max_age is None else max_age)
+        removed = 0
+        
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    if os.path.getmtime(path) < deadline:
+                        os.unlink(path)
+                        removed += 1
+                except OSError as e:
+                    logger.error(f"Failed to remove export cache entry {path}: {e}")
+        
+        return removed
+    
+    def _path(self, key: str) -> str:
+        """Путь к ссылке."""
+        return os.path.join(self.root, key[:2], f"{key}.json")
+
+
+# Глобальный экземпляр
+export_cache = ExportCache(os.path.join(DATA_DIR, 'exports'), blob_store)
@@ -0,0 +1,198 @@
+"""
+Job Store.
+Асинхронные задания обработки документов: записи заданий и сводный статус цепочки задач Celery.
+"""
+
+import logging
+import os
+import re
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from utils.serialization import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.getenv('DATA_DIR', '/app/data')
+
+# Время жизни записей заданий (секунды)
+JOB_TTL = int(os.getenv('JOB_TTL', str(24 * 3600)))
+
+JOB_ID_RE = re.compile(r'[0-9a-f]{32}')
+
+# Вклад этапов в общий прогресс задания (%): парсинг, анализ, сборка результата
+PARSE_WEIGHT = 60
+ANALYSIS_WEIGHT = 35
+
+FAILED_STATES = ('FAILURE', 'REVOKED')
+
+
+def task_id(job_id: str, name: str) -> str:
+    """ID задачи Celery этапа задания (parse, этапы анализа, merge)."""
+    return f"{job_id}-{name}"
+
+
+def job_tasks(job: Dict[str, Any]) -> List[str]:
+    """Задачи задания в порядке выполнения."""
+    return ['parse', *job.get('stages', []), 'merge']
+
+
+def job_status(job: Dict[str, Any], tasks: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Сводный статус задания по состояниям его задач.
+    
+    Args:
+        job: Запись задания
+        tasks: Имя задачи -> {'state': состояние Celery, 'info': метаданные или результат}
+    
+    Returns:
+        Dict со статусом (pending/running/completed/failed), прогрессом 0-100,
+        текущим этапом, состояниями задач и результатом после завершения
+    """
+    stages = job.get('stages', [])
+    states = {name: tasks.get(name, {}).get('state', 'PENDING') for name in job_tasks(job)}
+    
+    # Прогресс: парсинг сообщает свой прогресс (страницы, файлы архива), этапы анализа - по завершении
+    parse = tasks.get('parse', {})
+    if states['parse'] == 'SUCCESS':
+        progress = PARSE_WEIGHT
+    elif states['parse'] == 'PROGRESS' and isinstance(parse.get('info'), dict):
+        progress = PARSE_WEIGHT * parse['info'].get('progress', 0) // 100
+    else:
+        progress = 0
+    
+    if states['parse'] == 'SUCCESS':
+        done = sum(1 for name in stages if states[name] == 'SUCCESS')
+        progress += ANALYSIS_WEIGHT * done // len(stages) if stages else ANALYSIS_WEIGHT
+    
+    if states['merge'] == 'SUCCESS':
+        progress = 100
+    
+    failed = next((name for name in job_tasks(job) if states[name] in FAILED_STATES), None)
+    current = next((name for name in job_tasks(job) if states[name] != 'SUCCESS'), None)
+    
+    if failed:
+        status = 'failed'
+    elif states['merge'] == 'SUCCESS':
+        status = 'completed'
+    elif any(state != 'PENDING' for state in states.values()):
+        status = 'running'
+    else:
+        status = 'pending'
+    
+    summary = {
+        'job_id': job['job_id'],
+        'filename': job.get('filename'),
+        'created_at': job.get('created_at'),
+        'status': status,
+        'progress': progress,
+        'stage': failed or current,
+        'message': parse['info'].get('message') if states['parse'] == 'PROGRESS' and isinstance(parse.get('info'), dict) else None,
+        'tasks': {name: states[name] for name in job_tasks(job)},
+    }
+    
+    if failed:
+        summary['error'] = str(tasks[failed].get('info'))
+    
+    if status == 'completed':
+        result = tasks['merge'].get('info') or {}
+        summary['document_id'] = result.get('document_id')
+        summary['result'] = result.get('result')
+        summary['result_ref'] = result.get('result_ref')
+    
+    return summary
+
+
+class JobStore:
+    """
+    Записи асинхронных заданий (JSON-файлы в каталоге root).
+    
+    Состояние выполнения хранится в result backend Celery по ID задач
+    задания (task_id); запись задания нужна, чтобы знать состав цепочки.
+    """
+    
+    def __init__(self, root: str, ttl: int = JOB_TTL):
+        """
+        Инициализация хранилища.
+        
+        Args:
+            root: Каталог записей заданий
+            ttl: Время жизни записей в секундах (для cleanup)
+        """
+        self.root = root
+        self.ttl = ttl
+    
+    def create(self, filename: str, options: Dict[str, Any], stages: List[str]) -> Dict[str, Any]:
+        """
+        Создание записи задания.
+        
+        Args:
+            filename: Имя загруженного файла
+            options: Параметры обработки
+            stages: Этапы анализа цепочки задач
+        
+        Returns:
+            Запись задания с новым job_id
+        """
+        job = {
+            'job_id': uuid.uuid4().hex,
+            'filename': filename,
+            'options': options,
+            'stages': stages,
+            'created_at': datetime.utcnow().isoformat(),
+        }
+        
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(job['job_id'])
+        tmp_path = f"{path}.tmp"
+        
+        with open(tmp_path, 'wb') as f:
+            f.write(dumps(job))
+        os.replace(tmp_path, path)
+        
+        return job
+    
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Запись задания или None."""
+        if not job_id or JOB_ID_RE.fullmatch(job_id) is None:
+            return None
+        
+        path = self._path(job_id)
+        if not os.path.exists(path):
+            return None
+        
+        try:
+            with open(path, 'rb') as f:
+                return loads(f.read())
+        except Exception as e:
+            logger.error(f"Failed to read job {job_id}: {e}")
+            return None
+    
+    def cleanup(self, max_age: Optional[int] = None) -> int:
+        """Удаление записей старше max_age секунд."""
+        if not os.path.isdir(self.root):
+            return 0
+        
+        deadline = time.time() - (self.ttl if max_age is None else max_age)
+        removed = 0
+        
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            try:
+                if os.path.getmtime(path) < deadline:
+                    os.unlink(path)
+                    removed += 1
+            except OSError as e:
+                logger.error(f"Failed to remove job {path}: {e}")
+        
+        return removed
+    
+    def _path(self, job_id: str) -> str:
+        """Путь к файлу записи."""
+        return os.path.join(self.root, f"{job_id}.json")
+
+
+# Глобальный экземпляр
+job_store = JobStore(os.path.join(DATA_DIR, 'jobs'))
@@ -0,0 +1,365 @@
+"""
+Document Processing Pipeline.
+Этапы обработки документа (парсинг, очистка, анализ, индексация), общие для
+синхронного /parse и цепочек задач Celery.
+"""
+
+import hashlib
+import logging
+import os
+import uuid
+from datetime import datetime
+from typing import Dict, Any, Callable, Iterator, List, Optional
+
+from parsers.base_parser import BaseParser, ProgressCallback
+from parsers.registry import PARSERS, file_extension
+from utils.ner import ner_extractor
+from utils.language_detector import language_detector
+from utils.document_classifier import document_classifier
+from utils.semantic_analyzer import semantic_analyzer
+from utils.data_cleaner import data_cleaner
+from utils.validators import file_validator
+from utils.analysis_context import AnalysisContext
+from services.duplicate_index import duplicate_index
+from services.entity_index import entity_index
+from services.result_store import result_store
+from services.search_index import search_index
+
+logger = logging.getLogger(__name__)
+
+# Параметры обработки по умолчанию (совпадают с параметрами /parse)
+DEFAULT_OPTIONS = {
+    'enable_ner': True,
+    'enable_classification': True,
+    'enable_semantic_analysis': False,
+    'enable_language_detection': True,
+    'enable_language_segmentation': False,
+    'clean_text': False,
+}
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class InvalidDocumentError(ValueError):
+    """Неподдерживаемый формат или файл не прошел валидацию."""
+
+
+def file_document_id(file_path: str) -> str:
+    """ID документа - sha256 содержимого файла (чтение блоками)."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def pipeline_run_id(document_id: str, job_id: Optional[str] = None) -> str:
+    """
+    ID запуска цепочки задач Celery по документу.
+    
+    Промежуточный результат парсинга хранится по ID запуска, а не по document_id:
+    запуски по одному файлу с разными параметрами не видят данных друг друга.
+    ID запуска задания постоянный - повторно доставленные задачи находят свои данные.
+    """
+    return hashlib.sha256(f"{document_id}:{job_id or uuid.uuid4().hex}".encode('utf-8')).hexdigest()
+
+
+def get_parser(file_path: str, filename: str) -> BaseParser:
+    """
+    Валидация файла и парсер для его формата (шаги 1-2).
+    
+    Raises:
+        InvalidDocumentError: Неподдерживаемый формат или файл не прошел валидацию
+    """
+    file_ext = file_extension(filename)
+    
+    if file_ext not in PARSERS:
+        raise InvalidDocumentError(f"Unsupported file format: {file_ext}. Supported: {list(PARSERS.keys())}")
+    
+    # 1. Валидация файла
+    validation = file_validator.validate_file(file_path)
+    if not validation['is_valid']:
+        raise InvalidDocumentError(f"File validation failed: {validation['errors']}")
+    
+    return PARSERS[file_ext]()
+
+
+def add_file_metadata(result: Dict[str, Any], file_path: str, filename: str,
+                      document_id: Optional[str] = None) -> None:
+    """Метаданные файла и document_id (шаг 3)."""
+    size = os.path.getsize(file_path)
+    result['metadata']['filename'] = filename
+    result['metadata']['size'] = size
+    result['metadata']['size_mb'] = round(size / (1024 * 1024), 2)
+    result['metadata']['parsed_at'] = datetime.utcnow().isoformat()
+    result['metadata']['document_id'] = document_id or file_document_id(file_path)
+
+
+def parse_file(file_path: str, filename: str, document_id: Optional[str] = None,
+               progress_callback: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+    """
+    Валидация и базовый парсинг файла (шаги 1-3).
+    
+    Args:
+        file_path: Путь к файлу
+        filename: Исходное имя файла (по расширению выбирается парсер)
+        document_id: sha256 содержимого, если уже посчитан
+        progress_callback: Колбэк прогресса парсера (страницы PDF, файлы архива)
+    
+    Returns:
+        Результат парсинга с метаданными файла и document_id
+    """
+    parser = get_parser(file_path, filename)
+    
+    # 2. Базовый парсинг
+    parser.progress_callback = progress_callback
+    result = parser.parse(file_path)
+    
+    # 3. Добавление метаданных
+    add_file_metadata(result, file_path, filename, document_id)
+    
+    return result
+
+
+def prepare_text(result: Dict[str, Any], clean_text: bool = False) -> str:
+    """
+    Текст для анализа (шаги 4-5): при clean_text - удаление колонтитулов и очистка.
+    
+    Returns:
+        Текст документа (пустая строка, если парсинг не удался или текста нет)
+    """
+    if 'error' in result['metadata']:
+        return ''
+    
+    text = result.get('content', {}).get('text', '')
+    if not text or not clean_text:
+        return text
+    
+    # Повторяющиеся на страницах колонтитулы (PDF со структурой страниц)
+    pages = data_cleaner.page_lines(result['content'].get('structure', []))
+    if pages:
+        pages, removed = data_cleaner.remove_page_headers_footers(pages)
+        if removed:
+            text = '\n'.join(line for lines in pages for line in lines)
+            result['metadata']['headers_footers_removed'] = removed
+    
+    text = data_cleaner.clean_text(text, aggressive=False)
+    result['content']['text'] = text
+    result['metadata']['text_cleaned'] = True
+    
+    return text
+
+
+def build_context(result: Dict[str, Any]) -> AnalysisContext:
+    """
+    Контекст анализа по результату; язык и языковые сегменты берутся из
+    уже выполненного определения языка, если оно есть.
+    """
+    ctx = AnalysisContext(result.get('content', {}).get('text', ''), metadata=result.get('metadata', {}))
+    
+    analysis = result.get('analysis', {})
+    if 'language' in analysis:
+        ctx.language = analysis['language'].get('language')
+    if 'language_segments' in analysis:
+        ctx.set_language_segments(analysis['language_segments']['segments'])
+    
+    return ctx
+
+
+def index_corpus(result: Dict[str, Any], ctx: AnalysisContext) -> None:
+    """
+    Статистика корпуса для IDF, тематическая модель и индекс почти-дубликатов.
+    
+    Вызывается и в API, и в воркерах Celery: индекс дубликатов общий (SQLite),
+    документные частоты каждого процесса складываются при сохранении модели.
+    """
+    semantic_analyzer.update_corpus(ctx)
+    
+    try:
+        duplicate_index.add(result['metadata']['document_id'], ctx.text, {
+            'filename': result['metadata'].get('filename'),
+            'type': result['metadata'].get('type'),
+            'parsed_at': result['metadata'].get('parsed_at'),
+        })
+    except Exception as e:
+        logger.error(f"Duplicate indexing failed: {e}")
+
+
+def run_language(ctx: AnalysisContext, options: Dict[str, Any]) -> Dict[str, Any]:
+    """Определение языка (и языковых сегментов); язык сохраняется в контексте."""
+    sections = {}
+    
+    try:
+        lang_info = language_detector.detect_language(ctx)
+        ctx.language = lang_info.get('language')
+        sections['language'] = lang_info
+        logger.info(f"Detected language: {lang_info.get('language', 'unknown')}")
+    except Exception as e:
+        logger.error(f"Language detection failed: {e}")
+        return sections
+    
+    if options.get('enable_language_segmentation'):
+        try:
+            segments = language_detector.detect_language_segments(ctx)
+            ctx.set_language_segments(segments['segments'])
+            sections['language_segments'] = segments
+            logger.info(f"Language distribution: {segments['distribution']}")
+        except Exception as e:
+            logger.error(f"Language segmentation failed: {e}")
+    
+    return sections
+
+
+def run_entities(ctx: AnalysisContext, options: Dict[str, Any]) -> Dict[str, Any]:
+    """NER - Named Entity Recognition."""
+    try:
+        entities = ner_extractor.extract_all(ctx)
+        logger.info(f"Extracted {entities['statistics']['total_entities']} entities")
+        return {'entities': entities}
+    except Exception as e:
+        logger.error(f"NER failed: {e}")
+        return {}
+
+
+def run_classification(ctx: AnalysisContext, options: Dict[str, Any]) -> Dict[str, Any]:
+    """Классификация документа."""
+    try:
+        classification = document_classifier.classify(ctx)
+        logger.info(f"Classified as: {classification.get('document_type', 'unknown')}")
+        return {'classification': classification}
+    except Exception as e:
+        logger.error(f"Classification failed: {e}")
+        return {}
+
+
+def run_semantic(ctx: AnalysisContext, options: Dict[str, Any]) -> Dict[str, Any]:
+    """Семантический анализ (ресурсоемко)."""
+    try:
+        semantic = semantic_analyzer.analyze(ctx)
+        logger.info(f"Semantic analysis: {len(semantic.get('keywords', []))} keywords")
+        return {'semantic': semantic}
+    except Exception as e:
+        logger.error(f"Semantic analysis failed: {e}")
+        return {}
+
+
+# Этапы анализа в порядке выполнения: имя -> (параметр, минимальная длина текста, функция)
+STAGES: Dict[str, tuple] = {
+    'language': ('enable_language_detection', 20, run_language),
+    'entities': ('enable_ner', 20, run_entities),
+    'classification': ('enable_classification', 50, run_classification),
+    'semantic': ('enable_semantic_analysis', 100, run_semantic),
+}
+
+
+def enabled_stages(text: Optional[str], options: Dict[str, Any]) -> List[str]:
+    """
+    Этапы анализа, включенные параметрами и применимые к тексту такой длины.
+    
+    Args:
+        text: Текст документа; None - текст еще неизвестен (до парсинга),
+            проверяются только параметры
+        options: Параметры обработки
+    """
+    options = {**DEFAULT_OPTIONS, **options}
+    return [
+        name for name, (option, min_length, _) in STAGES.items()
+        if options[option] and (text is None or len(text) > min_length)
+    ]
+
+
+def run_stage(name: str, ctx: AnalysisContext, options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Выполнение этапа анализа.
+    
+    Returns:
+        Готовые секции result['analysis'] (пустой dict, если этап не удался)
+    """
+    stage: Callable = STAGES[name][2]
+    return stage(ctx, {**DEFAULT_OPTIONS, **options})
+
+
+def finalize_result(result: Dict[str, Any], options: Dict[str, Any],
+                    ctx: Optional[AnalysisContext] = None) -> None:
+    """
+    Итоговые метаданные, сохранение результата и индексация (шаги 10-12).
+    
+    Args:
+        result: Результат с секциями анализа
+        options: Параметры обработки
+        ctx: Контекст анализа, уже учтенный в индексах корпуса (синхронный /parse
+            учитывает документ до анализа); None - документ учитывается здесь
+            (сборка результата цепочки задач Celery)
+    """
+    options = {**DEFAULT_OPTIONS, **options}
+    
+    if ctx is None:
+        index_corpus(result, build_context(result))
+    
+    # 10. Финальная статистика
+    if 'analysis' in result:
+        result['metadata']['analysis_performed'] = {
+            'ner': options['enable_ner'],
+            'classification': options['enable_classification'],
+            'semantic': options['enable_semantic_analysis'],
+            'language': options['enable_language_detection'],
+        }
+    
+    result_store.put(result['metadata']['document_id'], result)
+    
+    # 11. Полнотекстовый индекс (если включен)
+    if search_index is not None:
+        try:
+            search_index.index_result(result)
+        except Exception as e:
+            logger.error(f"Search indexing failed: {e}")
+    
+    # 12. Индекс сущностей (поиск документов по контрагенту)
+    if options['enable_ner']:
+        try:
+            entity_index.index_result(result)
+        except Exception as e:
+            logger.error(f"Entity indexing failed: {e}")
+
+
+def analyze_result(result: Dict[str, Any], filename: str, **options) -> Iterator[str]:
+    """
+    Очистка, анализ и индексация результата базового парсинга (шаги 4-12).
+    
+    Генератор этапов: 'content' когда содержимое готово (после очистки текста),
+    затем имена секций result['analysis'] по мере их готовности. Результат
+    дополняется на месте; сохранение и индексация выполняются после последнего
+    этапа, поэтому генератор нужно выбрать до конца.
+    """
+    options = {**DEFAULT_OPTIONS, **options}
+    
+    # Проверка на ошибки парсинга
+    if 'error' in result['metadata']:
+        logger.warning(f"Parsing error for {filename}: {result['metadata']['error']}")
+        yield 'content'
+        return
+    
+    text = prepare_text(result, options['clean_text'])
+    
+    if not text:
+        logger.warning(f"No text extracted from {filename}")
+        result_store.put(result['metadata']['document_id'], result)
+        yield 'content'
+        return
+    
+    yield 'content'
+    
+    # Общий контекст анализа: токенизация и разбиение на предложения
+    # выполняются один раз для всех анализаторов
+    ctx = AnalysisContext(text, metadata=result.get('metadata', {}))
+    index_corpus(result, ctx)
+    
+    # 6-9. Язык, NER, классификация, семантический анализ
+    for name in enabled_stages(text, options):
+        sections = run_stage(name, ctx, options)
+        for section, value in sections.items():
+            result.setdefault('analysis', {})[section] = value
+            yield section
+    
+    logger.info(f"Successfully parsed {filename}: {len(text)} chars")
+    finalize_result(result, options, ctx)
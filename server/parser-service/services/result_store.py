@@ -0,0 +1,268 @@
+"""
+Parse Result Store.
+Кеш результатов парсинга по document_id (sha256 содержимого файла) на диске.
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Iterator, Optional, Tuple
+
+from utils.serialization import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.getenv('DATA_DIR', '/app/data')
+
+# document_id - hex sha256; проверка защищает от выхода за пределы каталога
+DOCUMENT_ID_RE = re.compile(r'[0-9a-f]{64}')
+
+
+class ResultStore:
+    """
+    Хранилище результатов парсинга.
+    
+    Каждый результат - JSON-файл в каталоге root/<первые 2 символа id>/.
+    Последние использованные результаты дополнительно держатся в памяти (LRU)
+    вместе с версией файла: результат, перезаписанный другим процессом
+    (например, merge воркера Celery), читается с диска заново.
+    Возвращаемые словари общие для всех вызывающих - их нельзя изменять.
+    """
+    
+    def __init__(self, root: Optional[str] = None, cache_size: int = 64):
+        """
+        Инициализация хранилища.
+        
+        Args:
+            root: Каталог хранилища; None - только в памяти
+            cache_size: Количество результатов в LRU-кеше памяти
+        """
+        self.root = root
+        self.cache_size = cache_size
+        
+        self._cache: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def is_valid_id(document_id: str) -> bool:
+        """Проверка формата document_id."""
+        return bool(document_id) and DOCUMENT_ID_RE.fullmatch(document_id) is not None
+    
+    def get(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Результат парсинга документа.
+        
+        Args:
+            document_id: ID документа
+        
+        Returns:
+            Результат или None, если его нет в хранилище
+        """
+        return self.get_with_version(document_id)[1]
+    
+    def get_with_version(self, document_id: str) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """
+        Результат парсинга документа и версия файла, из которого он прочитан
+        (для кешей, производных от результата).
+        
+        Returns:
+            (версия, результат); версия None - результат только в памяти или его нет
+        """
+        if not self.is_valid_id(document_id):
+            return None, None
+        
+        path = self._path(document_id)
+        version = self.version(document_id)
+        
+        with self._lock:
+            cached = self._cache.get(document_id)
+            if cached is not None and (path is None or cached[0] == version):
+                self._cache.move_to_end(document_id)
+                return cached
+            if path is not None:
+                self._cache.pop(document_id, None)
+        
+        if version is None:
+            return None, None
+        
+        try:
+            with open(path, 'rb') as f:
+                # Версия - по открытому файлу: запись заменяет файл целиком (os.replace)
+                version = self._version(os.fstat(f.fileno()))
+                result = loads(f.read())
+        except FileNotFoundError:
+            return None, None
+        except Exception as e:
+            logger.error(f"Failed to read stored result {document_id}: {e}")
+            return None, None
+        
+        self._remember(document_id, version, result)
+        return version, result
+    
+    def put(self, document_id: str, result: Dict[str, Any], overwrite: bool = True) -> bool:
+        """
+        Сохранение результата парсинга (атомарная запись файла).
+        
+        Args:
+            document_id: ID документа
+            result: Результат парсинга
+            overwrite: False - не заменять уже сохраненный результат (например,
+                полный результат /parse результатом одного парсинга для /diff)
+        
+        Returns:
+            True если результат сохранен
+        """
+        if not self.is_valid_id(document_id):
+            return False
+        
+        path = self._path(document_id)
+        if path is None:
+            with self._lock:
+                if not overwrite and document_id in self._cache:
+                    return False
+            self._remember(document_id, None, result)
+            return True
+        
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            
+            with open(tmp_path, 'wb') as f:
+                f.write(dumps(result))
+                f.flush()
+                version = self._version(os.fstat(f.fileno()))
+            
+            if overwrite:
+                os.replace(tmp_path, path)
+                self._remember(document_id, version, result)
+                return True
+            
+            # Жесткая ссылка создается атомарно и только если файла еще нет
+            try:
+                os.link(tmp_path, path)
+            except FileExistsError:
+                return False
+            finally:
+                os.unlink(tmp_path)
+        
+        except Exception as e:
+            logger.error(f"Failed to store result {document_id}: {e}")
+            return False
+        
+        self._remember(document_id, version, result)
+        return True
+    
+    def version(self, document_id: str) -> Optional[str]:
+        """
+        Версия сохраненного результата (меняется при каждой записи) - для кешей,
+        производных от результата. None - результата нет на диске.
+        """
+        path = self._path(document_id) if self.is_valid_id(document_id) else None
+        if path is None:
+            return None
+        
+        try:
+            return self._version(os.stat(path))
+        except FileNotFoundError:
+            return None
+    
+    def delete(self, document_id: str) -> bool:
+        """Удаление результата из хранилища."""
+        if not self.is_valid_id(document_id):
+            return False
+        
+        with self._lock:
+            removed = self._cache.pop(document_id, None) is not None
+        
+        path = self._path(document_id)
+        if path is not None and os.path.exists(path):
+            os.unlink(path)
+            removed = True
+        
+        return removed
+    
+    def cleanup(self, max_age: int) -> int:
+        """Удаление результатов, не обновлявшихся max_age секунд."""
+        if not self.root or not os.path.isdir(self.root):
+            return 0
+        
+        deadline = time.time() - max_age
+        removed = 0
+        
+        for document_id in list(self.iter_ids()):
+            path = self._path(document_id)
+            try:
+                if os.path.getmtime(path) >= deadline:
+                    continue
+                os.unlink(path)
+            except OSError as e:
+                logger.error(f"Failed to remove stored result {document_id}: {e}")
+                continue
+            
+            with self._lock:
+                self._cache.pop(document_id, None)
+            removed += 1
+        
+        return removed
+    
+    def iter_ids(self) -> Iterator[str]:
+        """ID всех сохраненных результатов (обход каталога, без загрузки)."""
+        if not self.root or not os.path.isdir(self.root):
+            return
+        
+        for shard in sorted(os.listdir(self.root)):
+            shard_dir = os.path.join(self.root, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            
+            for name in sorted(os.listdir(shard_dir)):
+                document_id = name[:-len('.json')]
+                if name.endswith('.json') and self.is_valid_id(document_id):
+                    yield document_id
+    
+    def iter_results(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Потоковый обход всех сохраненных результатов (для переиндексации).
+        
+        Результаты читаются с диска по одному и не попадают в LRU-кеш,
+        поэтому память не растет с размером хранилища.
+        """
+        for document_id in self.iter_ids():
+            try:
+                with open(self._path(document_id), 'rb') as f:
+                    result = loads(f.read())
+            except Exception as e:
+                logger.error(f"Failed to read stored result {document_id}: {e}")
+                continue
+            
+            yield document_id, result
+    
+    def _path(self, document_id: str) -> Optional[str]:
+        """Путь к файлу результата."""
+        if not self.root:
+            return None
+        
+        return os.path.join(self.root, document_id[:2], f"{document_id}.json")
+    
+    @staticmethod
+    def _version(stat: os.stat_result) -> str:
+        """Версия файла результата: каждая запись - новый файл (inode) с новым mtime."""
+        return f"{stat.st_ino:x}-{stat.st_mtime_ns:x}-{stat.st_size:x}"
+    
+    def _remember(self, document_id: str, version: Optional[str], result: Dict[str, Any]) -> None:
+        """Добавление результата в LRU-кеш памяти вместе с версией файла."""
+        with self._lock:
+            self._cache[document_id] = (version, result)
+            self._cache.move_to_end(document_id)
+            
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+
+# Глобальные экземпляры: итоговые результаты по document_id и промежуточные
+# результаты цепочек задач Celery по ID запуска (services.pipeline.pipeline_run_id)
+result_store = ResultStore(root=os.path.join(DATA_DIR, 'results'))
+pipeline_store = ResultStore(root=os.path.join(DATA_DIR, 'pipeline'), cache_size=8)
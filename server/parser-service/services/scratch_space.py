@@ -0,0 +1,387 @@
+"""
+Scratch Space.
+Временные файлы API (загрузки, экспорт, файлы асинхронных заданий): каталог на
+каждый запрос или задание, удаление по освобождению, квота на диск.
+"""
+
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Каталог временных файлов (общий для API и воркеров: файлы заданий читают воркеры)
+SCRATCH_DIR = os.getenv('SCRATCH_DIR', os.getenv('UPLOAD_DIR', '/app/uploads'))
+
+# Квота на диск (байты)
+SCRATCH_QUOTA = int(os.getenv('SCRATCH_QUOTA', str(10 * 1024 ** 3)))
+
+# Время жизни области после завершения задания, если воркер ее не удалил (секунды)
+SCRATCH_TTL = int(os.getenv('SCRATCH_TTL', '3600'))
+
+# Не чаще этого интервала (секунды) проверяются просроченные области
+EXPIRE_INTERVAL = 60
+
+
+class ScratchQuotaExceeded(OSError):
+    """Нет места в пределах квоты (все области заняты)."""
+
+
+# ID области (задания) -> время завершения задания (time.time()) или None, пока оно выполняется
+FinishedAt = Callable[[str], Optional[float]]
+
+
+class ScratchSpace:
+    """
+    Временные файлы по областям (scope): root/<scope_id>/<файл>.
+    
+    Область создается с одной ссылкой и удаляется целиком, когда ссылок не
+    осталось (release) - например, фоновой задачей после отправки FileResponse.
+    Область, переданная воркерам Celery (detach), - входные данные задания:
+    ее удаляет воркер по завершении задания (discard, и при успехе, и при ошибке).
+    Пока задание не завершено, область не вытесняется и не истекает - при
+    нехватке квоты новый запрос получает ScratchQuotaExceeded (507). Области
+    завершенных заданий, которые воркер не удалил, освобождаются при нехватке
+    квоты (старые первыми) и через SCRATCH_TTL после завершения задания.
+    
+    Завершение задания определяет finished_at (в API - по состояниям задач
+    Celery); без него переданные области удаляются только воркером.
+    
+    Учет ведется в памяти процесса API, поэтому каталог не обходится:
+    при старте (load) просматриваются только области верхнего уровня.
+    """
+    
+    def __init__(self, root: str, quota: int = SCRATCH_QUOTA, ttl: int = SCRATCH_TTL,
+                 finished_at: Optional[FinishedAt] = None):
+        """
+        Инициализация.
+        
+        Args:
+            root: Каталог временных файлов
+            quota: Квота на диск в байтах
+            ttl: Время жизни области после завершения задания в секундах
+            finished_at: Время завершения задания области или None, пока оно выполняется
+        """
+        self.root = root
+        self.quota = quota
+        self.ttl = ttl
+        self.finished_at = finished_at
+        
+        # scope_id -> {'refs', 'size', 'detached', 'used_at'}; порядок - LRU (старые первыми)
+        self._scopes: OrderedDict = OrderedDict()
+        # scope_id -> время завершения задания (не меняется, запрашивается один раз)
+        self._finished: Dict[str, float] = {}
+        self._usage = 0
+        self._lock = threading.Lock()
+        self._expired_at = time.monotonic()
+        
+        self.metrics = {
+            'created': 0,
+            'released': 0,
+            'discarded': 0,
+            'expired': 0,
+            'evicted': 0,
+            'evicted_bytes': 0,
+            'quota_rejections': 0,
+        }
+    
+    def load(self) -> int:
+        """
+        Учет областей, оставшихся с прошлого запуска (как переданных воркерам).
+        
+        Returns:
+            Количество найденных областей
+        """
+        if not os.path.isdir(self.root):
+            return 0
+        
+        with self._lock:
+            for entry in os.scandir(self.root):
+                if entry.name in self._scopes:
+                    continue
+                self._scopes[entry.name] = {
+                    'refs': 0,
+                    'size': self._disk_size(entry.path),
+                    'detached': True,
+                    'used_at': time.monotonic(),
+                }
+                self._usage += self._scopes[entry.name]['size']
+            
+            return len(self._scopes)
+    
+    def create(self, scope_id: Optional[str] = None) -> str:
+        """
+        Новая область с одной ссылкой.
+        
+        Args:
+            scope_id: ID области (например, ID задания); по умолчанию - новый uuid
+        """
+        self._maybe_expire()
+        
+        scope_id = scope_id or uuid.uuid4().hex
+        os.makedirs(os.path.join(self.root, scope_id), exist_ok=True)
+        
+        with self._lock:
+            self._scopes[scope_id] = {'refs': 1, 'size': 0, 'detached': False, 'used_at': time.monotonic()}
+            self.metrics['created'] += 1
+        
+        return scope_id
+    
+    @contextmanager
+    def scope(self) -> Iterator[str]:
+        """Область на время блока with."""
+        scope_id = self.create()
+        try:
+            yield scope_id
+        finally:
+            self.release(scope_id)
+    
+    def path(self, scope_id: str, filename: str) -> str:
+        """Путь к файлу в области."""
+        return os.path.join(self.root, scope_id, os.path.basename(filename))
+    
+    def owns(self, file_path: str) -> bool:
+        """Файл находится в одной из областей."""
+        return os.path.dirname(os.path.dirname(os.path.abspath(file_path))) == os.path.abspath(self.root)
+    
+    def reserve(self, scope_id: str, size: int) -> None:
+        """
+        Учет size байт, записываемых в область; при нехватке квоты удаляются
+        оставшиеся области завершенных заданий (старые первыми). Отрицательный
+        size возвращает лишнее из резерва (оценки размера до записи).
+        
+        Может запрашивать состояния заданий (finished_at) - из async-обработчиков
+        вызывается в пуле потоков.
+        
+        Raises:
+            ScratchQuotaExceeded: Места нет, а остальные области заняты
+                запросами или еще не завершенными заданиями
+        """
+        if self._try_reserve(scope_id, size):
+            return
+        
+        self._reclaim(size)
+        if self._try_reserve(scope_id, size):
+            return
+        
+        with self._lock:
+            self.metrics['quota_rejections'] += 1
+            usage = self._usage
+        raise ScratchQuotaExceeded(f"Scratch quota exceeded: {usage + size} > {self.quota} bytes")
+    
+    def _try_reserve(self, scope_id: str, size: int) -> bool:
+        """Учет size байт, если они помещаются в квоту."""
+        with self._lock:
+            scope = self._scopes.get(scope_id)
+            if scope is None:
+                raise KeyError(f"Unknown scratch scope: {scope_id}")
+            
+            if self._usage + size > self.quota:
+                return False
+            
+            scope['size'] += size
+            scope['used_at'] = time.monotonic()
+            self._usage += size
+            self._scopes.move_to_end(scope_id)
+            return True
+    
+    def _reclaim(self, size: int) -> None:
+        """Удаление областей завершенных заданий (LRU), пока не освободится size байт."""
+        for scope_id in self._detached():
+            with self._lock:
+                if self._usage + size <= self.quota:
+                    return
+            
+            if self._job_finished_at(scope_id) is None:
+                continue
+            
+            with self._lock:
+                scope = self._scopes.get(scope_id)
+                if scope is None or not scope['detached']:
+                    continue
+                self._forget(scope_id)
+                self.metrics['evicted'] += 1
+                self.metrics['evicted_bytes'] += scope['size']
+            
+            logger.warning(f"Scratch quota: removing finished job scope {scope_id}")
+            self._remove(scope_id)
+    
+    def write(self, scope_id: str, filename: str, data: bytes) -> str:
+        """Запись файла в область (с учетом квоты); возвращает путь."""
+        self.reserve(scope_id, len(data))
+        
+        file_path = self.path(scope_id, filename)
+        with open(file_path, 'wb') as f:
+            f.write(data)
+        
+        return file_path
+    
+    def acquire(self, scope_id: str) -> None:
+        """Дополнительная ссылка на область."""
+        with self._lock:
+            self._scopes[scope_id]['refs'] += 1
+    
+    def release(self, scope_id: str) -> None:
+        """Освобождение ссылки; область без ссылок удаляется."""
+        with self._lock:
+            scope = self._scopes.get(scope_id)
+            if scope is None:
+                return
+            scope['refs'] -= 1
+            if scope['refs'] > 0:
+                return
+            self._forget(scope_id)
+            self.metrics['released'] += 1
+        
+        self._remove(scope_id)
+    
+    def detach(self, scope_id: str) -> None:
+        """Передача области воркерам: ссылки API сняты, удаление - discard (или после завершения задания)."""
+        with self._lock:
+            scope = self._scopes.get(scope_id)
+            if scope is None:
+                return
+            scope['refs'] = 0
+            scope['detached'] = True
+            scope['used_at'] = time.monotonic()
+            self._scopes.move_to_end(scope_id)
+    
+    def discard(self, file_path: str) -> None:
+        """Удаление области, содержащей файл (воркером по завершении задания)."""
+        if not self.owns(file_path):
+            return
+        
+        scope_id = os.path.basename(os.path.dirname(os.path.abspath(file_path)))
+        with self._lock:
+            if scope_id in self._scopes:
+                self._forget(scope_id)
+            self.metrics['discarded'] += 1
+        
+        self._remove(scope_id)
+    
+    def expire(self) -> int:
+        """
+        Удаление областей заданий, завершенных больше ttl назад, и снятие с учета
+        удаленных воркерами (обход учета в памяти, не каталога).
+        
+        Задания, переданные меньше ttl назад, не могли завершиться раньше, поэтому
+        их состояние не запрашивается.
+        """
+        deadline = time.monotonic() - self.ttl
+        candidates = [scope_id for scope_id, used_at in self._detached(with_used_at=True) if used_at < deadline]
+        
+        now = time.time()
+        expired = []
+        for scope_id in candidates:
+            finished_at = self._job_finished_at(scope_id)
+            if finished_at is None or now - finished_at < self.ttl:
+                continue
+            
+            with self._lock:
+                scope = self._scopes.get(scope_id)
+                if scope is None or not scope['detached']:
+                    continue
+                self._forget(scope_id)
+                self.metrics['expired'] += 1
+            expired.append(scope_id)
+        
+        with self._lock:
+            self._expired_at = time.monotonic()
+        
+        for scope_id in expired:
+            self._remove(scope_id)
+        
+        return len(expired)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Метрики: области, занятое место, квота и счетчики событий."""
+        with self._lock:
+            detached = sum(1 for scope in self._scopes.values() if scope['detached'])
+            return {
+                'scopes': len(self._scopes),
+                'active': len(self._scopes) - detached,
+                'detached': detached,
+                'usage_bytes': self._usage,
+                'quota_bytes': self.quota,
+                **self.metrics,
+            }
+    
+    def _maybe_expire(self) -> None:
+        """Проверка просроченных областей не чаще EXPIRE_INTERVAL."""
+        if time.monotonic() - self._expired_at >= EXPIRE_INTERVAL:
+            self.expire()
+    
+    def _detached(self, with_used_at: bool = False) -> List[Any]:
+        """
+        Переданные воркерам области в порядке LRU; удаленные воркерами
+        снимаются с учета.
+        """
+        with self._lock:
+            detached = []
+            for scope_id, scope in list(self._scopes.items()):
+                if not scope['detached']:
+                    continue
+                if not os.path.exists(os.path.join(self.root, scope_id)):
+                    self._forget(scope_id)
+                    self.metrics['discarded'] += 1
+                    continue
+                detached.append((scope_id, scope['used_at']) if with_used_at else scope_id)
+            
+            return detached
+    
+    def _job_finished_at(self, scope_id: str) -> Optional[float]:
+        """Время завершения задания области; None - выполняется или неизвестно."""
+        if self.finished_at is None:
+            return None
+        
+        with self._lock:
+            if scope_id in self._finished:
+                return self._finished[scope_id]
+        
+        try:
+            finished_at = self.finished_at(scope_id)
+        except Exception as e:
+            logger.error(f"Failed to check job state for scratch {scope_id}: {e}")
+            return None
+        
+        if finished_at is not None:
+            with self._lock:
+                if scope_id in self._scopes:
+                    self._finished[scope_id] = finished_at
+        return finished_at
+    
+    def _forget(self, scope_id: str) -> None:
+        """Снятие области с учета (под блокировкой)."""
+        scope = self._scopes.pop(scope_id)
+        self._usage -= scope['size']
+        self._finished.pop(scope_id, None)
+    
+    def _remove(self, scope_id: str) -> None:
+        """Удаление области с диска."""
+        path = os.path.join(self.root, scope_id)
+        try:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            elif os.path.exists(path):
+                os.unlink(path)
+        except OSError as e:
+            logger.error(f"Failed to remove scratch {path}: {e}")
+    
+    @staticmethod
+    def _disk_size(path: str) -> int:
+        """Размер области на диске."""
+        if not os.path.isdir(path):
+            return os.path.getsize(path)
+        
+        return sum(os.path.getsize(os.path.join(dirpath, name))
+                   for dirpath, _, filenames in os.walk(path) for name in filenames)
+
+
+# Глобальный экземпляр
+scratch_space = ScratchSpace(SCRATCH_DIR)
@@ -0,0 +1,365 @@
+"""
+Full-text Search Service.
+Полнотекстовый поиск по разобранным документам: SQLite FTS5, ранжирование BM25.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from services.entity_index import normalize_phone
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.getenv('DATA_DIR', '/app/data')
+SEARCH_ENABLED = os.getenv('SEARCH_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+
+# Фильтры поиска по сущностям: параметр запроса -> ключ в analysis.entities
+ENTITY_FILTERS = {
+    'inn': 'inn',
+    'kpp': 'kpp',
+    'ogrn': 'ogrn',
+    'email': 'emails',
+    'phone': 'phones',
+    'fio': 'fio',
+}
+
+# Колонки documents_fts: по колонке на вид сущности, чтобы фильтр inn не
+# совпадал с ОГРН/КПП из тех же цифр
+FTS_COLUMNS = ('title', 'text', 'classification', *ENTITY_FILTERS)
+
+# Веса колонок для BM25 (в порядке FTS_COLUMNS): title, text, classification, сущности
+BM25_WEIGHTS = (5.0, 1.0, 2.0, *(3.0 for _ in ENTITY_FILTERS))
+
+# Сообщения SQLite об ошибках разбора выражения MATCH
+QUERY_ERROR_MARKERS = ('fts5', 'syntax error', 'unterminated string', 'no such column', 'unknown special query')
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    document_id TEXT NOT NULL UNIQUE,
+    filename TEXT,
+    file_type TEXT,
+    document_type TEXT,
+    language TEXT,
+    parsed_at TEXT
+);
+CREATE INDEX IF NOT EXISTS documents_document_type ON documents(document_type);
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+    {', '.join(FTS_COLUMNS)},
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+
+class SearchQueryError(ValueError):
+    """Некорректный поисковый запрос."""
+
+
+class SearchIndex:
+    """
+    Инвертированный индекс по разобранным документам на SQLite FTS5.
+    
+    Индексируются текст документа, извлеченные сущности и классификация;
+    индекс обновляется при парсинге и может быть пересобран из хранилища
+    результатов. Запросы - синтаксис FTS5 (AND/OR/NOT, "фразы", префиксы*),
+    фильтры по сущностям накладываются как фразы по колонке своего вида.
+    """
+    
+    def __init__(self, db_path: str = ':memory:', batch_size: int = 100):
+        """
+        Инициализация индекса (соединение открывается при первом обращении).
+        
+        Args:
+            db_path: Путь к файлу базы SQLite; ':memory:' - только в памяти
+            batch_size: Документов в одной транзакции при массовой индексации
+        """
+        self.db_path = db_path
+        self.batch_size = batch_size
+        
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+    
+    def _connection(self) -> sqlite3.Connection:
+        """Ленивое открытие базы и создание схемы (вызывается под блокировкой)."""
+        if self._conn is None:
+            if self.db_path != ':memory:':
+                os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._drop_outdated(conn)
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        
+        return self._conn
+    
+    @staticmethod
+    def _drop_outdated(conn: sqlite3.Connection) -> None:
+        """Удаление индекса со старым набором колонок (пересобирается reindex.py search)."""
+        columns = tuple(row[1] for row in conn.execute("PRAGMA table_info('documents_fts')"))
+        if not columns or columns == FTS_COLUMNS:
+            return
+        
+        logger.warning("Search index schema changed, dropping it; rebuild with 'reindex.py search'")
+        with conn:
+            conn.execute('DROP TABLE documents_fts')
+            conn.execute('DROP TABLE IF EXISTS documents')
+    
+    def index_result(self, result: Dict[str, Any]) -> bool:
+        """
+        Добавление (или обновление) результата парсинга в индексе.
+        
+        Args:
+            result: Результат парсинга с metadata.document_id
+        
+        Returns:
+            True если документ проиндексирован
+        """
+        return self.index_results([result]) == 1
+    
+    def index_results(self, results: Iterable[Dict[str, Any]]) -> int:
+        """
+        Массовая индексация (по batch_size документов в транзакции).
+        
+        Args:
+            results: Результаты парсинга
+        
+        Returns:
+            Количество проиндексированных документов
+        """
+        indexed = 0
+        batch: List[Tuple[Tuple, Tuple]] = []
+        
+        for result in results:
+            row = self._document_row(result)
+            if row is None:
+                continue
+            
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                indexed += self._write_batch(batch)
+                batch = []
+        
+        if batch:
+            indexed += self._write_batch(batch)
+        
+        return indexed
+    
+    def remove(self, document_id: str) -> bool:
+        """Удаление документа из индекса."""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                row = conn.execute('SELECT id FROM documents WHERE document_id = ?', (document_id,)).fetchone()
+                if row is None:
+                    return False
+                
+                conn.execute('DELETE FROM documents_fts WHERE rowid = ?', row)
+                conn.execute('DELETE FROM documents WHERE id = ?', row)
+        
+        return True
+    
+    def search(
+        self,
+        query: Optional[str] = None,
+        entities: Optional[Dict[str, str]] = None,
+        document_type: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> Dict[str, Any]:
+        """
+        Поиск документов.
+        
+        Args:
+            query: Запрос в синтаксисе FTS5 (слова, "фразы", AND/OR/NOT, префикс*)
+            entities: Фильтры по сущностям {'inn': ..., 'email': ...}
+            document_type: Фильтр по типу документа (классификация)
+            limit: Размер страницы
+            offset: Смещение страницы
+        
+        Returns:
+            Dict с общим количеством и страницей результатов (по убыванию BM25)
+        """
+        match = self._build_match(query, entities or {})
+        if not match and not document_type:
+            raise SearchQueryError("Empty search query")
+        
+        conditions = []
+        params: List[Any] = []
+        
+        if match:
+            conditions.append('documents_fts MATCH ?')
+            params.append(match)
+        if document_type:
+            conditions.append('d.document_type = ?')
+            params.append(document_type)
+        
+        where = ' AND '.join(conditions)
+        
+        if match:
+            select = f"""
+                SELECT d.document_id, d.filename, d.file_type, d.document_type, d.language, d.parsed_at,
+                       bm25(documents_fts, {', '.join('?' * len(BM25_WEIGHTS))}) AS rank,
+                       snippet(documents_fts, 1, '<mark>', '</mark>', '…', 16)
+                FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid
+                WHERE {where}
+                ORDER BY rank LIMIT ? OFFSET ?
+            """
+            select_params = [*BM25_WEIGHTS, *params, limit, offset]
+            count = f"""
+                SELECT count(*) FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid
+                WHERE {where}
+            """
+        else:
+            select = f"""
+                SELECT d.document_id, d.filename, d.file_type, d.document_type, d.language, d.parsed_at,
+                       NULL, NULL
+                FROM documents d
+                WHERE {where}
+                ORDER BY d.parsed_at DESC LIMIT ? OFFSET ?
+            """
+            select_params = [*params, limit, offset]
+            count = f"SELECT count(*) FROM documents d WHERE {where}"
+        
+        try:
+            with self._lock:
+                conn = self._connection()
+                total = conn.execute(count, params).fetchone()[0]
+                rows = conn.execute(select, select_params).fetchall()
+        
+        except sqlite3.OperationalError as e:
+            # Синтаксические ошибки FTS5 - ошибка запроса, а не сервиса
+            if any(marker in str(e) for marker in QUERY_ERROR_MARKERS):
+                raise SearchQueryError(str(e))
+            raise
+        
+        return {
+            'total': total,
+            'limit': limit,
+            'offset': offset,
+            'results': [
+                {
+                    'document_id': row[0],
+                    'filename': row[1],
+                    'file_type': row[2],
+                    'document_type': row[3],
+                    'language': row[4],
+                    'parsed_at': row[5],
+                    'score': round(-row[6], 6) if row[6] is not None else None,
+                    'snippet': row[7],
+                }
+                for row in rows
+            ],
+        }
+    
+    def count(self) -> int:
+        """Количество документов в индексе."""
+        with self._lock:
+            return self._connection().execute('SELECT count(*) FROM documents').fetchone()[0]
+    
+    def _write_batch(self, batch: List[Tuple[Tuple, Tuple]]) -> int:
+        """Запись батча документов в одной транзакции."""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                for document, fts in batch:
+                    row = conn.execute('SELECT id FROM documents WHERE document_id = ?', (document[0],)).fetchone()
+                    
+                    if row is None:
+                        cursor = conn.execute(
+                            'INSERT INTO documents (document_id, filename, file_type, document_type, language, parsed_at) '
+                            'VALUES (?, ?, ?, ?, ?, ?)',
+                            document,
+                        )
+                        rowid = cursor.lastrowid
+                    else:
+                        rowid = row[0]
+                        conn.execute(
+                            'UPDATE documents SET filename = ?, file_type = ?, document_type = ?, language = ?, '
+                            'parsed_at = ? WHERE id = ?',
+                            (*document[1:], rowid),
+                        )
+                        conn.execute('DELETE FROM documents_fts WHERE rowid = ?', (rowid,))
+                    
+                    conn.execute(
+                        f"INSERT INTO documents_fts (rowid, {', '.join(FTS_COLUMNS)}) "
+                        f"VALUES (?{', ?' * len(FTS_COLUMNS)})",
+                        (rowid, *fts),
+                    )
+        
+        return len(batch)
+    
+    @staticmethod
+    def _document_row(result: Dict[str, Any]) -> Optional[Tuple[Tuple, Tuple]]:
+        """Строки таблиц documents и documents_fts для результата парсинга."""
+        metadata = result.get('metadata', {})
+        document_id = metadata.get('document_id')
+        if not document_id:
+            return None
+        
+        analysis = result.get('analysis', {})
+        entities = analysis.get('entities', {})
+        classification = analysis.get('classification', {})
+        language = analysis.get('language', {})
+        
+        entity_columns = []
+        for name, key in ENTITY_FILTERS.items():
+            values = []
+            for value in entities.get(key, []):
+                # Телефоны - в E.164, как в индексе сущностей; токен FTS - цифры номера
+                if name == 'phone':
+                    value = normalize_phone(value)
+                    if value is None:
+                        continue
+                values.append(str(value))
+            entity_columns.append('\n'.join(values))
+        
+        classification_terms = [classification.get('document_type'), classification.get('document_type_name')]
+        classification_terms.extend(k for k in classification.get('matched_keywords', []) if isinstance(k, str))
+        
+        document = (
+            document_id,
+            metadata.get('filename'),
+            metadata.get('type'),
+            classification.get('document_type'),
+            language.get('language') if isinstance(language, dict) else None,
+            metadata.get('parsed_at'),
+        )
+        fts = (
+            ' '.join(filter(None, [metadata.get('title'), metadata.get('filename')])),
+            result.get('content', {}).get('text', ''),
+            ' '.join(filter(None, classification_terms)),
+            *entity_columns,
+        )
+        
+        return document, fts
+    
+    @staticmethod
+    def _build_match(query: Optional[str], entities: Dict[str, str]) -> str:
+        """Выражение MATCH: запрос пользователя и фразы-фильтры по сущностям."""
+        parts = []
+        
+        if query and query.strip():
+            parts.append(f"({query.strip()})")
+        
+        for name, value in entities.items():
+            if not value:
+                continue
+            if name not in ENTITY_FILTERS:
+                raise SearchQueryError(f"Unknown entity filter: {name}")
+            if name == 'phone':
+                value = normalize_phone(value)
+                if value is None:
+                    raise SearchQueryError(f"Invalid phone value: {entities[name]}")
+            phrase = '"' + value.replace('"', '""') + '"'
+            parts.append(f"{name} : {phrase}")
+        
+        return ' AND '.join(parts)
+
+
+# Глобальный экземпляр (None если поиск отключен)
+search_index = SearchIndex(os.path.join(DATA_DIR, 'search.db')) if SEARCH_ENABLED else None
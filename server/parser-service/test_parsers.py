@@ -95,6 +95,18 @@ class TestExporters:
         assert 'Test Document' in result
         assert exporter.get_extension() == 'json'
     
+    def test_json_exporter_numpy_types(self, sample_data):
+        import json
+        import numpy as np
+        from exporters.json_exporter import JSONExporter
+        
+        sample_data['metadata']['ocr_confidence'] = np.float64(87.5)
+        sample_data['metadata']['pages'] = {1: np.int64(120)}
+        
+        result = json.loads(JSONExporter().export(sample_data, {'indent': 0}))
+        assert result['metadata']['ocr_confidence'] == 87.5
+        assert result['metadata']['pages'] == {'1': 120}
+    
     def test_text_exporter(self, sample_data):
         from exporters.text_exporter import TextExporter
         
@@ -125,6 +137,68 @@ class TestExporters:
         assert len(result) > 0
         assert exporter.get_extension() == 'xlsx'
     
+    def test_excel_exporter_splits_sheets(self, sample_data, tmp_path):
+        import openpyxl
+        from exporters.excel_exporter import ExcelExporter
+        
+        sample_data['content']['tables'] = [{'headers': ['n'], 'rows': [[i] for i in range(12)]}]
+        sample_data['content']['text'] = '\n'.join(f'line {i}' for i in range(30))
+        
+        exporter = ExcelExporter()
+        exporter.MAX_ROWS = 5
+        file_path = tmp_path / 'export.xlsx'
+        exporter.export_to_file(sample_data, str(file_path))
+        
+        workbook = openpyxl.load_workbook(file_path, read_only=True)
+        assert [name for name in workbook.sheetnames if name.startswith('Table')] == ['Table 1', 'Table 1 (2)', 'Table 1 (3)']
+        rows = [row for name in ('Table 1', 'Table 1 (2)', 'Table 1 (3)') for row in workbook[name].values]
+        assert rows[0] == ('n',) and rows.count(('n',)) == 3
+        assert [int(row[0]) for row in rows if row != ('n',)] == list(range(12))
+        assert len([name for name in workbook.sheetnames if name.startswith('Text Content')]) == 8
+        assert list(file_path.parent.iterdir()) == [file_path]
+    
+    def test_columnar_exporters(self, sample_data):
+        import io
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        from exporters.arrow_exporter import ArrowExporter
+        from exporters.columnar_exporter import ColumnarExporter
+        from exporters.parquet_exporter import ParquetExporter
+        
+        sample_data['content']['tables'].append({
+            'sheet': 'Sheet1',
+            'headers': ['date', 'qty', 'price', 'inn', 'name', 'name'],
+            'rows': [
+                ['2024-01-01 00:00:00', '5', '1.5', '0123456789', 'a', 'x'],
+                ['', '', '2', '7707083893', 'b', 'y'],
+            ],
+            'dtypes': {'date': 'datetime64[ns]', 'qty': 'float64', 'price': 'float64', 'inn': 'object', 'name': 'object'},
+        })
+        
+        table = pq.read_table(io.BytesIO(ParquetExporter().export(sample_data, {'table': 1})))
+        assert table.column_names == ['date', 'qty', 'price', 'inn', 'name', 'name_1']
+        assert [str(field.type) for field in table.schema] == ['timestamp[ns]', 'double', 'double', 'string', 'string', 'string']
+        assert table.column('qty').to_pylist() == [5.0, None]
+        assert table.schema.metadata[b'sheet'] == b'Sheet1'
+        
+        # Без dtypes (CSV, PDF) типы определяются по значениям
+        sample_data['content']['tables'][0]['rows'] = [['id', 'amount', 'code'], ['1', '10.5', '007'], ['2', '', '12']]
+        table = pa.ipc.open_file(pa.BufferReader(ArrowExporter().export(sample_data))).read_all()
+        assert table.to_pydict() == {'id': [1, 2], 'amount': [10.5, None], 'code': ['007', '12']}
+        
+        with pytest.raises(ValueError):
+            ParquetExporter().export(sample_data, {'table': 2})
+        
+        # Потоковый формат Arrow - свои MIME-тип и расширение
+        stream = ArrowExporter().export(sample_data, {'stream': True})
+        assert pa.ipc.open_stream(pa.BufferReader(stream)).read_all().num_rows == 2
+        assert ArrowExporter().get_mime_type({'stream': True}) == 'application/vnd.apache.arrow.stream'
+        assert ArrowExporter().get_extension({'stream': True}) == 'arrows'
+        assert ArrowExporter().get_extension() == 'arrow'
+        
+        with pytest.raises(TypeError):
+            ColumnarExporter()
+    
     def test_html_exporter(self, sample_data):
         from exporters.html_exporter import HTMLExporter
         
@@ -135,6 +209,1021 @@ class TestExporters:
         assert '<!DOCTYPE html>' in result
         assert 'Test Document' in result
         assert exporter.get_extension() == 'html'
+    
+    def test_streaming_exporters(self, sample_data):
+        import hashlib
+        from exporters.base_exporter import join_lines
+        from exporters.html_exporter import HTMLExporter
+        from exporters.markdown_exporter import MarkdownExporter
+        from exporters.text_exporter import TextExporter
+        
+        for lines in ([], [''], ['a', '', 'b'], ['x' * 10] * 25):
+            assert ''.join(join_lines(lines, chunk_size=32)) == '\n'.join(lines)
+        
+        # Вывод совпадает с выводом экспортеров до потоковой записи (эталон)
+        assert ''.join(MarkdownExporter().iter_export(sample_data)) == (
+            '# Test Document\n\n# Title\n\nContent\n\n\n## Tables\n\n\n### Table 1\n\n'
+            '| Header1 | Header2 |\n| --- | --- |\n| Value1 | Value2 |'
+        )
+        assert ''.join(TextExporter().iter_export(sample_data)) == 'Sample text'
+        assert ''.join(TextExporter().iter_export(sample_data, {'preserve_structure': True})) == (
+            '\n' + '=' * 50 + '\nTitle\n' + '=' * 50 + '\n\nContent\n'
+        )
+        
+        sample_data['content']['tables'][0]['rows'] += [[f'v{i}', i] for i in range(20000)]
+        golden = {
+            MarkdownExporter: 'b6a8a516c25b7623a4d8cf2acc4005211a00b72d486b2a37f819395635d922e6',
+            HTMLExporter: 'cc351fade1d796090f702d48450f6fe2eb5725d171f5c98124ddf174118ea871',
+            TextExporter: '22e66ecfadc592d3b418fe951472909ef718f1529fba03ec02d10aaf26c9f2b6',
+        }
+        for exporter_class, digest in golden.items():
+            exporter = exporter_class()
+            chunks = list(exporter.iter_export(sample_data, {'preserve_structure': True}))
+            assert exporter.streaming
+            assert hashlib.sha256(''.join(chunks).encode('utf-8')).hexdigest() == digest
+        
+        chunks = list(MarkdownExporter().iter_export(sample_data))
+        assert len(chunks) > 1 and '| v19999 | 19999 |' in chunks[-1]
+
+class TestCorpusIDF:
+    def test_common_terms_are_downweighted(self):
+        from utils.corpus_idf import CorpusIDF
+        
+        corpus = CorpusIDF(stopwords=['the'], model_path=None)
+        for i in range(5):
+            corpus.partial_fit(f"договор поставки номер {i} invoice")
+        corpus.partial_fit("договор аренды помещения")
+        
+        keywords = corpus.keywords("договор аренды помещения", top_n=3)
+        words = [k['word'] for k in keywords]
+        
+        assert corpus.n_docs == 6
+        assert words[-1] == 'договор'
+        assert set(words[:2]) == {'аренды', 'помещения'}
+    
+    def test_save_and_load(self, tmp_path):
+        from utils.corpus_idf import CorpusIDF
+        
+        model_path = str(tmp_path / 'corpus_idf.npz')
+        corpus = CorpusIDF(stopwords=[], model_path=model_path, n_features=2 ** 10)
+        corpus.partial_fit("первый документ корпуса")
+        assert corpus.save()
+        
+        restored = CorpusIDF(stopwords=[], model_path=model_path, n_features=2 ** 10)
+        assert restored.n_docs == 1
+        assert (restored.df == corpus.df).all()
+    
+    def test_partial_fit_defers_save(self, tmp_path):
+        from utils.corpus_idf import CorpusIDF
+        
+        model_path = tmp_path / 'corpus_idf.npz'
+        corpus = CorpusIDF(stopwords=[], model_path=str(model_path), n_features=2 ** 10, save_every=2)
+        
+        assert corpus.partial_fit("первый документ") is False
+        assert corpus.partial_fit("второй документ") is True
+        assert not model_path.exists()
+        
+        assert corpus.save_if_due()
+        assert model_path.exists()
+        assert corpus.save_if_due() is False
+    
+    def test_save_adds_counts_of_other_processes(self, tmp_path):
+        from utils.corpus_idf import CorpusIDF
+        
+        model_path = str(tmp_path / 'corpus_idf.npz')
+        api = CorpusIDF(stopwords=[], model_path=model_path, n_features=2 ** 10)
+        worker = CorpusIDF(stopwords=[], model_path=model_path, n_features=2 ** 10)
+        
+        api.partial_fit("договор поставки")
+        worker.partial_fit("договор аренды")
+        worker.partial_fit("счет на оплату")
+        assert api.save() and worker.save()
+        
+        # Сохранение прибавляет только свои новые документы и получает чужие
+        assert worker.n_docs == 3
+        assert api.save() and api.n_docs == 3
+        assert CorpusIDF(stopwords=[], model_path=model_path, n_features=2 ** 10).n_docs == 3
+        assert api.df[api.buckets(['договор'])[0]] == 2
+
+class TestTopicModel:
+    def test_transform_uses_corpus_model(self, tmp_path):
+        from utils.topic_model import TopicModel
+        
+        model_path = str(tmp_path / 'topics.joblib')
+        model = TopicModel(stopwords=[], model_path=model_path, n_topics=2,
+                           n_features=2 ** 10, min_documents=4)
+        
+        assert model.transform("договор поставки") == []
+        
+        model.partial_fit([
+            "договор поставки оплата поставщик покупатель",
+            "договор аренды арендатор арендодатель оплата",
+            "резюме опыт работы навыки образование",
+            "резюме образование квалификация навыки",
+        ])
+        
+        topics = model.transform("договор поставки оплата", n_topics=2, words_per_topic=3)
+        assert len(topics) == 2
+        assert all(len(t['keywords']) <= 3 for t in topics)
+        
+        assert model.save()
+        restored = TopicModel(stopwords=[], model_path=model_path, n_topics=2,
+                              n_features=2 ** 10, min_documents=4)
+        assert restored.is_ready
+        assert restored.vocabulary == model.vocabulary
+    
+    def test_transform_and_save_do_not_wait_for_training(self, tmp_path):
+        from utils.topic_model import TopicModel
+        
+        model = TopicModel(stopwords=[], model_path=str(tmp_path / 'topics.joblib'), n_topics=2,
+                           n_features=2 ** 10, min_documents=2)
+        model.partial_fit(["договор поставки оплата", "резюме навыки образование"])
+        published = model.lda
+        
+        # Шаг обучения в процессе: опубликованная модель доступна без ожидания
+        with model._train_lock:
+            assert model.transform("договор поставки")
+            assert model.save()
+        
+        model.partial_fit(["договор аренды оплата"])
+        assert model.lda is not published
+        assert model.n_docs == 3
+
+class TestAnalysisContext:
+    def test_tokens_and_sentences_are_computed_once(self):
+        from utils.analysis_context import AnalysisContext
+        
+        ctx = AnalysisContext("  Первое предложение. Second sentence!  ")
+        
+        assert ctx.text == "Первое предложение. Second sentence!"
+        assert ctx.tokens == ['Первое', 'предложение', 'Second', 'sentence']
+        assert ctx.lower_tokens[2] == 'second'
+        assert len(ctx.sentences) == 2
+        for (start, end), sentence in zip(ctx.sentence_spans, ctx.sentences):
+            assert ctx.text[start:end] == sentence
+        assert ctx.tokens is ctx.tokens
+    
+    def test_analyzers_accept_context(self):
+        from utils.analysis_context import AnalysisContext
+        from utils.ner import ner_extractor
+        from utils.document_classifier import document_classifier
+        from utils.semantic_analyzer import semantic_analyzer
+        
+        text = "Договор поставки. Заказчик и исполнитель подписали договор. ИНН 7707083893."
+        ctx = AnalysisContext(text)
+        
+        assert ner_extractor.extract_all(ctx)['inn'] == ner_extractor.extract_all(text)['inn']
+        assert document_classifier.classify(ctx)['document_type'] == 'contract'
+        assert semantic_analyzer.analyze(ctx)['statistics']['total_sentences'] == 3
+
+class TestTextRankSummarizer:
+    def test_selects_central_sentences_in_order(self):
+        from utils.analysis_context import AnalysisContext
+        from utils.corpus_idf import CorpusIDF
+        from utils.summarizer import TextRankSummarizer
+        
+        text = (
+            "Погода сегодня солнечная. "
+            "Договор поставки оборудования подписан сторонами. "
+            "Оплата по договору поставки оборудования производится частями. "
+            "Кот спит на диване. "
+            "Сроки поставки оборудования указаны в договоре."
+        )
+        summarizer = TextRankSummarizer(CorpusIDF(stopwords=[], model_path=None))
+        ctx = AnalysisContext(text)
+        
+        selected = summarizer.select(ctx, sentences=2)
+        assert selected == sorted(selected)
+        assert 0 not in selected and 3 not in selected
+        
+        summarizer.max_sentences = 3
+        assert len(summarizer.select(ctx, sentences=2)) == 2
+
+class TestLanguageDetector:
+    def test_sampled_detection_is_bounded_and_cached(self):
+        from utils.language_detector import LanguageDetector
+        
+        detector = LanguageDetector(sample_size=256, sample_count=3)
+        text = "Настоящий договор заключен между сторонами о поставке товара. " * 500
+        
+        first = detector.detect_language(text)
+        second = detector.detect_language(text)
+        
+        assert first['language'] == 'ru'
+        assert first == second
+        assert first['text_length'] == len(text.strip())
+        assert first['sample_length'] <= 256 * 3 + 2
+        assert len(detector._cache) == 1
+    
+    def test_segments_mixed_document(self):
+        from utils.analysis_context import AnalysisContext
+        from utils.language_detector import LanguageDetector
+        
+        detector = LanguageDetector()
+        ru = "Настоящий договор заключен между сторонами. Поставщик обязуется поставить товар."
+        en = "This annex forms an integral part of the agreement. The supplier shall deliver goods."
+        ctx = AnalysisContext(f"{ru}\n{ru}\n{en}\n{en}\n- 12 -")
+        
+        segments = detector.detect_language_segments(ctx)
+        ctx.set_language_segments(segments['segments'])
+        
+        assert segments['is_mixed']
+        assert [s['language'] for s in segments['segments']] == ['ru', 'en']
+        assert segments['segments'][-1]['end'] == len(ctx.text)
+        assert segments['script_detected'] == 4
+        assert segments['ngram_detected'] == 0
+        assert ctx.sentences[0].startswith('Настоящий')
+        assert any(s.startswith('The supplier') for s in ctx.sentences)
+    
+    def test_segments_batched_only_when_adjacent(self):
+        from utils.language_detector import LanguageDetector
+        
+        detector = LanguageDetector()
+        samples = []
+        def detect_sample(sample):
+            samples.append(sample)
+            return {'language': 'de' if 'Straße' in sample else 'fr', 'confidence': 0.9}
+        detector._detect_sample = detect_sample
+        
+        de = "Die Lieferung erfolgt in die Müllerstraße, Straße 5."
+        fr = "La livraison est effectuée à l'entrepôt général."
+        ru = "Поставка производится на склад покупателя."
+        labels = detector.detect_segments([de, de, ru, fr])
+        
+        # Соседние неоднозначные сегменты - один вызов; сегмент ru разделяет батчи
+        assert samples == [f"{de}\n{de}", fr]
+        assert [label['language'] for label in labels] == ['de', 'de', 'ru', 'fr']
+
+class TestDataCleaner:
+    def test_clean_text_single_pass(self):
+        from utils.data_cleaner import DataCleaner
+        
+        cleaner = DataCleaner()
+        text = "  Договор   о  програм-\nмировании\x00\nпродолжение строки\n\n\nНовый абзац.  "
+        
+        assert cleaner.clean_text(text) == "Договор о программировании продолжение строки\nНовый абзац."
+        assert cleaner.clean_text("РџСЂРёРІРµС‚ РјРёСЂ") == "Привет мир"
+    
+    def test_clean_cells_matches_clean_text(self):
+        from utils.data_cleaner import DataCleaner
+        
+        cleaner = DataCleaner()
+        cells = ['Москва', '  два  пробела ', 'строка\nпродолжение', None, 42, '', 'Москва']
+        expected = [
+            '' if c is None else cleaner.clean_text(c) if isinstance(c, str) else str(c)
+            for c in cells
+        ]
+        
+        assert cleaner.clean_cells(cells) == expected
+        assert cleaner.clean_table_data([cells[:3], [None, '']]) == [expected[:3]]
+    
+    def test_repeated_headers_footers_removed(self):
+        from utils.data_cleaner import DataCleaner
+        
+        cleaner = DataCleaner()
+        pages = [
+            ['ООО «Ромашка»  Договор №15', f'Текст страницы {n}, дата 0{n}.03.2024.', 'Еще строка.', f'Страница {n}']
+            for n in range(1, 6)
+        ]
+        pages[2].append('Подпись')
+        
+        cleaned, removed = cleaner.remove_page_headers_footers(pages)
+        
+        assert removed == ['ооо «ромашка» договор №#', 'страница #']
+        assert cleaned[0] == ['Текст страницы 1, дата 01.03.2024.', 'Еще строка.']
+        assert cleaned[2][-1] == 'Подпись'
+        assert cleaner.remove_page_headers_footers(pages[:2]) == (pages[:2], [])
+
+class TestDuplicateIndex:
+    def test_near_duplicates_found_and_persisted(self, tmp_path):
+        from services.duplicate_index import DuplicateIndex
+        
+        base = ("Счет на оплату № 125 от 12 марта 2024 года. Поставщик ООО Ромашка, ИНН 7707083893. "
+                "Покупатель ООО Василек. Товар: бумага офисная, 40 пачек, сумма 12 000 рублей. ") * 5
+        path = str(tmp_path / 'duplicates.db')
+        index = DuplicateIndex(index_path=path)
+        
+        index.add('pdf', base, {'filename': 'invoice.pdf'})
+        index.add('docx', base.replace('. ', '.\n').replace('125', '126'), {'filename': 'invoice.docx'})
+        index.add('other', "Протокол собрания акционеров о распределении прибыли за отчетный год. " * 10)
+        
+        duplicates = index.find_duplicates('pdf')
+        assert [d['document_id'] for d in duplicates] == ['docx']
+        assert duplicates[0]['jaccard'] > 0.8
+        assert index.find_duplicates('missing') is None
+        
+        # Документы сохраняются при добавлении, без отдельного save
+        assert index.remove('other')
+        reloaded = DuplicateIndex(index_path=path)
+        duplicates = reloaded.find_duplicates('docx')
+        assert [d['document_id'] for d in duplicates] == ['pdf']
+        assert duplicates[0]['metadata'] == {'filename': 'invoice.pdf'}
+        assert reloaded.find_duplicates('other') is None
+        
+        # Документ, добавленный другим процессом (воркером), виден без перезагрузки
+        index.add('copy', base, {'filename': 'copy.pdf'})
+        assert {d['document_id'] for d in reloaded.find_duplicates('pdf')} == {'docx', 'copy'}
+        assert reloaded.count() == 3
+
+class TestStructureDiff:
+    def test_diff_sequences_is_minimal(self):
+        from utils.structure_diff import diff_sequences
+        
+        a = list('ABCABBA')
+        b = list('CBABAC')
+        opcodes = diff_sequences(a, b)
+        
+        rebuilt = []
+        for tag, i1, i2, j1, j2 in opcodes:
+            if tag == 'equal':
+                assert a[i1:i2] == b[j1:j2]
+            rebuilt.extend(b[j1:j2])
+        
+        assert rebuilt == b
+        assert sum(i2 - i1 for tag, i1, i2, _, _ in opcodes if tag == 'equal') == 4
+    
+    def test_diff_documents(self):
+        from utils.structure_diff import diff_documents
+        
+        old = {
+            'structure': [
+                {'type': 'heading_1', 'text': 'Договор'},
+                {'type': 'paragraph', 'text': 'Срок поставки 10 дней.'},
+                {'type': 'paragraph', 'text': 'Оплата по счету.'},
+            ],
+            'tables': [{'rows': [['Товар', '100']]}],
+        }
+        new = {
+            'structure': [
+                {'type': 'heading_1', 'text': 'Договор'},
+                {'type': 'paragraph', 'text': 'Срок поставки 15 дней.'},
+                {'type': 'paragraph', 'text': 'Оплата по счету.'},
+            ],
+            'tables': [{'rows': [['Товар', '120']]}],
+        }
+        
+        diff = diff_documents(old, new)
+        
+        assert diff['summary']['equal'] == 3
+        assert diff['summary']['replaced'] == 2
+        assert diff['changes'][0]['inline'][0] == [
+            {'op': 'equal', 'text': 'Срок поставки'},
+            {'op': 'delete', 'text': '10'},
+            {'op': 'insert', 'text': '15'},
+            {'op': 'equal', 'text': 'дней.'},
+        ]
+        assert diff['changes'][1]['after'][0]['col'] == 1
+
+
+class TestResultStore:
+    def test_put_get_roundtrip(self, tmp_path):
+        from services.result_store import ResultStore
+        
+        document_id = 'ab' * 32
+        store = ResultStore(root=str(tmp_path), cache_size=1)
+        
+        assert store.put(document_id, {'content': {'text': 'Текст'}})
+        assert not store.put('../etc/passwd', {})
+        
+        reopened = ResultStore(root=str(tmp_path))
+        assert reopened.get(document_id) == {'content': {'text': 'Текст'}}
+        assert reopened.get('cd' * 32) is None
+    
+    def test_put_without_overwrite_keeps_stored_result(self, tmp_path):
+        from services.result_store import ResultStore
+        
+        document_id = 'ab' * 32
+        analyzed = {'content': {'text': 'Текст'}, 'analysis': {'entities': {}}}
+        
+        for root in (str(tmp_path), None):
+            store = ResultStore(root=root)
+            assert store.put(document_id, analyzed)
+            assert not store.put(document_id, {'content': {'text': 'Текст'}}, overwrite=False)
+            assert store.get(document_id) == analyzed
+            assert store.put('cd' * 32, {}, overwrite=False)
+        
+        assert ResultStore(root=str(tmp_path)).get(document_id) == analyzed
+        assert not list(tmp_path.rglob('*.tmp'))
+    
+    def test_result_rewritten_by_another_process(self, tmp_path):
+        from services.result_store import ResultStore
+        
+        document_id = 'ab' * 32
+        api, worker = ResultStore(root=str(tmp_path)), ResultStore(root=str(tmp_path))
+        
+        api.put(document_id, {'v': 1})
+        assert api.get(document_id) == {'v': 1}
+        
+        # Другой экземпляр (merge воркера) перезаписывает файл - кеш памяти устарел
+        worker.put(document_id, {'v': 2})
+        version, result = api.get_with_version(document_id)
+        assert result == {'v': 2} and version == worker.version(document_id)
+        assert api.get(document_id) == {'v': 2}
+        
+        worker.delete(document_id)
+        assert api.get(document_id) is None
+
+class TestAnalysisPipeline:
+    def test_enabled_stages(self):
+        from services.pipeline import enabled_stages
+        
+        options = {'enable_semantic_analysis': True}
+        assert enabled_stages(None, options) == ['language', 'entities', 'classification', 'semantic']
+        assert enabled_stages('x' * 30, options) == ['language', 'entities']
+        assert enabled_stages(None, {'enable_ner': False, 'enable_language_detection': False}) == ['classification']
+    
+    def test_celery_canvas_routing(self, tmp_path):
+        from celery_app import app, analysis_pipeline
+        
+        path = tmp_path / 'scan.png'
+        path.write_bytes(b'image')
+        
+        canvas = analysis_pipeline(str(path), 'scan.png', {'enable_semantic_analysis': True})
+        parse, analysis = canvas.tasks
+        
+        assert app.amqp.router.route(parse.options, parse.task)['queue'].name == 'ocr'
+        assert [task.task for task in analysis.tasks] == [
+            'pipeline.language', 'pipeline.entities', 'pipeline.classification', 'pipeline.semantic'
+        ]
+        queues = {task.task: app.amqp.router.route({}, task.task)['queue'].name for task in analysis.tasks}
+        assert queues['pipeline.semantic'] == 'semantic' and queues['pipeline.entities'] == 'analysis'
+        assert analysis.body.task == 'pipeline.merge'
+    
+    def test_job_status(self, tmp_path):
+        from celery_app import analysis_pipeline
+        from services.job_store import JobStore, job_status
+        
+        store = JobStore(str(tmp_path / 'jobs'))
+        job = store.create('doc.pdf', {}, ['language', 'entities'])
+        job_id = job['job_id']
+        assert store.get(job_id)['stages'] == ['language', 'entities']
+        assert store.get('../etc') is None
+        
+        path = tmp_path / 'doc.pdf'
+        path.write_bytes(b'%PDF')
+        parse, analysis = analysis_pipeline(str(path), 'doc.pdf', {}, job_id=job_id).tasks
+        assert parse.id == f"{job_id}-parse" and analysis.body.id == f"{job_id}-merge"
+        assert [task.id for task in analysis.tasks][0] == f"{job_id}-language"
+        
+        assert job_status(job, {})['status'] == 'pending'
+        
+        status = job_status(job, {'parse': {'state': 'PROGRESS', 'info': {'progress': 50, 'message': 'Page 5/10'}}})
+        assert (status['status'], status['progress'], status['stage'], status['message']) == ('running', 30, 'parse', 'Page 5/10')
+        
+        status = job_status(job, {'parse': {'state': 'SUCCESS'}, 'language': {'state': 'SUCCESS'}})
+        assert (status['progress'], status['stage']) == (77, 'entities')
+        
+        status = job_status(job, {'parse': {'state': 'SUCCESS'}, 'entities': {'state': 'FAILURE', 'info': ValueError('boom')}})
+        assert (status['status'], status['stage'], status['error']) == ('failed', 'entities', 'boom')
+        
+        done = {name: {'state': 'SUCCESS'} for name in ('parse', 'language', 'entities')}
+        done['merge'] = {'state': 'SUCCESS', 'info': {'document_id': 'abc', 'result': {'metadata': {}}, 'result_ref': None}}
+        status = job_status(job, done)
+        assert (status['status'], status['progress'], status['document_id']) == ('completed', 100, 'abc')
+        
+        assert store.cleanup(max_age=-1) == 1
+    
+    def test_runs_do_not_share_intermediate_results(self, monkeypatch):
+        from celery_app import pipeline_language_task, pipeline_merge_task
+        from services.pipeline import pipeline_run_id
+        from services.result_store import pipeline_store, result_store
+        
+        monkeypatch.setattr(pipeline_store, 'root', None)
+        monkeypatch.setattr(result_store, 'root', None)
+        
+        document_id = 'c' * 64
+        assert pipeline_run_id(document_id, 'job') == pipeline_run_id(document_id, 'job')
+        assert pipeline_run_id(document_id) != pipeline_run_id(document_id)
+        
+        # Два запуска по одному файлу с разной очисткой текста
+        run_a, run_b = pipeline_run_id(document_id), pipeline_run_id(document_id)
+        texts = {run_a: "Договор поставки офисной бумаги между двумя организациями",
+                 run_b: "Supply agreement for office paper between two companies"}
+        for run_id, text in texts.items():
+            pipeline_store.put(run_id, {'metadata': {'document_id': document_id}, 'content': {'text': text}})
+        
+        languages = {run_id: pipeline_language_task.apply(args=(run_id, {})).get()['language']['language']
+                     for run_id in texts}
+        assert languages == {run_a: 'ru', run_b: 'en'}
+        
+        # merge пишет общее хранилище и удаляет только свой промежуточный результат
+        pipeline_store.put(run_a, {'metadata': {'document_id': document_id}, 'content': {'text': ''}})
+        merged = pipeline_merge_task.apply(args=([], document_id, run_a, {})).get()
+        assert merged['document_id'] == document_id
+        assert result_store.get(document_id)['content'] == {'text': ''}
+        assert pipeline_store.get(run_a) is None and pipeline_store.get(run_b) is not None
+    
+    def test_merge_indexes_corpus(self, monkeypatch):
+        import services.pipeline as pipeline
+        from celery_app import pipeline_merge_task
+        from services.duplicate_index import DuplicateIndex
+        from services.result_store import pipeline_store, result_store
+        
+        monkeypatch.setattr(pipeline_store, 'root', None)
+        monkeypatch.setattr(result_store, 'root', None)
+        monkeypatch.setattr(pipeline, 'search_index', None)
+        monkeypatch.setattr(pipeline, 'duplicate_index', DuplicateIndex())
+        corpus = []
+        monkeypatch.setattr(pipeline.semantic_analyzer, 'update_corpus', corpus.append)
+        
+        # Документ задания (/jobs) попадает в индекс дубликатов и модели корпуса, как в /parse
+        document_id = 'd' * 64
+        run_id = pipeline.pipeline_run_id(document_id)
+        text = "Счет на оплату офисной бумаги для двух организаций"
+        pipeline_store.put(run_id, {'metadata': {'document_id': document_id}, 'content': {'text': text}})
+        pipeline_merge_task.apply(args=([], document_id, run_id, {'enable_ner': False})).get()
+        
+        assert pipeline.duplicate_index.count() == 1
+        assert [ctx.text for ctx in corpus] == [text]
+    
+    def test_archive_progress(self, tmp_path):
+        import zipfile
+        from parsers.archive_parser import ArchiveParser
+        
+        path = tmp_path / 'docs.zip'
+        with zipfile.ZipFile(path, 'w') as archive:
+            archive.writestr('a.txt', 'first file')
+            archive.writestr('b.txt', 'second file')
+        
+        calls = []
+        parser = ArchiveParser()
+        parser.progress_callback = lambda current, total, message: calls.append((current, total))
+        parser.parse(str(path))
+        
+        assert calls == [(0, 2), (1, 2), (2, 2)]
+
+class TestParseUnits:
+    @staticmethod
+    def write_csv(path):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('name;qty;note\n')
+            for i in range(10):
+                f.write(f'item{i};{i};"multi\nline {i}"\n' if i % 3 == 0 else f'товар{i};{i};x\n\n')
+    
+    def test_units_match_whole_document(self, tmp_path):
+        import fitz
+        from parsers.pdf_parser import PDFParser
+        from parsers.csv_parser import CSVParser
+        
+        pdf_path = str(tmp_path / 'doc.pdf')
+        doc = fitz.open()
+        for i in range(7):
+            doc.new_page().insert_text((72, 72), f"Page {i} text")
+        doc.save(pdf_path)
+        
+        csv_path = str(tmp_path / 'data.csv')
+        self.write_csv(csv_path)
+        
+        for parser, path, unit_size, count in ((PDFParser(), pdf_path, 3, 3), (CSVParser(), csv_path, 4, 3)):
+            units = parser.split(path, unit_size)
+            assert len(units) == count
+            assert parser.merge([parser.parse_unit(path, unit) for unit in units]) == parser.parse(path)
+            assert parser.split(path, 100) == [{}]
+    
+    def test_reduce_resumes_from_checkpoints(self, tmp_path, monkeypatch):
+        from celery_app import pipeline_parse_unit_task, pipeline_reduce_task
+        from parsers.csv_parser import CSVParser
+        from services.checkpoint_store import checkpoint_store
+        from services.result_store import pipeline_store
+        
+        monkeypatch.setattr(checkpoint_store, 'root', str(tmp_path / 'checkpoints'))
+        monkeypatch.setattr(pipeline_store, 'root', None)
+        
+        path = str(tmp_path / 'data.csv')
+        self.write_csv(path)
+        document_id = 'a' * 64
+        run_id = 'b' * 64
+        parser = CSVParser()
+        units = parser.split(path, 4)
+        
+        # Первая часть обработана до падения воркера - повторно не парсится
+        done = parser.parse_unit(path, units[0])
+        done['content']['tables'][0]['rows'][0] = ['cached', '0', 'x']
+        checkpoint_store.put(run_id, 0, units[0], done)
+        
+        # Второе задание по тому же файлу: свои чекпойнты, сборка первого их не трогает
+        other_run_id = 'c' * 64
+        for run in (run_id, other_run_id):
+            for index, unit in enumerate(units):
+                pipeline_parse_unit_task.apply(args=(path, 'data.csv', run, index, unit)).get()
+            assert checkpoint_store.count(run) == len(units)
+        
+        assert pipeline_reduce_task.apply(args=(path, 'data.csv', document_id, run_id, units)).get() == document_id
+        result = pipeline_store.get(run_id)
+        assert result['metadata']['row_count'] == 10
+        assert result['content']['tables'][0]['rows'][0][0] == 'cached'
+        assert checkpoint_store.count(run_id) == 0
+        
+        assert checkpoint_store.count(other_run_id) == len(units)
+        pipeline_reduce_task.apply(args=(path, 'data.csv', document_id, other_run_id, units)).get()
+        assert pipeline_store.get(other_run_id)['content']['tables'][0]['rows'][0][0] != 'cached'
+
+class TestBlobStore:
+    def test_put_range_and_offload(self, tmp_path):
+        from services.blob_store import BlobStore, RangeNotSatisfiable, parse_range, offload
+        
+        store = BlobStore(str(tmp_path))
+        data = bytes(range(256)) * 1000
+        
+        ref = store.put(data, 'application/octet-stream')
+        assert ref['size'] == len(data) and store.exists(ref['blob'])
+        assert store.put(iter([data[:10], data[10:]]))['blob'] == ref['blob']
+        assert b''.join(store.iter_range(ref['blob'], 100, 199)) == data[100:200]
+        
+        assert parse_range('bytes=0-99', 1000) == (0, 99)
+        assert parse_range('bytes=900-', 1000) == (900, 999)
+        assert parse_range('bytes=-100', 1000) == (900, 999)
+        assert parse_range('bytes=0-1,5-6', 1000) is None
+        with pytest.raises(RangeNotSatisfiable):
+            parse_range('bytes=1000-', 1000)
+        
+        assert offload(store, {'text': 'short'}, 'application/json') == ({'text': 'short'}, None)
+        payload, result_ref = offload(store, b'xlsx bytes', 'application/vnd.ms-excel')
+        assert payload is None and store.read(result_ref['blob']) == b'xlsx bytes'
+        payload, result_ref = offload(store, {'text': 'x' * 100}, 'application/json', inline_limit=50)
+        assert payload is None and result_ref['size'] > 100
+        
+        assert store.cleanup(max_age=-1) == 3
+
+class TestScratchSpace:
+    def test_release_and_quota_eviction(self, tmp_path):
+        import time
+        from services.scratch_space import ScratchSpace, ScratchQuotaExceeded
+        
+        finished = {}
+        space = ScratchSpace(str(tmp_path), quota=100, finished_at=finished.get)
+        
+        with space.scope() as scope_id:
+            file_path = space.write(scope_id, 'upload.txt', b'x' * 60)
+            assert space.owns(file_path) and os.path.exists(file_path)
+        assert not os.path.exists(os.path.dirname(file_path))
+        
+        # При нехватке квоты удаляются только области завершенных заданий
+        first = space.create()
+        space.write(first, 'a.txt', b'x' * 40)
+        space.detach(first)
+        second = space.create()
+        space.write(second, 'b.txt', b'x' * 40)
+        space.detach(second)
+        finished[first] = time.time()
+        
+        active = space.create()
+        space.write(active, 'c.txt', b'x' * 50)
+        assert not os.path.exists(tmp_path / first) and os.path.exists(tmp_path / second)
+        
+        # Входные данные выполняющегося задания и активные области не вытесняются
+        with pytest.raises(ScratchQuotaExceeded):
+            space.reserve(space.create(), 60)
+        assert os.path.exists(tmp_path / second / 'b.txt')
+        
+        space.discard(str(tmp_path / second / 'b.txt'))
+        stats = space.stats()
+        assert stats['usage_bytes'] == 50 and stats['evicted'] == 1
+        assert stats['discarded'] == 1 and stats['quota_rejections'] == 1
+        
+        space.release(active)
+        assert not os.path.exists(tmp_path / active)
+    
+    def test_load_and_expire(self, tmp_path):
+        import time
+        from services.scratch_space import ScratchSpace
+        
+        for name in ('job1', 'job2', 'job3'):
+            (tmp_path / name).mkdir()
+            (tmp_path / name / 'upload.pdf').write_bytes(b'x' * 10)
+        (tmp_path / 'job4').mkdir()
+        
+        # job1 завершено, job2 выполняется, job3 завершено только что (TTL считается от завершения)
+        finished = {'job1': time.time() - 7200, 'job3': time.time()}
+        space = ScratchSpace(str(tmp_path), ttl=3600, finished_at=finished.get)
+        assert space.load() == 4 and space.stats()['usage_bytes'] == 30
+        for scope in space._scopes.values():
+            scope['used_at'] -= 7200
+        
+        # Удаленная воркером область снимается с учета, просрочено только job1
+        os.rmdir(tmp_path / 'job4')
+        assert space.expire() == 1
+        assert space.stats()['scopes'] == 2 and not os.path.exists(tmp_path / 'job1')
+        assert os.path.exists(tmp_path / 'job2') and os.path.exists(tmp_path / 'job3')
+        
+        # Без сведений о заданиях переданные области удаляет только воркер
+        space.finished_at = None
+        assert space.expire() == 0 and space.stats()['scopes'] == 2
+    
+    def test_finished_at_is_queried_once(self, tmp_path):
+        import time
+        from services.scratch_space import ScratchSpace, ScratchQuotaExceeded
+        
+        calls = []
+        def finished_at(scope_id):
+            calls.append(scope_id)
+            return time.time() if scope_id == 'done' else None
+        
+        space = ScratchSpace(str(tmp_path), quota=100, finished_at=finished_at)
+        for name in ('done', 'running'):
+            space.create(name)
+            space.reserve(name, 40)
+            space.detach(name)
+        
+        # Время завершения запоминается, состояние выполняющегося задания запрашивается снова
+        assert space._job_finished_at('done') == space._job_finished_at('done')
+        assert space._job_finished_at('running') is None and space._job_finished_at('running') is None
+        with pytest.raises(ScratchQuotaExceeded):
+            space.reserve(space.create(), 90)
+        assert calls.count('done') == 1 and calls.count('running') == 3
+        assert not os.path.exists(tmp_path / 'done') and space._finished == {}
+    
+    def test_export_reserved_before_writing(self, tmp_path, monkeypatch):
+        from fastapi.testclient import TestClient
+        import main
+        from services.scratch_space import ScratchSpace
+        
+        written = []
+        monkeypatch.setattr(main.ExcelExporter, 'export_to_file', lambda self, data, path, options=None: written.append(path))
+        monkeypatch.setattr(main, 'scratch_space', ScratchSpace(str(tmp_path), quota=100))
+        
+        client = TestClient(main.app)
+        response = client.post('/export', json={'format': 'excel', 'data': {'content': {'text': 'x' * 200}}})
+        assert response.status_code == 507
+        assert written == [] and os.listdir(tmp_path) == []
+
+class TestBatchProcessor:
+    def test_process_files_concurrently(self):
+        import asyncio
+        import threading
+        import time
+        from services.batch_processor import BatchProcessor
+        
+        processor = BatchProcessor(max_workers=2)
+        running = []
+        peak = []
+        lock = threading.Lock()
+        
+        def process(file_path, file_name):
+            with lock:
+                running.append(file_name)
+                peak.append(len(running))
+            time.sleep(0.05 if file_name != 'slow' else 0.5)
+            with lock:
+                running.remove(file_name)
+            if file_name == 'bad':
+                raise ValueError('broken')
+            return {'name': file_name}
+        
+        async def collect():
+            return [record async for record in processor.process_files(
+                [('/a', 'slow'), ('/b', 'fast'), ('/c', 'bad'), ('/d', 'last')], process
+            )]
+        
+        records = asyncio.run(collect())
+        
+        assert max(peak) == 2
+        assert records[-1] == (0, {'name': 'slow'}, None)
+        assert (2, None, 'broken') in records and len(records) == 4
+    
+    def test_archive_members_limited_to_declared_size(self, tmp_path, monkeypatch):
+        import io
+        import zipfile
+        from fastapi import HTTPException
+        from services.scratch_space import ScratchSpace
+        import main
+        
+        path = tmp_path / 'batch.zip'
+        with zipfile.ZipFile(path, 'w') as archive:
+            archive.writestr('a.txt', 'x' * 10)
+        
+        # Распакованные данные больше размера из заголовка архива
+        monkeypatch.setattr(zipfile.ZipFile, 'open', lambda self, info: io.BytesIO(b'x' * (3 * main.UPLOAD_CHUNK_SIZE)))
+        space = ScratchSpace(str(tmp_path / 'scratch'), quota=100)
+        monkeypatch.setattr(main, 'scratch_space', space)
+        scope_id = space.create()
+        
+        with pytest.raises(HTTPException) as error:
+            main.extract_batch_archive(str(path), scope_id)
+        
+        assert error.value.status_code == 400
+        assert os.path.getsize(space.path(scope_id, '0.txt')) <= 10
+        assert space.stats()['usage_bytes'] == 10
+
+class TestExportCache:
+    def test_put_get_and_invalidation(self, tmp_path):
+        from services.blob_store import BlobStore
+        from services.export_cache import ExportCache
+        from services.result_store import ResultStore
+        
+        blobs = BlobStore(str(tmp_path / 'blobs'))
+        cache = ExportCache(str(tmp_path / 'exports'), blobs)
+        results = ResultStore(str(tmp_path / 'results'))
+        document_id = 'a' * 64
+        
+        assert results.version(document_id) is None
+        results.put(document_id, {'metadata': {}, 'content': {'text': 'v1'}})
+        version = results.version(document_id)
+        
+        key = cache.key(document_id, version, 'text', {'a': 1, 'b': 2})
+        assert key == cache.key(document_id, version, 'text', {'b': 2, 'a': 1})
+        assert key != cache.key(document_id, version, 'markdown', {'a': 1, 'b': 2})
+        assert cache.get(key) is None
+        
+        export_path = tmp_path / 'export.txt'
+        export_path.write_bytes(b'exported')
+        ref = cache.put_file(key, str(export_path), 'text/plain')
+        assert cache.get(key) == ref and blobs.read(ref['blob']) == b'exported'
+        
+        # Блоб удален cleanup хранилища - промах
+        blobs.delete(ref['blob'])
+        assert cache.get(key) is None
+        
+        results.put(document_id, {'metadata': {}, 'content': {'text': 'v2, longer'}})
+        assert results.version(document_id) != version
+        assert cache.cleanup(max_age=-1) == 1
+    
+    def test_cached_export_served_without_loading_result(self, tmp_path, monkeypatch):
+        from fastapi.testclient import TestClient
+        from services.blob_store import BlobStore
+        from services.export_cache import ExportCache
+        from services.result_store import ResultStore
+        from services.scratch_space import ScratchSpace
+        import main
+        
+        results = ResultStore(str(tmp_path / 'results'))
+        blobs = BlobStore(str(tmp_path / 'blobs'))
+        monkeypatch.setattr(main, 'result_store', results)
+        monkeypatch.setattr(main, 'blob_store', blobs)
+        monkeypatch.setattr(main, 'export_cache', ExportCache(str(tmp_path / 'exports'), blobs))
+        monkeypatch.setattr(main, 'scratch_space', ScratchSpace(str(tmp_path / 'scratch')))
+        
+        document_id = 'b' * 64
+        results.put(document_id, {'metadata': {'filename': 'отчет.pdf'}, 'content': {'text': 'exported text'}})
+        client = TestClient(main.app)
+        
+        first = client.get(f'/export/{document_id}', params={'format': 'text'})
+        assert first.status_code == 200 and first.text == 'exported text'
+        
+        # Повторный экспорт - из кеша, результат не загружается
+        monkeypatch.setattr(results, 'get_with_version', lambda document_id: pytest.fail('result loaded on cache hit'))
+        second = client.get(f'/export/{document_id}', params={'format': 'text'})
+        assert second.status_code == 200 and second.text == 'exported text'
+        assert second.headers['content-disposition'] == first.headers['content-disposition']
+        assert second.headers['content-disposition'].endswith("''%D0%BE%D1%82%D1%87%D0%B5%D1%82.txt")
+        monkeypatch.delattr(results, 'get_with_version')
+        
+        # Результат перезаписан другим процессом - экспорт новой версии
+        ResultStore(str(tmp_path / 'results')).put(document_id, {'metadata': {'filename': 'отчет.pdf'}, 'content': {'text': 'new text'}})
+        third = client.get(f'/export/{document_id}', params={'format': 'text'})
+        assert third.status_code == 200 and third.text == 'new text'
+
+class TestSearchIndex:
+    @staticmethod
+    def make_result(document_id, text, inn=(), phones=(), document_type='contract'):
+        return {
+            'metadata': {'document_id': document_id, 'filename': f'{document_id}.pdf', 'type': 'pdf'},
+            'content': {'text': text},
+            'analysis': {
+                'entities': {'inn': list(inn), 'phones': [{'formatted': p} for p in phones]},
+                'classification': {'document_type': document_type},
+            },
+        }
+    
+    def test_search_with_filters_and_paging(self):
+        import pytest
+        from services.search_index import SearchIndex, SearchQueryError
+        
+        index = SearchIndex(':memory:', batch_size=2)
+        indexed = index.index_results([
+            self.make_result('a', 'Договор поставки бумаги офисной', inn=['7707083893'], phones=['+7 495 123-45-67']),
+            self.make_result('b', 'Договор аренды помещения', inn=['500100732259']),
+            self.make_result('c', 'Счет на оплату бумаги', document_type='invoice'),
+        ])
+        assert indexed == 3
+        
+        assert index.search('"договор поставки"')['total'] == 1
+        assert index.search('бумаги NOT счет')['results'][0]['document_id'] == 'a'
+        assert index.search('договор', entities={'inn': '500100732259'})['results'][0]['document_id'] == 'b'
+        assert index.search(entities={'phone': '8 (495) 123-45-67'})['total'] == 1
+        assert index.search(entities={'phone': '(495) 1234567'})['total'] == 1
+        assert index.search(document_type='invoice')['results'][0]['document_id'] == 'c'
+        
+        page = index.search('договор OR счет', limit=2, offset=2)
+        assert page['total'] == 3 and len(page['results']) == 1
+        
+        # Переиндексация того же документа заменяет запись
+        index.index_result(self.make_result('c', 'Акт выполненных работ', document_type='act'))
+        assert index.count() == 3
+        assert index.search('счет')['total'] == 0
+        
+        with pytest.raises(SearchQueryError):
+            index.search('AND OR')
+        with pytest.raises(SearchQueryError):
+            index.search(entities={'phone': '12'})
+    
+    def test_entity_filter_is_scoped_to_its_kind(self):
+        from services.search_index import SearchIndex
+        
+        index = SearchIndex(':memory:')
+        index.index_results([
+            self.make_result('a', 'Договор поставки', inn=['7707083893']),
+            {
+                'metadata': {'document_id': 'b'},
+                'content': {'text': 'Выписка ЕГРЮЛ'},
+                'analysis': {'entities': {'ogrn': ['7707083893'], 'kpp': ['770701001']}},
+            },
+        ])
+        
+        assert [r['document_id'] for r in index.search(entities={'inn': '7707083893'})['results']] == ['a']
+        assert [r['document_id'] for r in index.search(entities={'ogrn': '7707083893'})['results']] == ['b']
+        assert index.search(entities={'inn': '770701001'})['total'] == 0
+        # Запрос без фильтра ищет по всем колонкам
+        assert index.search('7707083893')['total'] == 2
+    
+    def test_outdated_schema_is_dropped(self, tmp_path):
+        import sqlite3
+        from services.search_index import SearchIndex
+        
+        db_path = str(tmp_path / 'search.db')
+        conn = sqlite3.connect(db_path)
+        conn.execute('CREATE TABLE documents (id INTEGER PRIMARY KEY, document_id TEXT)')
+        conn.execute('CREATE VIRTUAL TABLE documents_fts USING fts5(title, text, entities, classification)')
+        conn.commit()
+        conn.close()
+        
+        index = SearchIndex(db_path)
+        assert index.count() == 0
+        assert index.index_result(self.make_result('a', 'Договор', inn=['7707083893']))
+        assert index.search(entities={'inn': '7707083893'})['total'] == 1
+
+
+class TestEntityIndex:
+    def test_normalized_lookup_and_reindex(self):
+        from services.entity_index import EntityIndex
+        
+        def make_result(document_id, **entities):
+            return {'metadata': {'document_id': document_id}, 'analysis': {'entities': entities}}
+        
+        index = EntityIndex(':memory:', batch_size=3)
+        index.index_results([
+            make_result('a', inn=['7707083893'], emails=['Sales@Romashka.ru'], phones=[{'formatted': '8 (495) 123-45-67'}]),
+            make_result('b', inn=['7707083893', '12345'], fio=['Иванов  Пётр Сергеевич']),
+            make_result('c', emails=['sales@romashka.ru']),
+        ])
+        
+        assert index.lookup('inn', '77-0708-3893')['document_ids'] == ['a', 'b']
+        assert index.lookup('email', 'SALES@romashka.ru')['total'] == 2
+        assert index.lookup('phone', '+7 495 1234567')['document_ids'] == ['a']
+        assert index.lookup('fio', 'иванов петр сергеевич')['document_ids'] == ['b']
+        assert index.lookup('inn', '7707083893', limit=1, offset=1)['document_ids'] == ['b']
+        
+        # Повторная индексация документа заменяет его вхождения
+        index.index_result(make_result('a', inn=['500100732259']))
+        assert index.lookup('inn', '7707083893')['document_ids'] == ['b']
+        assert index.entities_of('a') == {'inn': ['500100732259']}
+        
+        with pytest.raises(ValueError):
+            index.lookup('inn', '123')
+
+
+class TestResultStream:
+    def make_result(self):
+        return {
+            'metadata': {'document_id': 'a', 'filename': 'a.csv'},
+            'content': {
+                'text': 'x' * 150000,
+                'structure': [{'page': 1, 'elements': []}, {'page': 2, 'elements': []}],
+                'tables': [{'headers': ['a'], 'rows': [[str(i)] for i in range(2500)], 'row_count': 2500}],
+            },
+            'analysis': {'entities': {'inn': ['7707083893'], 'emails': []}, 'classification': {'document_type': 'invoice'}},
+        }
+    
+    def test_select_fields(self):
+        from utils.result_stream import parse_fields, select_fields
+        
+        selected = select_fields(self.make_result(), parse_fields('tables,analysis.entities.inn'))
+        assert set(selected) == {'metadata', 'content', 'analysis'}
+        assert set(selected['content']) == {'tables'}
+        assert selected['analysis'] == {'entities': {'inn': ['7707083893']}}
+        assert select_fields(self.make_result(), parse_fields(None)) == self.make_result()
+    
+    def test_ndjson_records(self):
+        import json
+        from utils.result_stream import parse_fields, iter_result_records
+        
+        records = [
+            json.loads(line)
+            for line in iter_result_records(self.make_result(), iter(['content', 'entities', 'classification']))
+        ]
+        types = [record['type'] for record in records]
+        
+        assert types[0] == 'metadata' and types[-1] == 'end'
+        assert ''.join(r['data'] for r in records if r['type'] == 'text') == 'x' * 150000
+        assert [r['page'] for r in records if r['type'] == 'structure'] == [1, 2]
+        assert [len(r['data']) for r in records if r['type'] == 'table_rows'] == [1000, 1000, 500]
+        assert [r['name'] for r in records if r['type'] == 'analysis'] == ['entities', 'classification']
+        
+        records = [
+            json.loads(line)
+            for line in iter_result_records(self.make_result(), iter(['content', 'entities']), parse_fields('analysis'))
+        ]
+        assert [record['type'] for record in records] == ['metadata', 'analysis', 'end']
 
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
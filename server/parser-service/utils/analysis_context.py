@@ -0,0 +1,186 @@
+"""
+Analysis context.
+Общий контекст анализа документа: нормализованный текст, токены и предложения
+вычисляются один раз (лениво) и переиспользуются всеми анализаторами.
+"""
+
+import logging
+import re
+import unicodedata
+from functools import cached_property
+from typing import Dict, Any, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Токен - последовательность букв (как раньше в regex-токенизации)
+WORD_PATTERN = re.compile(r'[а-яёА-ЯЁa-zA-Z]+')
+
+# Fallback-разбиение на предложения: всё до . ! ?
+SENTENCE_PATTERN = re.compile(r'[^.!?]+')
+
+# Непустые строки (абзацы) - сегменты для посегментного определения языка
+LINE_PATTERN = re.compile(r'[^\n]+')
+
+# Модели Punkt по языкам; для прочих языков используется русская
+PUNKT_MODELS = {
+    'ru': 'russian',
+    'en': 'english',
+}
+DEFAULT_PUNKT_LANGUAGE = 'ru'
+
+_punkt_tokenizers: Dict[str, Any] = {}
+
+
+def _get_punkt(language: Optional[str] = None):
+    """Загрузка Punkt-токенизатора NLTK один раз на процесс (None если недоступен)."""
+    model = PUNKT_MODELS.get(language, PUNKT_MODELS[DEFAULT_PUNKT_LANGUAGE])
+    
+    if model not in _punkt_tokenizers:
+        try:
+            import nltk
+            _punkt_tokenizers[model] = nltk.data.load(f'tokenizers/punkt/{model}.pickle')
+        except Exception:
+            logger.info(f"NLTK punkt model '{model}' not available, using regex sentence splitting")
+            _punkt_tokenizers[model] = None
+    
+    return _punkt_tokenizers[model]
+
+
+class AnalysisContext:
+    """
+    Контекст анализа одного документа.
+    
+    Все производные представления текста - ленивые и кешируются:
+    токенизация и разбиение на предложения выполняются не более одного раза
+    независимо от того, сколько анализаторов ими пользуются.
+    """
+    
+    def __init__(
+        self,
+        text: str,
+        language: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+    ):
+        """
+        Args:
+            text: Исходный текст документа
+            language: Язык документа (если уже известен)
+            metadata: Метаданные документа
+        """
+        self.raw = text or ''
+        self.language = language
+        self.metadata = metadata or {}
+        # Диапазоны языков [{'start', 'end', 'language'}] (см. set_language_segments)
+        self.language_segments: List[Dict[str, Any]] = []
+    
+    @classmethod
+    def ensure(cls, text: Union[str, 'AnalysisContext', None], **kwargs) -> Optional['AnalysisContext']:
+        """
+        Приведение аргумента анализатора к контексту.
+        
+        Args:
+            text: Строка или готовый контекст
+        
+        Returns:
+            Контекст или None, если анализировать нечего
+        """
+        if isinstance(text, cls):
+            return text if text.text else None
+        
+        if not text or not isinstance(text, str):
+            return None
+        
+        return cls(text, **kwargs)
+    
+    @cached_property
+    def text(self) -> str:
+        """Нормализованный текст (NFC, без крайних пробелов)."""
+        return unicodedata.normalize('NFC', self.raw).strip()
+    
+    @cached_property
+    def lower(self) -> str:
+        """Текст в нижнем регистре."""
+        return self.text.lower()
+    
+    @cached_property
+    def token_spans(self) -> List[Tuple[int, int]]:
+        """Смещения токенов в нормализованном тексте."""
+        return [match.span() for match in WORD_PATTERN.finditer(self.text)]
+    
+    @cached_property
+    def tokens(self) -> List[str]:
+        """Токены (слова) в исходном регистре."""
+        text = self.text
+        return [text[start:end] for start, end in self.token_spans]
+    
+    @cached_property
+    def lower_tokens(self) -> List[str]:
+        """Токены в нижнем регистре."""
+        return [token.lower() for token in self.tokens]
+    
+    @cached_property
+    def line_spans(self) -> List[Tuple[int, int]]:
+        """Смещения непустых строк (абзацев) в нормализованном тексте."""
+        text = self.text
+        return [match.span() for match in LINE_PATTERN.finditer(text) if match.group(0).strip()]
+    
+    def set_language_segments(self, segments: List[Dict[str, Any]]) -> None:
+        """
+        Установка диапазонов языков документа.
+        
+        Разбиение на предложения после этого выполняется моделью Punkt
+        соответствующего языка для каждого диапазона.
+        
+        Args:
+            segments: Диапазоны [{'start', 'end', 'language'}] в нормализованном тексте
+        """
+        self.language_segments = list(segments)
+        
+        # Предложения могли быть уже разбиты моделью по умолчанию
+        self.__dict__.pop('sentence_spans', None)
+        self.__dict__.pop('sentences', None)
+    
+    @cached_property
+    def sentence_spans(self) -> List[Tuple[int, int]]:
+        """Смещения предложений в нормализованном тексте."""
+        text = self.text
+        
+        if not self.language_segments:
+            return self._split_sentences(0, len(text), self.language)
+        
+        spans = []
+        for segment in self.language_segments:
+            spans.extend(self._split_sentences(segment['start'], segment['end'], segment.get('language')))
+        
+        return spans
+    
+    def _split_sentences(self, start: int, end: int, language: Optional[str]) -> List[Tuple[int, int]]:
+        """Разбиение фрагмента text[start:end] на предложения (абсолютные смещения)."""
+        chunk_text = self.text[start:end]
+        punkt = _get_punkt(language)
+        
+        if punkt is not None:
+            try:
+                return [
+                    (start + s, start + e) for s, e in punkt.span_tokenize(chunk_text)
+                    if chunk_text[s:e].strip()
+                ]
+            except Exception as e:
+                logger.debug(f"Punkt sentence splitting failed: {e}")
+        
+        spans = []
+        for match in SENTENCE_PATTERN.finditer(chunk_text):
+            s, _ = match.span()
+            chunk = match.group(0)
+            stripped = chunk.strip()
+            if stripped:
+                s += len(chunk) - len(chunk.lstrip())
+                spans.append((start + s, start + s + len(stripped)))
+        
+        return spans
+    
+    @cached_property
+    def sentences(self) -> List[str]:
+        """Предложения документа."""
+        text = self.text
+        return [text[start:end] for start, end in self.sentence_spans]
@@ -0,0 +1,287 @@
+"""
+Corpus-level IDF model.
+Инкрементальная статистика документных частот (DF) по всем разобранным документам.
+"""
+
+import fcntl
+import logging
+import os
+import re
+import threading
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple, Iterable, Union
+
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+
+logger = logging.getLogger(__name__)
+
+# Минимум 3 буквы, как и раньше в TfidfVectorizer/CountVectorizer
+TOKEN_PATTERN = r'[а-яёА-ЯЁa-zA-Z]{3,}'
+TOKEN_RE = re.compile(TOKEN_PATTERN)
+
+
+class TermAnalyzer:
+    """
+    Анализатор для HashingVectorizer.
+    
+    Принимает как строку, так и уже готовый список токенов в нижнем регистре
+    (AnalysisContext.lower_tokens), чтобы не токенизировать документ повторно.
+    """
+    
+    def __init__(self, stopwords: Iterable[str]):
+        self.stopwords = frozenset(stopwords)
+    
+    def __call__(self, doc: Union[str, List[str]]) -> List[str]:
+        if isinstance(doc, str):
+            return [t for t in TOKEN_RE.findall(doc.lower()) if t not in self.stopwords]
+        
+        return [t for t in doc if len(t) >= 3 and t not in self.stopwords]
+
+
+def term_buckets(vectorizer: HashingVectorizer, terms: List[str]) -> np.ndarray:
+    """Индексы признаков (хеш-корзины) для списка уже токенизированных термов."""
+    if not terms:
+        return np.zeros(0, dtype=np.int64)
+    
+    matrix = vectorizer.transform(terms)
+    
+    # Каждый терм уже прошел анализатор, поэтому в строке ровно один признак
+    if matrix.nnz == len(terms):
+        return matrix.indices.astype(np.int64)
+    
+    return np.asarray(matrix.argmax(axis=1)).ravel()
+
+
+class CorpusIDF:
+    """
+    IDF-модель корпуса на основе HashingVectorizer.
+    
+    Словарь не хранится: термы хешируются в фиксированное пространство признаков,
+    а документные частоты накапливаются в плотном массиве и периодически
+    сохраняются на диск. Модель загружается один раз при старте.
+    
+    Модель обновляют несколько процессов (API и воркеры Celery), поэтому при
+    сохранении к модели на диске прибавляются только частоты, накопленные
+    процессом с прошлого сохранения (под файловой блокировкой), и процесс
+    получает учтенные другими документы.
+    """
+    
+    def __init__(
+        self,
+        stopwords: Iterable[str],
+        model_path: Optional[str] = None,
+        n_features: int = 2 ** 18,
+        save_every: int = 50,
+    ):
+        """
+        Инициализация модели.
+        
+        Args:
+            stopwords: Стоп-слова (нижний регистр)
+            model_path: Путь к файлу модели (.npz); None - только в памяти
+            n_features: Размер хеш-пространства
+            save_every: Сохранять модель каждые N новых документов
+        """
+        self.model_path = model_path
+        self.n_features = n_features
+        self.save_every = save_every
+        
+        self.vectorizer = HashingVectorizer(
+            n_features=n_features,
+            alternate_sign=False,
+            norm=None,
+            analyzer=TermAnalyzer(stopwords),
+        )
+        self.analyzer = self.vectorizer.analyzer
+        
+        self.df = np.zeros(n_features, dtype=np.int32)
+        self.n_docs = 0
+        
+        self._lock = threading.Lock()
+        self._unsaved = 0
+        # Частоты и документы, еще не прибавленные к модели на диске
+        self._delta = np.zeros(n_features, dtype=np.int32)
+        self._delta_docs = 0
+        
+        self.load()
+    
+    def term_counts(self, text: Union[str, List[str]]) -> Tuple[List[str], np.ndarray]:
+        """
+        Токенизация и подсчет частот термов документа.
+        
+        Args:
+            text: Текст или список токенов в нижнем регистре
+        
+        Returns:
+            (список уникальных термов, массив их частот)
+        """
+        counts = Counter(self.analyzer(text))
+        terms = list(counts.keys())
+        tf = np.fromiter(counts.values(), dtype=np.float64, count=len(terms))
+        return terms, tf
+    
+    def buckets(self, terms: List[str]) -> np.ndarray:
+        """Индексы признаков (хеш-корзины) для списка термов."""
+        return term_buckets(self.vectorizer, terms)
+    
+    def idf(self, buckets: np.ndarray) -> np.ndarray:
+        """Сглаженный IDF (как в sklearn): log((1 + n) / (1 + df)) + 1."""
+        n_docs = self.n_docs
+        return np.log((1.0 + n_docs) / (1.0 + self.df[buckets])) + 1.0
+    
+    def partial_fit(self, text: Union[str, List[str]]) -> bool:
+        """
+        Добавление документа в статистику корпуса.
+        
+        Модель на диск здесь не сохраняется: вызывающий код передает
+        save_if_due в фоновый поток, чтобы запись не шла в потоке запроса.
+        
+        Args:
+            text: Текст документа или список токенов в нижнем регистре
+        
+        Returns:
+            True если накопилось save_every несохраненных документов
+        """
+        if not text:
+            return False
+        
+        terms, _ = self.term_counts(text)
+        if not terms:
+            return False
+        
+        doc_buckets = np.unique(self.buckets(terms))
+        
+        with self._lock:
+            self.df[doc_buckets] += 1
+            self.n_docs += 1
+            self._delta[doc_buckets] += 1
+            self._delta_docs += 1
+            self._unsaved += 1
+            return self._save_due()
+    
+    def save_if_due(self) -> bool:
+        """Сохранение модели, если накопилось save_every несохраненных документов."""
+        with self._lock:
+            due = self._save_due()
+        
+        return self.save() if due else False
+    
+    def _save_due(self) -> bool:
+        return bool(self.save_every) and self._unsaved >= self.save_every
+    
+    def keywords(self, text: Union[str, List[str]], top_n: int = 20) -> List[Dict[str, Any]]:
+        """
+        Ключевые слова документа по TF-IDF относительно корпуса.
+        
+        Args:
+            text: Текст документа или список токенов в нижнем регистре
+            top_n: Количество ключевых слов
+        
+        Returns:
+            Список ключевых слов с весами (L2-нормированными)
+        """
+        terms, tf = self.term_counts(text)
+        if not terms:
+            return []
+        
+        scores = tf * self.idf(self.buckets(terms))
+        
+        norm = np.linalg.norm(scores)
+        if norm > 0:
+            scores = scores / norm
+        
+        if len(scores) > top_n:
+            top_idx = np.argpartition(-scores, top_n)[:top_n]
+        else:
+            top_idx = np.arange(len(scores))
+        top_idx = top_idx[np.argsort(-scores[top_idx], kind='stable')]
+        
+        return [
+            {
+                'word': terms[i],
+                'score': float(scores[i]),
+                'count': int(tf[i]),
+                'rank': rank,
+            }
+            for rank, i in enumerate(top_idx, start=1)
+            if scores[i] > 0
+        ]
+    
+    def save(self) -> bool:
+        """
+        Атомарное сохранение модели на диск: частоты, накопленные с прошлого
+        сохранения, прибавляются к модели на диске (ее могли обновить другие процессы).
+        """
+        if not self.model_path:
+            return False
+        
+        with self._lock:
+            df = self.df.copy()
+            n_docs = self.n_docs
+            delta, delta_docs = self._delta, self._delta_docs
+            self._delta = np.zeros(self.n_features, dtype=np.int32)
+            self._delta_docs = 0
+            self._unsaved = 0
+        
+        try:
+            os.makedirs(os.path.dirname(self.model_path) or '.', exist_ok=True)
+            tmp_path = f"{self.model_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            
+            with open(f"{self.model_path}.lock", 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                
+                stored = self._read()
+                if stored is not None:
+                    df, n_docs = stored[0] + delta, stored[1] + delta_docs
+                
+                with open(tmp_path, 'wb') as f:
+                    np.savez(f, df=df, n_docs=np.int64(n_docs))
+                os.replace(tmp_path, self.model_path)
+        
+        except Exception as e:
+            logger.error(f"Failed to save corpus IDF model: {e}")
+            with self._lock:
+                self._delta += delta
+                self._delta_docs += delta_docs
+            return False
+        
+        # Документы, учтенные во время сохранения, остаются в новой разнице
+        with self._lock:
+            self.df = df + self._delta
+            self.n_docs = n_docs + self._delta_docs
+        
+        return True
+    
+    def load(self) -> bool:
+        """Загрузка модели с диска (если есть)."""
+        stored = self._read()
+        if stored is None:
+            return False
+        
+        with self._lock:
+            self.df, self.n_docs = stored
+        
+        logger.info(f"Loaded corpus IDF model: {self.n_docs} documents")
+        return True
+    
+    def _read(self) -> Optional[Tuple[np.ndarray, int]]:
+        """Документные частоты и число документов модели на диске или None."""
+        if not self.model_path or not os.path.exists(self.model_path):
+            return None
+        
+        try:
+            with np.load(self.model_path) as data:
+                df = data['df']
+                n_docs = int(data['n_docs'])
+        except Exception as e:
+            logger.error(f"Failed to load corpus IDF model: {e}")
+            return None
+        
+        if df.shape != (self.n_features,):
+            logger.warning(
+                f"Corpus IDF model has {df.shape[0]} features, expected {self.n_features}; ignoring"
+            )
+            return None
+        
+        return df.astype(np.int32), n_docs
@@ -5,7 +5,8 @@ Data Cleaning utilities.
 
 import re
 import logging
-from typing import List, Optional
+from collections import Counter
+from typing import Dict, Any, List, Optional, Iterable, Iterator, Sequence, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +18,23 @@ except ImportError:
     FTFY_AVAILABLE = False
 
 
+# Признаки "кракозябр": UTF-8, прочитанный как cp1251 или latin-1.
+# Дешевая проверка перед ftfy, который на чистом тексте работает впустую.
+# Один класс первого символа: без альтернатив проверка всей таблицы - один быстрый проход.
+MOJIBAKE_RE = re.compile(
+    r'[РСÃÂÐÑâ][\u0080-\u00BF\u0402-\u040F\u0452-\u045F\u0490\u0491\u2018-\u203A\u20AC]'
+)
+
+MULTI_SPACE_RE = re.compile(r' {2,}')
+
+# Нормализация строк колонтитулов: номера страниц, даты и т.п. -> '#'
+DIGITS_RE = re.compile(r'\d+')
+
+# Перенос слова: строка кончается на "буква-", следующая начинается с буквы
+HYPHEN_BREAK_RE = re.compile(r'[а-яёa-z]-$', re.IGNORECASE)
+WORD_START_RE = re.compile(r'[а-яёa-z]', re.IGNORECASE)
+
+
 class DataCleaner:
     """Очистка и нормализация текстовых данных."""
     
@@ -32,20 +50,34 @@ class DataCleaner:
         r'Page\s+\d+\s+of\s+\d+',
         r'Конфиденциально',
         r'Confidential',
-        r'\d{1,2}[./-]\d{1,2}[./-]\d{2,4}',  # Даты в колонтитулах
     ]
     
-    def __init__(self):
-        """Инициализация очистителя."""
+    def __init__(self, edge_lines: int = 3, min_page_ratio: float = 0.5, min_pages: int = 3):
+        """
+        Инициализация очистителя.
+        
+        Args:
+            edge_lines: Сколько первых и последних строк страницы проверять на колонтитулы
+            min_page_ratio: Строка - колонтитул, если повторяется более чем на этой доле страниц
+            min_pages: Минимум страниц для статистического поиска колонтитулов
+        """
+        self.edge_lines = edge_lines
+        self.min_page_ratio = min_page_ratio
+        self.min_pages = min_pages
+        
+        # Каждая группа паттернов - одно регулярное выражение (один проход по тексту)
         self.compiled_patterns = {
-            'remove': [re.compile(p) for p in self.PATTERNS_TO_REMOVE],
-            'headers': [re.compile(p, re.IGNORECASE) for p in self.HEADER_FOOTER_PATTERNS],
+            'remove': re.compile('|'.join(self.PATTERNS_TO_REMOVE)),
+            'headers': re.compile('|'.join(self.HEADER_FOOTER_PATTERNS), re.IGNORECASE),
         }
     
     def clean_text(self, text: str, aggressive: bool = False) -> str:
         """
         Очистка текста от артефактов и мусора.
         
+        Текст обрабатывается за один проход по строкам: нормализация пробелов,
+        склейка переносов и разорванных строк, удаление колонтитулов и пустых строк.
+        
         Args:
             text: Исходный текст
             aggressive: Агрессивная очистка (удаление большего количества элементов)
@@ -57,91 +89,226 @@ class DataCleaner:
             return ""
         
         try:
-            cleaned = text
-            
-            # 1. Исправление кодировки (если доступен ftfy)
-            if FTFY_AVAILABLE:
-                cleaned = ftfy.fix_text(cleaned)
+            # 1. Исправление кодировки (только если есть признаки кракозябр)
+            cleaned = self._fix_encoding(text)
             
             # 2. Удаление control characters
-            for pattern in self.compiled_patterns['remove']:
-                cleaned = pattern.sub('', cleaned)
-            
-            # 3. Нормализация пробелов
-            cleaned = self._normalize_whitespace(cleaned)
-            
-            # 4. Объединение разорванных строк
-            cleaned = self._merge_broken_lines(cleaned)
+            cleaned = self.compiled_patterns['remove'].sub('', cleaned)
             
-            # 5. Удаление колонтитулов (если агрессивная очистка)
-            if aggressive:
-                cleaned = self._remove_headers_footers(cleaned)
-            
-            # 6. Удаление пустых строк
-            cleaned = self._remove_empty_lines(cleaned)
-            
-            return cleaned.strip()
+            # 3-6. Построчная очистка
+            return '\n'.join(self._clean_lines(cleaned.split('\n'), aggressive))
             
         except Exception as e:
             logger.error(f"Text cleaning error: {e}")
             return text
     
-    def _normalize_whitespace(self, text: str) -> str:
-        """Нормализация пробелов."""
-        # Замена множественных пробелов на один
-        text = re.sub(r' +', ' ', text)
+    def _fix_encoding(self, text: str) -> str:
+        """Исправление кодировки через ftfy, если сработала эвристика."""
+        if FTFY_AVAILABLE and MOJIBAKE_RE.search(text):
+            return ftfy.fix_text(text)
         
-        # Замена множественных переносов строк
-        text = re.sub(r'\n\n+', '\n\n', text)
+        return text
+    
+    def _clean_lines(self, lines: Iterable[str], aggressive: bool) -> Iterator[str]:
+        """Конвейер построчной очистки (генераторы, без промежуточных строк)."""
+        merged = self._merge_broken_lines(self._join_hyphenated(self._normalize_whitespace(lines)))
         
-        # Удаление пробелов в начале и конце строк
-        lines = [line.strip() for line in text.split('\n')]
+        if aggressive:
+            merged = self._remove_headers_footers(merged)
         
-        return '\n'.join(lines)
+        return merged
     
-    def _merge_broken_lines(self, text: str) -> str:
+    def _normalize_whitespace(self, lines: Iterable[str]) -> Iterator[str]:
+        """Нормализация пробелов: схлопывание повторов и обрезка краев строк."""
+        for line in lines:
+            if '  ' in line:
+                line = MULTI_SPACE_RE.sub(' ', line)
+            yield line.strip()
+    
+    def _join_hyphenated(self, lines: Iterable[str]) -> Iterator[Tuple[str, bool]]:
         """
-        Объединение разорванных строк (когда слово разбито переносом).
+        Склейка слов, разбитых переносом.
         Например: "програм-\nмирование" -> "программирование"
-        """
-        # Паттерн для переноса слов
-        text = re.sub(r'([а-яёa-z])-\s*\n\s*([а-яёa-z])', r'\1\2', text, flags=re.IGNORECASE)
         
-        # Объединение строк, которые явно не завершены (нет точки в конце)
-        lines = text.split('\n')
-        merged_lines = []
-        i = 0
+        Пустые строки отбрасываются; для каждой строки возвращается флаг,
+        была ли перед ней пустая строка (разрыв абзаца).
+        """
+        buffer = None
+        buffer_after_blank = False
+        blank = False
         
-        while i < len(lines):
-            line = lines[i].strip()
+        for line in lines:
+            if not line:
+                blank = True
+                continue
             
-            # Если строка не пустая и не заканчивается на знак препинания
-            if line and i < len(lines) - 1:
-                next_line = lines[i + 1].strip()
-                
-                # Если следующая строка начинается с маленькой буквы - вероятно продолжение
-                if next_line and next_line[0].islower():
-                    merged_lines.append(line + ' ' + next_line)
-                    i += 2
-                    continue
+            if buffer is not None and HYPHEN_BREAK_RE.search(buffer) and WORD_START_RE.match(line):
+                buffer = buffer[:-1] + line
+            else:
+                if buffer is not None:
+                    yield buffer, buffer_after_blank
+                buffer, buffer_after_blank = line, blank
             
-            if line:
-                merged_lines.append(line)
-            i += 1
+            blank = False
+        
+        if buffer is not None:
+            yield buffer, buffer_after_blank
+    
+    def _merge_broken_lines(self, lines: Iterable[Tuple[str, bool]]) -> Iterator[str]:
+        """
+        Объединение разорванных строк: если следующая строка абзаца начинается
+        с маленькой буквы - вероятно, это продолжение (склеиваются пары строк).
+        """
+        previous = None
         
-        return '\n'.join(merged_lines)
+        for line, after_blank in lines:
+            if previous is not None and not after_blank and line[0].islower():
+                yield previous + ' ' + line
+                previous = None
+                continue
+            
+            if previous is not None:
+                yield previous
+            previous = line
+        
+        if previous is not None:
+            yield previous
     
-    def _remove_headers_footers(self, text: str) -> str:
+    def _remove_headers_footers(self, lines: Iterable[str]) -> Iterator[str]:
         """Удаление колонтитулов."""
-        for pattern in self.compiled_patterns['headers']:
-            text = pattern.sub('', text)
+        headers = self.compiled_patterns['headers']
         
-        return text
+        for line in lines:
+            line = headers.sub('', line).strip()
+            if line:
+                yield line
     
-    def _remove_empty_lines(self, text: str) -> str:
-        """Удаление пустых строк."""
-        lines = [line for line in text.split('\n') if line.strip()]
-        return '\n'.join(lines)
+    @staticmethod
+    def page_lines(structure: List[Dict[str, Any]]) -> List[List[str]]:
+        """
+        Строки текста по страницам из структуры документа (PDFParser).
+        
+        Args:
+            structure: content.structure с элементами страниц
+            
+        Returns:
+            Список страниц, каждая - список строк; пустой, если страниц нет
+        """
+        return [
+            [element.get('text', '') for element in page.get('elements', [])]
+            for page in structure
+            if isinstance(page, dict) and 'page' in page
+        ]
+    
+    def remove_page_headers_footers(self, pages: List[List[str]]) -> Tuple[List[List[str]], List[str]]:
+        """
+        Статистическое удаление колонтитулов.
+        
+        Первые и последние edge_lines строк каждой страницы нормализуются
+        (регистр, пробелы, цифры -> '#') и подсчитываются по страницам отдельно
+        для верхней и нижней зоны. Строки зоны, повторяющиеся более чем на
+        min_page_ratio страниц, удаляются. Время линейно по числу строк.
+        
+        Args:
+            pages: Строки текста по страницам
+            
+        Returns:
+            (страницы без колонтитулов, нормализованные удаленные колонтитулы)
+        """
+        if len(pages) < self.min_pages:
+            return pages, []
+        
+        page_zones = [self._edge_zones(lines) for lines in pages]
+        
+        # Количество страниц, на которых встречается (зона, строка)
+        counts: Counter = Counter()
+        for zones in page_zones:
+            counts.update(set(zones.values()))
+        
+        threshold = self.min_page_ratio * len(pages)
+        repeated = {key for key, count in counts.items() if count > threshold}
+        
+        if not repeated:
+            return pages, []
+        
+        cleaned_pages = [
+            [line for idx, line in enumerate(lines) if zones.get(idx) not in repeated]
+            for lines, zones in zip(pages, page_zones)
+        ]
+        
+        removed = sorted({key for _, key in repeated})
+        logger.info(f"Removed {len(removed)} repeated header/footer lines across {len(pages)} pages")
+        
+        return cleaned_pages, removed
+    
+    def _edge_zones(self, lines: List[str]) -> Dict[int, Tuple[str, str]]:
+        """Нормализованные строки верхней и нижней зон страницы по индексам строк."""
+        zones = {}
+        non_empty = [idx for idx, line in enumerate(lines) if line.strip()]
+        
+        # Зоны не больше трети страницы: на коротких страницах текст не считается колонтитулом
+        size = min(self.edge_lines, len(non_empty) // 3)
+        if size == 0:
+            return zones
+        
+        for idx in non_empty[:size]:
+            zones[idx] = ('header', self._normalize_header_line(lines[idx]))
+        for idx in non_empty[-size:]:
+            zones[idx] = ('footer', self._normalize_header_line(lines[idx]))
+        
+        return zones
+    
+    @staticmethod
+    def _normalize_header_line(line: str) -> str:
+        """Ключ строки колонтитула: номера страниц и даты не различаются."""
+        return DIGITS_RE.sub('#', ' '.join(line.lower().split()))
+    
+    def clean_cells(self, cells: Sequence[Any]) -> List[str]:
+        """
+        Пакетная очистка ячеек таблицы.
+        
+        Наличие кракозябр и управляющих символов проверяется одним проходом
+        по всем ячейкам сразу. Уже чистые однострочные ячейки возвращаются
+        как есть; остальные очищаются полным конвейером, повторяющиеся
+        значения - один раз.
+        
+        Args:
+            cells: Значения ячеек (строки, числа, None)
+            
+        Returns:
+            Очищенные значения (строки) в том же порядке
+        """
+        strings = [cell for cell in cells if isinstance(cell, str)]
+        joined = '\n'.join(strings)
+        
+        needs_full_clean = (
+            (FTFY_AVAILABLE and MOJIBAKE_RE.search(joined) is not None)
+            or self.compiled_patterns['remove'].search(joined) is not None
+        )
+        
+        cleaned_cells = []
+        cache: Dict[str, str] = {}
+        
+        for cell in cells:
+            if cell is None:
+                cleaned_cells.append('')
+            elif not isinstance(cell, str):
+                cleaned_cells.append(str(cell))
+            elif not needs_full_clean and self._is_clean_cell(cell):
+                cleaned_cells.append(cell)
+            else:
+                cleaned = cache.get(cell)
+                if cleaned is None:
+                    cleaned = self.clean_text(cell, aggressive=False)
+                    cache[cell] = cleaned
+                cleaned_cells.append(cleaned)
+        
+        return cleaned_cells
+    
+    @staticmethod
+    def _is_clean_cell(cell: str) -> bool:
+        """Однострочная ячейка без лишних пробелов (очистка ничего не изменит)."""
+        return '\n' not in cell and '  ' not in cell and cell.strip() == cell
     
     def clean_table_data(self, table_data: List[List[str]]) -> List[List[str]]:
         """
@@ -157,19 +324,15 @@ class DataCleaner:
             return []
         
         try:
+            # Все ячейки очищаются одним пакетом, затем разбиваются обратно по строкам
+            cleaned_cells = self.clean_cells([cell for row in table_data for cell in row])
+            
             cleaned_table = []
+            offset = 0
             
             for row in table_data:
-                cleaned_row = []
-                for cell in row:
-                    if cell is None:
-                        cleaned_row.append('')
-                    elif isinstance(cell, str):
-                        # Очистка каждой ячейки
-                        cleaned_cell = self.clean_text(cell, aggressive=False)
-                        cleaned_row.append(cleaned_cell)
-                    else:
-                        cleaned_row.append(str(cell))
+                cleaned_row = cleaned_cells[offset:offset + len(row)]
+                offset += len(row)
                 
                 # Добавляем строку только если не пустая
                 if any(cell.strip() for cell in cleaned_row):
@@ -5,9 +5,11 @@ Document Classification utilities.
 
 import re
 import logging
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Tuple, Union
 from collections import Counter
 
+from .analysis_context import AnalysisContext
+
 logger = logging.getLogger(__name__)
 
 
@@ -124,22 +126,26 @@ class DocumentClassifier:
         """Инициализация классификатора."""
         self.min_confidence = 0.1  # Минимальная уверенность для классификации
     
-    def classify(self, text: str, metadata: Dict[str, Any] = None) -> Dict[str, Any]:
+    def classify(self, text: Union[str, AnalysisContext], metadata: Dict[str, Any] = None) -> Dict[str, Any]:
         """
         Классифицирует тип документа.
         
         Args:
-            text: Текст документа
-            metadata: Метаданные документа (опционально)
+            text: Текст документа или контекст анализа
+            metadata: Метаданные документа (опционально, по умолчанию - из контекста)
             
         Returns:
             Dict с результатами классификации
         """
-        if not text or not isinstance(text, str):
+        ctx = AnalysisContext.ensure(text)
+        if ctx is None:
             return self._empty_result()
         
+        if metadata is None:
+            metadata = ctx.metadata
+        
         try:
-            text_lower = text.lower()
+            text_lower = ctx.lower
             
             # Подсчет совпадений для каждого типа
             scores = {}
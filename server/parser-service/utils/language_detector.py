@@ -3,13 +3,30 @@ Language Detection utilities.
 Определение языка документа и кодировки.
 """
 
+import copy
+import hashlib
 import logging
-from typing import Dict, Any, Optional
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Union, List
 import chardet
-from langdetect import detect, detect_langs, LangDetectException
+from langdetect import detect_langs, DetectorFactory, LangDetectException
+
+from .analysis_context import AnalysisContext
 
 logger = logging.getLogger(__name__)
 
+# Фиксированный seed: langdetect недетерминирован без него
+DetectorFactory.seed = 0
+
+# Классы символов для быстрого определения письменности
+CYRILLIC_RE = re.compile(r'[\u0400-\u04FF]')
+LATIN_RE = re.compile(r'[a-zA-Z]')
+LATIN_EXTENDED_RE = re.compile(r'[\u00C0-\u024F]')
+# Буквы украинского/белорусского алфавитов (при них кириллица не означает "ru")
+UK_BE_RE = re.compile(r'[іїєґўІЇЄҐЎ]')
+
 
 class LanguageDetector:
     """Определение языка и кодировки текста."""
@@ -35,25 +52,97 @@ class LanguageDetector:
         'tr': 'Turkish',
     }
     
-    def __init__(self):
-        """Инициализация детектора."""
+    # Язык по однозначной письменности (корпус - русские и английские документы)
+    SCRIPT_LANGUAGES = {
+        'cyrillic': 'ru',
+        'latin': 'en',
+    }
+    
+    def __init__(
+        self,
+        sample_size: int = 2048,
+        sample_count: int = 3,
+        cache_size: int = 1024,
+        script_threshold: float = 0.9,
+    ):
+        """
+        Инициализация детектора.
+        
+        Args:
+            sample_size: Размер одного окна выборки (символов)
+            sample_count: Количество окон (начало, середина, конец и т.д.)
+            cache_size: Размер LRU-кеша результатов
+            script_threshold: Доля букв одной письменности, при которой
+                n-граммная модель для сегмента не запускается
+        """
         self.min_text_length = 20  # Минимальная длина для надежного определения
+        self.sample_size = sample_size
+        self.sample_count = sample_count
+        self.cache_size = cache_size
+        self.script_threshold = script_threshold
+        
+        self._cache: OrderedDict = OrderedDict()
+        self._cache_lock = threading.Lock()
     
-    def detect_language(self, text: str) -> Dict[str, Any]:
+    def _sample(self, text: str) -> str:
+        """
+        Ограниченная выборка текста для детектора.
+        
+        Короткий текст возвращается целиком; для длинного берутся окна,
+        равномерно распределенные по документу (стратифицированная выборка),
+        с выравниванием по границам слов.
+        """
+        if len(text) <= self.sample_size * self.sample_count:
+            return text
+        
+        last_start = len(text) - self.sample_size
+        windows = []
+        
+        for i in range(self.sample_count):
+            start = last_start * i // max(self.sample_count - 1, 1)
+            end = start + self.sample_size
+            
+            # Не разрезаем слова на границах окна
+            if start > 0:
+                space = text.find(' ', start, end)
+                start = space + 1 if space != -1 else start
+            space = text.rfind(' ', start, end)
+            end = space if space > start else end
+            
+            windows.append(text[start:end])
+        
+        return '\n'.join(windows)
+    
+    def _cache_get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._cache_lock:
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+        return copy.deepcopy(result) if result is not None else None
+    
+    def _cache_put(self, key: str, result: Dict[str, Any]) -> None:
+        with self._cache_lock:
+            self._cache[key] = copy.deepcopy(result)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+    
+    def detect_language(self, text: Union[str, AnalysisContext]) -> Dict[str, Any]:
         """
         Определяет язык текста с вероятностями.
         
         Args:
-            text: Исходный текст
-            
+            text: Исходный текст или контекст анализа
+        
         Returns:
             Dict с информацией о языке
         """
-        if not text or not isinstance(text, str):
+        ctx = AnalysisContext.ensure(text)
+        if ctx is None:
             return self._empty_result()
         
-        # Очистка текста
-        text_clean = text.strip()
+        # Нормализованный текст (без крайних пробелов)
+        text_clean = ctx.text
         
         if len(text_clean) < self.min_text_length:
             logger.warning(f"Text too short for reliable detection: {len(text_clean)} chars")
@@ -67,40 +156,14 @@ class LanguageDetector:
             }
         
         try:
-            # Определение основного языка
-            primary_lang = detect(text_clean)
-            
-            # Получение всех вероятностей
-            lang_probs = detect_langs(text_clean)
-            
-            probabilities = [
-                {
-                    'language': str(lang_prob).split(':')[0],
-                    'language_name': self.LANGUAGE_NAMES.get(
-                        str(lang_prob).split(':')[0], 
-                        'Unknown'
-                    ),
-                    'probability': lang_prob.prob,
-                }
-                for lang_prob in lang_probs
-            ]
-            
-            # Сортировка по вероятности
-            probabilities.sort(key=lambda x: x['probability'], reverse=True)
-            
-            # Определение надежности
-            max_prob = probabilities[0]['probability'] if probabilities else 0.0
-            is_reliable = max_prob > 0.9
-            
-            return {
-                'language': primary_lang,
-                'language_name': self.LANGUAGE_NAMES.get(primary_lang, 'Unknown'),
-                'confidence': max_prob,
-                'probabilities': probabilities,
-                'is_reliable': is_reliable,
-                'text_length': len(text_clean),
-            }
+            # Детектор работает на ограниченной выборке: время не зависит от размера документа
+            sample = self._sample(text_clean)
+            result = self._detect_cached(sample)
             
+            result['text_length'] = len(text_clean)
+            result['sample_length'] = len(sample)
+            return result
+        
         except LangDetectException as e:
             logger.error(f"Language detection failed: {e}")
             return {
@@ -116,13 +179,189 @@ class LanguageDetector:
             logger.error(f"Unexpected error in language detection: {e}")
             return self._empty_result()
     
+    def detect_segments(self, segments: List[str]) -> List[Dict[str, Any]]:
+        """
+        Язык каждого сегмента (абзаца, элемента структуры).
+        
+        Сегменты с однозначной письменностью (почти только кириллица или только
+        латиница) размечаются без n-граммной модели. Остальные группируются
+        в батчи подряд идущих неоднозначных сегментов до sample_size символов,
+        и для батча выполняется один вызов детектора; размеченный по
+        письменности сегмент завершает батч.
+        
+        Args:
+            segments: Тексты сегментов
+        
+        Returns:
+            Список {'language', 'method', 'confidence'} той же длины
+        """
+        results: List[Optional[Dict[str, Any]]] = [self._detect_by_script(seg) for seg in segments]
+        
+        batch: List[int] = []
+        batch_length = 0
+        
+        for idx, result in enumerate(results):
+            if result is not None:
+                # Батч - только смежные сегменты: несмежные могут быть на разных языках
+                if batch:
+                    self._detect_batch(segments, batch, results)
+                    batch, batch_length = [], 0
+                continue
+            
+            batch.append(idx)
+            batch_length += len(segments[idx])
+            
+            if batch_length >= self.sample_size:
+                self._detect_batch(segments, batch, results)
+                batch, batch_length = [], 0
+        
+        if batch:
+            self._detect_batch(segments, batch, results)
+        
+        return results
+    
+    def detect_language_segments(self, text: Union[str, AnalysisContext]) -> Dict[str, Any]:
+        """
+        Посегментное определение языка для смешанных документов.
+        
+        Сегменты - непустые строки текста (абзацы); соседние сегменты одного языка
+        объединяются в диапазоны смещений нормализованного текста.
+        
+        Диапазоны используются для разбиения на предложения (Punkt по языку
+        сегмента) и статистики слов по языкам. NER, классификатор и стоп-слова
+        от языка не зависят: шаблоны и списки стоп-слов общие для ru и en.
+        
+        Args:
+            text: Исходный текст или контекст анализа
+        
+        Returns:
+            Dict с диапазонами языков, распределением по языкам и флагом is_mixed
+        """
+        ctx = AnalysisContext.ensure(text)
+        if ctx is None:
+            return {'segments': [], 'distribution': {}, 'is_mixed': False}
+        
+        spans = ctx.line_spans
+        labels = self.detect_segments([ctx.text[start:end] for start, end in spans])
+        
+        # Сегменты без букв наследуют язык предыдущего сегмента
+        ranges: List[Dict[str, Any]] = []
+        for (start, end), label in zip(spans, labels):
+            language = label['language']
+            if language == 'unknown' and ranges:
+                language = ranges[-1]['language']
+            
+            if ranges and ranges[-1]['language'] == language:
+                ranges[-1]['end'] = end
+                ranges[-1]['segment_count'] += 1
+            else:
+                ranges.append({
+                    'start': start,
+                    'end': end,
+                    'language': language,
+                    'segment_count': 1,
+                })
+        
+        total = sum(r['end'] - r['start'] for r in ranges) or 1
+        distribution: Dict[str, float] = {}
+        for r in ranges:
+            distribution[r['language']] = distribution.get(r['language'], 0.0) + (r['end'] - r['start']) / total
+        
+        known = [lang for lang in distribution if lang != 'unknown']
+        
+        return {
+            'segments': ranges,
+            'distribution': {lang: round(share, 4) for lang, share in distribution.items()},
+            'is_mixed': len(known) > 1,
+            'script_detected': sum(1 for label in labels if label['method'] == 'script'),
+            'ngram_detected': sum(1 for label in labels if label['method'] == 'ngram'),
+        }
+    
+    def _detect_by_script(self, segment: str) -> Optional[Dict[str, Any]]:
+        """Быстрая проверка письменности; None если нужен n-граммный детектор."""
+        cyrillic = len(CYRILLIC_RE.findall(segment))
+        latin = len(LATIN_RE.findall(segment))
+        latin_extended = len(LATIN_EXTENDED_RE.findall(segment))
+        letters = cyrillic + latin + latin_extended
+        
+        if letters < 3:
+            return {'language': 'unknown', 'method': 'none', 'confidence': 0.0}
+        
+        if cyrillic / letters >= self.script_threshold and not UK_BE_RE.search(segment):
+            return {'language': self.SCRIPT_LANGUAGES['cyrillic'], 'method': 'script',
+                    'confidence': cyrillic / letters}
+        
+        if latin / letters >= self.script_threshold and latin_extended == 0:
+            return {'language': self.SCRIPT_LANGUAGES['latin'], 'method': 'script',
+                    'confidence': latin / letters}
+        
+        return None
+    
+    def _detect_batch(self, segments: List[str], batch: List[int],
+                      results: List[Optional[Dict[str, Any]]]) -> None:
+        """Один вызов детектора на батч неоднозначных сегментов."""
+        sample = self._sample('\n'.join(segments[idx] for idx in batch))
+        
+        try:
+            detected = self._detect_cached(sample)
+            label = {
+                'language': detected['language'],
+                'method': 'ngram',
+                'confidence': detected['confidence'],
+            }
+        except LangDetectException:
+            label = {'language': 'unknown', 'method': 'ngram', 'confidence': 0.0}
+        
+        for idx in batch:
+            results[idx] = dict(label)
+    
+    def _detect_cached(self, sample: str) -> Dict[str, Any]:
+        """Определение языка выборки через LRU-кеш (ключ - хеш содержимого)."""
+        cache_key = hashlib.blake2b(sample.encode('utf-8'), digest_size=16).hexdigest()
+        
+        result = self._cache_get(cache_key)
+        if result is None:
+            result = self._detect_sample(sample)
+            self._cache_put(cache_key, result)
+        
+        return result
+    
+    def _detect_sample(self, sample: str) -> Dict[str, Any]:
+        """Один вызов detect_langs: основной язык - первый (самый вероятный)."""
+        lang_probs = detect_langs(sample)
+        
+        probabilities = [
+            {
+                'language': lang_prob.lang,
+                'language_name': self.LANGUAGE_NAMES.get(lang_prob.lang, 'Unknown'),
+                'probability': lang_prob.prob,
+            }
+            for lang_prob in lang_probs
+        ]
+        
+        # Сортировка по вероятности
+        probabilities.sort(key=lambda x: x['probability'], reverse=True)
+        
+        # Определение надежности
+        primary_lang = probabilities[0]['language'] if probabilities else 'unknown'
+        max_prob = probabilities[0]['probability'] if probabilities else 0.0
+        is_reliable = max_prob > 0.9
+        
+        return {
+            'language': primary_lang,
+            'language_name': self.LANGUAGE_NAMES.get(primary_lang, 'Unknown'),
+            'confidence': max_prob,
+            'probabilities': probabilities,
+            'is_reliable': is_reliable,
+        }
+    
     def detect_encoding(self, raw_bytes: bytes) -> Dict[str, Any]:
         """
         Определяет кодировку текста.
         
         Args:
             raw_bytes: Байты файла
-            
+        
         Returns:
             Dict с информацией о кодировке
         """
@@ -145,7 +384,7 @@ class LanguageDetector:
                 'is_reliable': confidence > 0.8,
                 'language': result.get('language', 'unknown'),
             }
-            
+        
         except Exception as e:
             logger.error(f"Encoding detection failed: {e}")
             return {
@@ -155,14 +394,14 @@ class LanguageDetector:
                 'error': str(e),
             }
     
-    def detect_full(self, text: str, raw_bytes: Optional[bytes] = None) -> Dict[str, Any]:
+    def detect_full(self, text: Union[str, AnalysisContext], raw_bytes: Optional[bytes] = None) -> Dict[str, Any]:
         """
         Полное определение языка и кодировки.
         
         Args:
             text: Текст документа
             raw_bytes: Исходные байты (опционально)
-            
+        
         Returns:
             Полная информация о языке и кодировке
         """
@@ -4,12 +4,14 @@ Named Entity Recognition (NER) utilities.
 """
 
 import re
-from typing import List, Dict, Any, Set
+from typing import List, Dict, Any, Set, Union
 from datetime import datetime
 import phonenumbers
 from dateutil import parser as date_parser
 import logging
 
+from .analysis_context import AnalysisContext
+
 logger = logging.getLogger(__name__)
 
 
@@ -43,19 +45,22 @@ class NERExtractor:
             'fio': re.compile(self.FIO_PATTERN),
         }
     
-    def extract_all(self, text: str) -> Dict[str, List[Any]]:
+    def extract_all(self, text: Union[str, AnalysisContext]) -> Dict[str, List[Any]]:
         """
         Извлекает все сущности из текста.
         
         Args:
-            text: Исходный текст
+            text: Исходный текст или контекст анализа
             
         Returns:
             Dict с извлеченными сущностями
         """
-        if not text or not isinstance(text, str):
+        ctx = AnalysisContext.ensure(text)
+        if ctx is None:
             return self._empty_result()
         
+        text = ctx.text
+        
         try:
             result = {
                 'emails': self.extract_emails(text),
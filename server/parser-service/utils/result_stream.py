@@ -0,0 +1,200 @@
+"""
+Parse result streaming utilities.
+Выбор полей результата парсинга и потоковая выдача результата записями NDJSON.
+"""
+
+import logging
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+
+from .serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+# Секции верхнего уровня результата; прочие имена в fields относятся к content
+RESULT_SECTIONS = ('metadata', 'content', 'analysis')
+
+# Символов текста в одной записи
+TEXT_CHUNK_SIZE = 65536
+
+# Элементов структуры в одной записи (страница PDF - всегда отдельная запись)
+STRUCTURE_BATCH = 200
+
+# Строк таблицы в одной записи
+TABLE_ROW_BATCH = 1000
+
+# Поля таблиц со списками строк, которые выдаются частями
+TABLE_ROW_FIELDS = ('rows', 'all_rows', 'data')
+
+# Путь () - поддерево целиком
+Path = Tuple[str, ...]
+ALL_FIELDS: List[Path] = [()]
+
+
+def parse_fields(fields: Optional[str]) -> List[Path]:
+    """
+    Разбор параметра fields ("text,analysis.entities,tables").
+    
+    Args:
+        fields: Пути через запятую; первый сегмент, не являющийся секцией
+            результата (metadata/content/analysis), ищется в content
+    
+    Returns:
+        Список путей; ALL_FIELDS если выбор не задан
+    """
+    paths = []
+    
+    for field in (fields or '').split(','):
+        parts = tuple(part for part in field.strip().split('.') if part)
+        if not parts:
+            continue
+        if parts[0] not in RESULT_SECTIONS:
+            parts = ('content',) + parts
+        paths.append(parts)
+    
+    return paths or ALL_FIELDS
+
+
+def subpaths(paths: List[Path], prefix: Path) -> List[Path]:
+    """Выбранные пути внутри поддерева prefix (пустой список - поддерево не выбрано)."""
+    selected = []
+    
+    for path in paths:
+        common = min(len(path), len(prefix))
+        if path[:common] == prefix[:common]:
+            selected.append(path[len(prefix):])
+    
+    return selected
+
+
+def select(value: Any, paths: List[Path]) -> Any:
+    """Значение, урезанное до выбранных путей."""
+    if () in paths or not isinstance(value, dict):
+        return value
+    
+    selected = {}
+    for key in dict.fromkeys(path[0] for path in paths):
+        if key in value:
+            selected[key] = select(value[key], subpaths(paths, (key,)))
+    
+    return selected
+
+
+def select_fields(result: Dict[str, Any], paths: List[Path]) -> Dict[str, Any]:
+    """Результат парсинга с выбранными полями (metadata включается всегда)."""
+    selected = select(result, paths)
+    if 'metadata' in result:
+        selected['metadata'] = result['metadata']
+    
+    return selected
+
+
+def encode_record(record: Dict[str, Any]) -> bytes:
+    """Одна строка NDJSON."""
+    return dumps(record) + b'\n'
+
+
+def iter_content_records(content: Dict[str, Any], paths: List[Path]) -> Iterator[Dict[str, Any]]:
+    """
+    Записи содержимого документа: текст частями, структура по страницам,
+    таблицы (списки строк - частями) и прочие поля content.
+    """
+    text_paths = subpaths(paths, ('content', 'text'))
+    if text_paths:
+        text = content.get('text') or ''
+        for offset in range(0, len(text), TEXT_CHUNK_SIZE):
+            yield {'type': 'text', 'offset': offset, 'data': text[offset:offset + TEXT_CHUNK_SIZE]}
+    
+    structure_paths = subpaths(paths, ('content', 'structure'))
+    if structure_paths:
+        batch: List[Any] = []
+        offset = 0
+        
+        for index, item in enumerate(content.get('structure') or []):
+            if isinstance(item, dict) and 'page' in item:
+                if batch:
+                    yield {'type': 'structure', 'offset': offset, 'data': batch}
+                    batch = []
+                yield {'type': 'structure', 'offset': index, 'page': item['page'], 'data': [item]}
+                continue
+            
+            if not batch:
+                offset = index
+            batch.append(item)
+            if len(batch) >= STRUCTURE_BATCH:
+                yield {'type': 'structure', 'offset': offset, 'data': batch}
+                batch = []
+        
+        if batch:
+            yield {'type': 'structure', 'offset': offset, 'data': batch}
+    
+    table_paths = subpaths(paths, ('content', 'tables'))
+    if table_paths:
+        for index, table in enumerate(content.get('tables') or []):
+            if not isinstance(table, dict):
+                yield {'type': 'table', 'index': index, 'data': table}
+                continue
+            
+            row_fields = [
+                field for field in TABLE_ROW_FIELDS
+                if isinstance(table.get(field), list) and subpaths(table_paths, (field,))
+            ]
+            header = {key: value for key, value in table.items() if key not in TABLE_ROW_FIELDS}
+            yield {'type': 'table', 'index': index, 'data': header}
+            
+            for field in row_fields:
+                rows = table[field]
+                for offset in range(0, len(rows), TABLE_ROW_BATCH):
+                    yield {
+                        'type': 'table_rows',
+                        'index': index,
+                        'field': field,
+                        'offset': offset,
+                        'data': rows[offset:offset + TABLE_ROW_BATCH],
+                    }
+    
+    for name, value in content.items():
+        if name in ('text', 'structure', 'tables'):
+            continue
+        
+        name_paths = subpaths(paths, ('content', name))
+        if name_paths:
+            yield {'type': 'content', 'name': name, 'data': select(value, name_paths)}
+
+
+def iter_result_records(result: Dict[str, Any], stages: Iterable[str],
+                        paths: List[Path] = ALL_FIELDS) -> Iterator[bytes]:
+    """
+    Потоковая выдача результата парсинга в формате NDJSON.
+    
+    stages - генератор этапов обработки: 'content' когда содержимое готово
+    (после очистки текста), далее имена секций analysis по мере их готовности.
+    Записи: metadata, содержимое (text/structure/table/table_rows/content),
+    analysis по одной на секцию и завершающая end с итоговыми метаданными;
+    при ошибке обработки - запись error.
+    
+    Args:
+        result: Результат парсинга (дополняется этапами stages)
+        stages: Этапы обработки
+        paths: Выбранные поля (parse_fields)
+    """
+    try:
+        for stage in stages:
+            if stage == 'content':
+                yield encode_record({'type': 'metadata', 'data': result.get('metadata', {})})
+                for record in iter_content_records(result.get('content', {}), paths):
+                    yield encode_record(record)
+                continue
+            
+            analysis_paths = subpaths(paths, ('analysis', stage))
+            if analysis_paths:
+                yield encode_record({
+                    'type': 'analysis',
+                    'name': stage,
+                    'data': select(result.get('analysis', {}).get(stage), analysis_paths),
+                })
+        
+        yield encode_record({'type': 'end', 'data': result.get('metadata', {})})
+    
+    except Exception as e:
+        logger.error(f"Streaming parse result failed: {e}", exc_info=True)
+        yield encode_record({'type': 'error', 'detail': str(e)})
@@ -3,17 +3,21 @@ Semantic Analysis utilities.
 Семантический анализ: извлечение ключевых слов, тематическое моделирование, саммаризация.
 """
 
+import bisect
 import logging
-import re
-from typing import Dict, Any, List, Tuple
+import os
+from typing import Dict, Any, List, Tuple, Union
 from collections import Counter
 import math
 
+from .analysis_context import AnalysisContext
+
 logger = logging.getLogger(__name__)
 
 try:
-    from sklearn.feature_extraction.text import TfidfVectorizer, CountVectorizer
-    from sklearn.decomposition import LatentDirichletAllocation
+    from .corpus_idf import CorpusIDF
+    from .topic_model import TopicModel
+    from .summarizer import TextRankSummarizer
     SKLEARN_AVAILABLE = True
 except ImportError:
     logger.warning("scikit-learn not available, some features will be disabled")
@@ -22,7 +26,6 @@ except ImportError:
 try:
     import nltk
     from nltk.corpus import stopwords
-    from nltk.tokenize import word_tokenize, sent_tokenize
     NLTK_AVAILABLE = True
     
     # Попытка загрузки необходимых ресурсов
@@ -37,6 +40,9 @@ except ImportError:
     logger.warning("NLTK not available, using fallback methods")
     NLTK_AVAILABLE = False
 
+# Каталог для моделей корпуса (IDF, темы)
+MODEL_DIR = os.getenv('MODEL_DIR', '/app/models')
+
 
 class SemanticAnalyzer:
     """Семантический анализ текста."""
@@ -70,32 +76,80 @@ class SemanticAnalyzer:
                 self.stopwords_combined.update(stopwords.words('english'))
             except:
                 pass
+        
+        # Список строится один раз и переиспользуется векторизаторами
+        self.stopwords_list = sorted(self.stopwords_combined)
+        
+        # Модели корпуса (обновляются по мере парсинга документов)
+        self.corpus_idf = None
+        self.topic_model = None
+        self.summarizer = None
+        if SKLEARN_AVAILABLE:
+            self.corpus_idf = CorpusIDF(
+                self.stopwords_list,
+                model_path=os.path.join(MODEL_DIR, 'corpus_idf.npz'),
+            )
+            self.topic_model = TopicModel(
+                self.stopwords_list,
+                model_path=os.path.join(MODEL_DIR, 'topic_model.joblib'),
+            )
+            self.summarizer = TextRankSummarizer(self.corpus_idf)
+    
+    def update_corpus(self, text: Union[str, AnalysisContext]) -> None:
+        """
+        Учет документа в моделях корпуса: документные частоты для IDF
+        (синхронно, сохранение на диск - в фоне) и тематическая модель (в фоне).
+        
+        Args:
+            text: Текст документа или контекст анализа
+        """
+        ctx = AnalysisContext.ensure(text)
+        if self.corpus_idf is None or ctx is None:
+            return
+        
+        try:
+            if self.corpus_idf.partial_fit(ctx.lower_tokens):
+                self.topic_model.run_in_background(self.corpus_idf.save_if_due)
+            self.topic_model.submit(ctx.lower_tokens)
+        except Exception as e:
+            logger.error(f"Corpus update error: {e}")
     
-    def analyze(self, text: str, language: str = 'ru') -> Dict[str, Any]:
+    def save_models(self) -> None:
+        """Сохранение моделей корпуса на диск."""
+        if self.corpus_idf is not None:
+            self.corpus_idf.save()
+        if self.topic_model is not None:
+            self.topic_model.save()
+    
+    def analyze(self, text: Union[str, AnalysisContext], language: str = 'ru') -> Dict[str, Any]:
         """
         Полный семантический анализ текста.
         
+        Токены и предложения берутся из общего контекста анализа и
+        вычисляются один раз для всех шагов.
+        
         Args:
-            text: Исходный текст
+            text: Исходный текст или контекст анализа
             language: Язык текста ('ru', 'en', 'auto')
             
         Returns:
             Dict с результатами анализа
         """
-        if not text or not isinstance(text, str):
+        ctx = AnalysisContext.ensure(text, language=language)
+        if ctx is None:
             return self._empty_result()
         
         try:
             result = {
-                'keywords': self.extract_keywords(text, language, top_n=20),
-                'statistics': self.get_text_statistics(text),
-                'summary': self.generate_summary(text, sentences=3),
+                'keywords': self.extract_keywords(ctx, language, top_n=20),
+                'statistics': self.get_text_statistics(ctx),
+                'summary': self.generate_summary(ctx, sentences=3),
             }
             
             # Тематическое моделирование (если доступен sklearn)
-            if SKLEARN_AVAILABLE and len(text) > 500:
+            if SKLEARN_AVAILABLE and len(ctx.text) > 500:
                 try:
-                    result['topics'] = self.extract_topics(text, n_topics=3)
+                    result['topics'] = self.extract_topics(ctx, n_topics=3)
                 except Exception as e:
                     logger.warning(f"Topic modeling failed: {e}")
                     result['topics'] = []
@@ -108,77 +162,55 @@ class SemanticAnalyzer:
             logger.error(f"Semantic analysis error: {e}")
             return self._empty_result()
     
-    def extract_keywords(self, text: str, language: str = 'ru', top_n: int = 20) -> List[Dict[str, Any]]:
+    def extract_keywords(self, text: Union[str, AnalysisContext], language: str = 'ru',
+                         top_n: int = 20) -> List[Dict[str, Any]]:
         """
         Извлечение ключевых слов методом TF-IDF (или fallback).
         
         Args:
-            text: Текст
+            text: Текст или контекст анализа
             language: Язык
             top_n: Количество ключевых слов
             
         Returns:
             Список ключевых слов с весами
         """
+        ctx = AnalysisContext.ensure(text)
+        if ctx is None:
+            return []
+        
         try:
             if SKLEARN_AVAILABLE:
-                return self._extract_keywords_tfidf(text, top_n)
+                return self._extract_keywords_tfidf(ctx, top_n)
             else:
-                return self._extract_keywords_frequency(text, top_n)
+                return self._extract_keywords_frequency(ctx, top_n)
         except Exception as e:
             logger.error(f"Keyword extraction error: {e}")
             return []
     
-    def _extract_keywords_tfidf(self, text: str, top_n: int) -> List[Dict[str, Any]]:
+    def _extract_keywords_tfidf(self, ctx: AnalysisContext, top_n: int) -> List[Dict[str, Any]]:
         """Извлечение ключевых слов с TF-IDF."""
         try:
-            # Токенизация
-            words = self._tokenize(text)
-            
             # Если слов мало, используем частотный метод
-            if len(words) < 20:
-                return self._extract_keywords_frequency(text, top_n)
-            
-            # TF-IDF
-            vectorizer = TfidfVectorizer(
-                max_features=top_n * 2,
-                stop_words=list(self.stopwords_combined),
-                token_pattern=r'[а-яёА-ЯЁa-zA-Z]{3,}',  # Минимум 3 буквы
-            )
-            
-            tfidf_matrix = vectorizer.fit_transform([text])
-            feature_names = vectorizer.get_feature_names_out()
-            tfidf_scores = tfidf_matrix.toarray()[0]
+            if len(ctx.tokens) < 20:
+                return self._extract_keywords_frequency(ctx, top_n)
             
-            # Сортировка по важности
-            word_scores = list(zip(feature_names, tfidf_scores))
-            word_scores.sort(key=lambda x: x[1], reverse=True)
-            
-            keywords = [
-                {
-                    'word': word,
-                    'score': float(score),
-                    'rank': idx + 1,
-                }
-                for idx, (word, score) in enumerate(word_scores[:top_n])
-                if score > 0
-            ]
+            # TF-IDF относительно корпуса: только хеширование и lookup IDF
+            keywords = self.corpus_idf.keywords(ctx.lower_tokens, top_n)
             
             return keywords
             
         except Exception as e:
             logger.error(f"TF-IDF extraction error: {e}")
-            return self._extract_keywords_frequency(text, top_n)
+            return self._extract_keywords_frequency(ctx, top_n)
     
-    def _extract_keywords_frequency(self, text: str, top_n: int) -> List[Dict[str, Any]]:
+    def _extract_keywords_frequency(self, ctx: AnalysisContext, top_n: int) -> List[Dict[str, Any]]:
         """Извлечение ключевых слов по частоте (fallback)."""
         try:
-            words = self._tokenize(text)
-            
             # Фильтрация стоп-слов и коротких слов
             filtered_words = [
-                word.lower() for word in words
-                if len(word) >= 3 and word.lower() not in self.stopwords_combined
+                word for word in ctx.lower_tokens
+                if len(word) >= 3 and word not in self.stopwords_combined
             ]
             
             # Подсчет частот
@@ -206,82 +238,62 @@ class SemanticAnalyzer:
             logger.error(f"Frequency extraction error: {e}")
             return []
     
-    def extract_topics(self, text: str, n_topics: int = 3, words_per_topic: int = 10) -> List[Dict[str, Any]]:
+    def extract_topics(self, text: Union[str, AnalysisContext], n_topics: int = 3,
+                       words_per_topic: int = 10) -> List[Dict[str, Any]]:
         """
-        Тематическое моделирование (LDA).
+        Темы документа по корпусной LDA-модели.
+        
+        Модель обучается в фоне на всех разобранных документах; здесь выполняется
+        только transform. Пока модель не накопила достаточно документов,
+        возвращается пустой список.
         
         Args:
-            text: Текст
-            n_topics: Количество тем
+            text: Текст или контекст анализа
+            n_topics: Количество тем документа
             words_per_topic: Слов в каждой теме
             
         Returns:
-            Список тем с ключевыми словами
+            Список тем с весами и ключевыми словами
         """
         if not SKLEARN_AVAILABLE:
             logger.warning("sklearn not available for topic modeling")
             return []
         
+        ctx = AnalysisContext.ensure(text)
+        if ctx is None:
+            return []
+        
         try:
-            # Векторизация
-            vectorizer = CountVectorizer(
-                max_features=1000,
-                stop_words=list(self.stopwords_combined),
-                token_pattern=r'[а-яёА-ЯЁa-zA-Z]{3,}',
-            )
-            
-            doc_term_matrix = vectorizer.fit_transform([text])
-            
-            # LDA
-            lda = LatentDirichletAllocation(
-                n_components=n_topics,
-                random_state=42,
-                max_iter=10,
+            return self.topic_model.transform(
+                ctx.lower_tokens,
+                n_topics=n_topics,
+                words_per_topic=words_per_topic,
             )
             
-            lda.fit(doc_term_matrix)
-            
-            # Извлечение топ-слов для каждой темы
-            feature_names = vectorizer.get_feature_names_out()
-            
-            topics = []
-            for topic_idx, topic in enumerate(lda.components_):
-                top_words_idx = topic.argsort()[-words_per_topic:][::-1]
-                top_words = [
-                    {
-                        'word': feature_names[i],
-                        'weight': float(topic[i]),
-                    }
-                    for i in top_words_idx
-                ]
-                
-                topics.append({
-                    'topic_id': topic_idx + 1,
-                    'keywords': top_words,
-                })
-            
-            return topics
-            
         except Exception as e:
             logger.error(f"Topic modeling error: {e}")
             return []
     
-    def get_text_statistics(self, text: str) -> Dict[str, Any]:
+    def get_text_statistics(self, text: Union[str, AnalysisContext]) -> Dict[str, Any]:
         """
         Статистика текста.
         
         Args:
-            text: Текст
+            text: Текст или контекст анализа
             
         Returns:
             Статистика
         """
+        ctx = AnalysisContext.ensure(text)
+        if ctx is None:
+            return {}
+        
         try:
-            words = self._tokenize(text)
-            sentences = self._split_sentences(text)
+            words = ctx.tokens
+            sentences = ctx.sentences
             
             # Уникальные слова
-            unique_words = set(word.lower() for word in words if len(word) >= 3)
+            unique_words = set(word for word in ctx.lower_tokens if len(word) >= 3)
             
             # Средняя длина слова
             avg_word_length = sum(len(word) for word in words) / len(words) if words else 0
@@ -289,8 +301,8 @@ class SemanticAnalyzer:
             # Средняя длина предложения
             avg_sentence_length = len(words) / len(sentences) if sentences else 0
             
-            return {
-                'total_characters': len(text),
+            stats = {
+                'total_characters': len(ctx.text),
                 'total_words': len(words),
                 'total_sentences': len(sentences),
                 'unique_words': len(unique_words),
@@ -299,27 +311,56 @@ class SemanticAnalyzer:
                 'avg_sentence_length': round(avg_sentence_length, 2),
             }
             
+            # Слов по языкам (если язык определялся по сегментам)
+            if ctx.language_segments:
+                stats['words_by_language'] = self._words_by_language(ctx)
+            
+            return stats
+            
         except Exception as e:
             logger.error(f"Statistics error: {e}")
             return {}
     
-    def generate_summary(self, text: str, sentences: int = 3) -> str:
+    def _words_by_language(self, ctx: AnalysisContext) -> Dict[str, int]:
+        """Количество токенов в диапазонах каждого языка."""
+        token_starts = [start for start, _ in ctx.token_spans]
+        counts: Dict[str, int] = {}
+        
+        for segment in ctx.language_segments:
+            n_words = bisect.bisect_left(token_starts, segment['end']) - bisect.bisect_left(token_starts, segment['start'])
+            counts[segment['language']] = counts.get(segment['language'], 0) + n_words
+        
+        return counts
+    
+    def generate_summary(self, text: Union[str, AnalysisContext], sentences: int = 3) -> str:
         """
         Генерация краткого резюме (extractive summarization).
         
+        TextRank по TF-IDF векторам предложений; без sklearn - первое,
+        среднее и последнее предложения.
+        
         Args:
-            text: Текст
+            text: Текст или контекст анализа
             sentences: Количество предложений в резюме
             
         Returns:
             Резюме
         """
+        ctx = AnalysisContext.ensure(text)
+        if ctx is None:
+            return ''
+        
+        text = ctx.text
+        
         try:
-            sents = self._split_sentences(text)
+            sents = ctx.sentences
             
             if len(sents) <= sentences:
                 return text
             
+            if self.summarizer is not None:
+                return self.summarizer.summarize(ctx, sentences=sentences)
+            
             # Простой алгоритм: берем первые и последние предложения
             # + одно из середины
             if sentences == 3 and len(sents) >= 3:
@@ -338,29 +379,6 @@ class SemanticAnalyzer:
             logger.error(f"Summary generation error: {e}")
             return text[:500] + '...' if len(text) > 500 else text
     
-    def _tokenize(self, text: str) -> List[str]:
-        """Токенизация текста."""
-        if NLTK_AVAILABLE:
-            try:
-                return word_tokenize(text, language='russian')
-            except:
-                pass
-        
-        # Fallback: простая regex токенизация
-        return re.findall(r'[а-яёА-ЯЁa-zA-Z]+', text)
-    
-    def _split_sentences(self, text: str) -> List[str]:
-        """Разбиение на предложения."""
-        if NLTK_AVAILABLE:
-            try:
-                return sent_tokenize(text, language='russian')
-            except:
-                pass
-        
-        # Fallback: разбиение по точкам, восклицательным и вопросительным знакам
-        sentences = re.split(r'[.!?]+', text)
-        return [s.strip() for s in sentences if s.strip()]
-    
     def _empty_result(self) -> Dict[str, Any]:
         """Пустой результат."""
         return {
@@ -0,0 +1,110 @@
+"""
+JSON serialization utilities.
+Быстрая сериализация результатов парсинга (orjson) для API, экспорта, хранилища и Celery.
+"""
+
+import base64
+import json
+import logging
+from decimal import Decimal
+from typing import Any, Union
+
+import numpy as np
+from fastapi.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    logger.warning("orjson not available, falling back to stdlib json")
+    ORJSON_AVAILABLE = False
+
+# MIME-тип сериализатора Celery/kombu
+CELERY_CONTENT_TYPE = 'application/x-orjson'
+
+if ORJSON_AVAILABLE:
+    # Ключи-числа (номера страниц и т.п.) и массивы numpy поддерживаются напрямую
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def default(obj: Any) -> Any:
+    """Преобразование типов, которые JSON не поддерживает (numpy, множества, bytes)."""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, (bytes, bytearray)):
+        return base64.b64encode(obj).decode('ascii')
+    if isinstance(obj, Decimal):
+        return float(obj)
+    return str(obj)
+
+
+def _stdlib_keys(obj: Any) -> Any:
+    """Приведение ключей словарей к строкам (stdlib json не принимает numpy-ключи)."""
+    if isinstance(obj, dict):
+        return {
+            key if isinstance(key, (str, int, float, bool)) or key is None else str(default(key)): _stdlib_keys(value)
+            for key, value in obj.items()
+        }
+    if isinstance(obj, (list, tuple)):
+        return [_stdlib_keys(value) for value in obj]
+    return obj
+
+
+def dumps(obj: Any, indent: bool = False) -> bytes:
+    """
+    Сериализация в JSON (UTF-8).
+    
+    Args:
+        obj: Сериализуемый объект
+        indent: Форматировать с отступом в 2 пробела
+    
+    Returns:
+        JSON в байтах
+    """
+    if ORJSON_AVAILABLE:
+        option = ORJSON_OPTIONS | orjson.OPT_INDENT_2 if indent else ORJSON_OPTIONS
+        return orjson.dumps(obj, default=default, option=option)
+    
+    return json.dumps(
+        _stdlib_keys(obj),
+        ensure_ascii=False,
+        indent=2 if indent else None,
+        separators=None if indent else (',', ':'),
+        default=default,
+    ).encode('utf-8')
+
+
+def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+    """Разбор JSON."""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON-ответ FastAPI с сериализацией через dumps (numpy-типы, нестроковые ключи)."""
+    
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def register_celery_serializer(name: str = 'orjson') -> str:
+    """
+    Регистрация сериализатора в kombu (для task_serializer/result_serializer Celery).
+    
+    Returns:
+        Имя сериализатора
+    """
+    from kombu.serialization import register
+    
+    register(name, dumps, loads, content_type=CELERY_CONTENT_TYPE, content_encoding='binary')
+    return name
@@ -0,0 +1,356 @@
+"""
+Structural document diff.
+Сравнение версий документа по структуре (абзацы, заголовки, ячейки таблиц):
+алгоритм Майерса с поиском "средней змеи" - O((N+M)D) по времени и линейная память.
+"""
+
+import logging
+from typing import Dict, Any, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Операция: (тег, i1, i2, j1, j2) - как в difflib.SequenceMatcher.get_opcodes
+Opcode = Tuple[str, int, int, int, int]
+
+# Типы элементов, которые сравниваются как заголовки; остальной текст - как 'text'
+HEADING_PREFIX = 'heading'
+
+# Порог стоимости (как "too expensive" в GNU diff): дальше D поиск средней змеи
+# не продолжается, участок делится по самой продвинутой диагонали. Результат
+# остается корректным, но может быть не минимальным на сильно переписанных участках.
+MAX_COST = 256
+
+
+def flatten_structure(content: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Последовательность сравниваемых элементов документа.
+    
+    Элементы страниц PDF разворачиваются в общий поток, таблицы - в ячейки
+    (с координатами таблица/строка/столбец).
+    
+    Args:
+        content: Раздел content результата парсинга
+    
+    Returns:
+        Список элементов {'type', 'text', ...}
+    """
+    items = []
+    
+    for element in content.get('structure', []):
+        if not isinstance(element, dict):
+            continue
+        
+        if 'elements' in element:
+            for sub in element['elements']:
+                if sub.get('text'):
+                    items.append({'type': sub.get('type', 'text'), 'text': sub['text'], 'page': element.get('page')})
+        elif element.get('text'):
+            items.append({'type': element.get('type', 'paragraph'), 'text': element['text']})
+    
+    for table_idx, table in enumerate(content.get('tables', [])):
+        if isinstance(table, dict):
+            # all_rows (DOCX) включает строку заголовков
+            rows = table.get('all_rows') or table.get('rows', [])
+        else:
+            rows = table
+        for row_idx, row in enumerate(rows):
+            for col_idx, cell in enumerate(row):
+                items.append({
+                    'type': 'table_cell',
+                    'text': '' if cell is None else str(cell),
+                    'table': table_idx,
+                    'row': row_idx,
+                    'col': col_idx,
+                })
+    
+    return items
+
+
+def _item_key(item: Dict[str, Any]) -> Tuple[str, str]:
+    """Ключ сравнения: вид элемента и текст без учета пробелов."""
+    item_type = item.get('type', '')
+    
+    if item_type.startswith(HEADING_PREFIX):
+        kind = HEADING_PREFIX
+    elif item_type == 'table_cell':
+        kind = item_type
+    else:
+        kind = 'text'
+    
+    return kind, ' '.join(item.get('text', '').split())
+
+
+def _encode(a_keys: Sequence[Any], b_keys: Sequence[Any]) -> Tuple[List[int], List[int]]:
+    """Замена ключей целыми числами (сравнение в цикле Майерса - по int)."""
+    ids: Dict[Any, int] = {}
+    a = [ids.setdefault(key, len(ids)) for key in a_keys]
+    b = [ids.setdefault(key, len(ids)) for key in b_keys]
+    return a, b
+
+
+def _middle_snake(a: Sequence[int], a_lo: int, a_hi: int,
+                  b: Sequence[int], b_lo: int, b_hi: int,
+                  max_cost: int = MAX_COST) -> Tuple[int, int, int, int, int]:
+    """
+    Средняя змея Майерса для a[a_lo:a_hi] и b[b_lo:b_hi].
+    
+    Returns:
+        (x0, y0, x1, y1, D): змея от (x0, y0) до (x1, y1) в локальных координатах
+        и длина кратчайшего редакционного предписания D
+    """
+    n = a_hi - a_lo
+    m = b_hi - b_lo
+    delta = n - m
+    odd = delta & 1
+    max_d = (n + m + 1) // 2
+    offset = max_d + 1
+    
+    forward = [0] * (2 * max_d + 3)
+    backward = [0] * (2 * max_d + 3)
+    
+    for d in range(max_d + 1):
+        # Прямой проход: самая дальняя точка на каждой диагонали k = x - y
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and forward[offset + k - 1] < forward[offset + k + 1]):
+                x = forward[offset + k + 1]
+            else:
+                x = forward[offset + k - 1] + 1
+            y = x - k
+            x0, y0 = x, y
+            
+            while x < n and y < m and a[a_lo + x] == b[b_lo + y]:
+                x += 1
+                y += 1
+            forward[offset + k] = x
+            
+            back_k = delta - k
+            if odd and -(d - 1) <= back_k <= d - 1 and x + backward[offset + back_k] >= n:
+                return x0, y0, x, y, 2 * d - 1
+        
+        # Обратный проход: то же с конца последовательностей
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and backward[offset + k - 1] < backward[offset + k + 1]):
+                x = backward[offset + k + 1]
+            else:
+                x = backward[offset + k - 1] + 1
+            y = x - k
+            x0, y0 = x, y
+            
+            while x < n and y < m and a[a_hi - 1 - x] == b[b_hi - 1 - y]:
+                x += 1
+                y += 1
+            backward[offset + k] = x
+            
+            forward_k = delta - k
+            if not odd and -d <= forward_k <= d and x + forward[offset + forward_k] >= n:
+                return n - x, m - y, n - x0, m - y0, 2 * d
+        
+        if d >= max_cost:
+            # Слишком дорого: деление по прямой диагонали, продвинувшейся дальше всех
+            best_x, best_y = 0, 0
+            for k in range(-d, d + 1, 2):
+                x = min(forward[offset + k], n)
+                y = x - k
+                if 0 <= y <= m and x + y > best_x + best_y:
+                    best_x, best_y = x, y
+            return best_x, best_y, best_x, best_y, 2 * d
+    
+    # Недостижимо: D <= n + m
+    return 0, 0, 0, 0, n + m
+
+
+def diff_sequences(a_keys: Sequence[Any], b_keys: Sequence[Any], max_cost: int = MAX_COST) -> List[Opcode]:
+    """
+    Кратчайшее редакционное предписание между двумя последовательностями.
+    
+    Args:
+        a_keys: Ключи элементов старой версии (хешируемые)
+        b_keys: Ключи элементов новой версии
+        max_cost: Порог стоимости участка (см. MAX_COST)
+    
+    Returns:
+        Операции (tag, i1, i2, j1, j2), tag: equal / delete / insert / replace
+    """
+    a, b = _encode(a_keys, b_keys)
+    
+    # Элементы, которых нет в другой версии, заведомо удалены/вставлены (как в GNU diff):
+    # алгоритм Майерса работает только по общим элементам
+    in_a = set(a)
+    in_b = set(b)
+    a_index = [i for i, x in enumerate(a) if x in in_b]
+    b_index = [j for j, x in enumerate(b) if x in in_a]
+    
+    raw: List[Opcode] = []
+    a_pos = b_pos = 0
+    
+    for tag, i1, i2, j1, j2 in _myers([a[i] for i in a_index], [b[j] for j in b_index], max_cost):
+        if tag != 'equal':
+            continue
+        
+        for offset in range(i2 - i1):
+            i = a_index[i1 + offset]
+            j = b_index[j1 + offset]
+            raw.append(('delete', a_pos, i, b_pos, b_pos))
+            raw.append(('insert', i, i, b_pos, j))
+            raw.append(('equal', i, i + 1, j, j + 1))
+            a_pos, b_pos = i + 1, j + 1
+    
+    raw.append(('delete', a_pos, len(a), b_pos, b_pos))
+    raw.append(('insert', len(a), len(a), b_pos, len(b)))
+    
+    return _merge_opcodes(raw)
+
+
+def _myers(a: Sequence[int], b: Sequence[int], max_cost: int) -> List[Opcode]:
+    """Операции алгоритма Майерса (линейная память, без склейки)."""
+    raw: List[Opcode] = []
+    
+    # Явный стек вместо рекурсии; задачи снимаются в порядке следования по тексту
+    stack: List[Tuple[str, int, int, int, int]] = [('diff', 0, len(a), 0, len(b))]
+    
+    while stack:
+        tag, a_lo, a_hi, b_lo, b_hi = stack.pop()
+        
+        if tag == 'equal':
+            raw.append((tag, a_lo, a_hi, b_lo, b_hi))
+            continue
+        
+        # Общие префикс и суффикс
+        prefix = 0
+        while a_lo + prefix < a_hi and b_lo + prefix < b_hi and a[a_lo + prefix] == b[b_lo + prefix]:
+            prefix += 1
+        suffix = 0
+        while (a_hi - suffix > a_lo + prefix and b_hi - suffix > b_lo + prefix
+               and a[a_hi - 1 - suffix] == b[b_hi - 1 - suffix]):
+            suffix += 1
+        
+        if suffix:
+            stack.append(('equal', a_hi - suffix, a_hi, b_hi - suffix, b_hi))
+        
+        inner = ('diff', a_lo + prefix, a_hi - suffix, b_lo + prefix, b_hi - suffix)
+        
+        if prefix:
+            # Префикс должен попасть в результат раньше внутренней части
+            stack.append(inner)
+            stack.append(('equal', a_lo, a_lo + prefix, b_lo, b_lo + prefix))
+            continue
+        
+        _, a_lo, a_hi, b_lo, b_hi = inner
+        
+        if a_lo == a_hi and b_lo == b_hi:
+            continue
+        if a_lo == a_hi:
+            raw.append(('insert', a_lo, a_hi, b_lo, b_hi))
+            continue
+        if b_lo == b_hi:
+            raw.append(('delete', a_lo, a_hi, b_lo, b_hi))
+            continue
+        
+        x0, y0, x1, y1, d = _middle_snake(a, a_lo, a_hi, b, b_lo, b_hi, max_cost)
+        n, m = a_hi - a_lo, b_hi - b_lo
+        
+        if d <= 1 or (x0, y0) == (n, m) or (x1, y1) == (0, 0):
+            # После обрезки префикса/суффикса D <= 1 означает одиночную замену;
+            # деление без продвижения (порог стоимости) - тоже замена всего участка
+            raw.append(('delete', a_lo, a_hi, b_lo, b_lo))
+            raw.append(('insert', a_hi, a_hi, b_lo, b_hi))
+            continue
+        
+        stack.append(('diff', a_lo + x1, a_hi, b_lo + y1, b_hi))
+        if x1 > x0:
+            stack.append(('equal', a_lo + x0, a_lo + x1, b_lo + y0, b_lo + y1))
+        stack.append(('diff', a_lo, a_lo + x0, b_lo, b_lo + y0))
+    
+    return raw
+
+
+def _merge_opcodes(raw: List[Opcode]) -> List[Opcode]:
+    """Склейка соседних операций; delete + insert рядом - replace."""
+    merged: List[List[Any]] = []
+    
+    for tag, i1, i2, j1, j2 in raw:
+        if i1 == i2 and j1 == j2:
+            continue
+        
+        if merged:
+            last = merged[-1]
+            if last[0] == tag or (last[0] != 'equal' and tag != 'equal'):
+                if last[0] != tag:
+                    last[0] = 'replace'
+                last[2], last[4] = i2, j2
+                continue
+        
+        merged.append([tag, i1, i2, j1, j2])
+    
+    return [tuple(op) for op in merged]
+
+
+def _inline_diff(before: str, after: str) -> List[Dict[str, str]]:
+    """Пословные изменения внутри замененного элемента."""
+    before_words = before.split()
+    after_words = after.split()
+    changes = []
+    
+    for tag, i1, i2, j1, j2 in diff_sequences(before_words, after_words):
+        if tag in ('equal', 'delete', 'replace') and i2 > i1:
+            changes.append({'op': 'equal' if tag == 'equal' else 'delete', 'text': ' '.join(before_words[i1:i2])})
+        if tag in ('insert', 'replace') and j2 > j1:
+            changes.append({'op': 'insert', 'text': ' '.join(after_words[j1:j2])})
+    
+    return changes
+
+
+def diff_documents(content_a: Dict[str, Any], content_b: Dict[str, Any],
+                   inline_limit: int = 200) -> Dict[str, Any]:
+    """
+    Структурный diff двух результатов парсинга.
+    
+    Args:
+        content_a: content старой версии
+        content_b: content новой версии
+        inline_limit: Максимум пар элементов с пословным diff (на весь документ)
+    
+    Returns:
+        Сводка и список изменений (неизменные участки только подсчитываются)
+    """
+    items_a = flatten_structure(content_a)
+    items_b = flatten_structure(content_b)
+    
+    opcodes = diff_sequences([_item_key(item) for item in items_a], [_item_key(item) for item in items_b])
+    
+    summary = {'items_a': len(items_a), 'items_b': len(items_b), 'equal': 0, 'inserted': 0, 'deleted': 0, 'replaced': 0}
+    changes = []
+    inline_budget = inline_limit
+    
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == 'equal':
+            summary['equal'] += i2 - i1
+            continue
+        
+        change: Dict[str, Any] = {'op': tag, 'a_range': [i1, i2], 'b_range': [j1, j2]}
+        
+        if tag == 'delete':
+            summary['deleted'] += i2 - i1
+            change['items'] = items_a[i1:i2]
+        elif tag == 'insert':
+            summary['inserted'] += j2 - j1
+            change['items'] = items_b[j1:j2]
+        else:
+            summary['replaced'] += max(i2 - i1, j2 - j1)
+            change['before'] = items_a[i1:i2]
+            change['after'] = items_b[j1:j2]
+            
+            pairs = min(i2 - i1, j2 - j1, inline_budget)
+            if pairs > 0:
+                change['inline'] = [
+                    _inline_diff(items_a[i1 + t].get('text', ''), items_b[j1 + t].get('text', ''))
+                    for t in range(pairs)
+                ]
+                inline_budget -= pairs
+        
+        changes.append(change)
+    
+    total = len(items_a) + len(items_b)
+    summary['similarity'] = round(2 * summary['equal'] / total, 4) if total else 1.0
+    
+    return {'summary': summary, 'changes': changes}
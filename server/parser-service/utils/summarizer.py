@@ -0,0 +1,193 @@
+"""
+Extractive summarization.
+Экстрактивная саммаризация TextRank на разреженной матрице сходства предложений.
+"""
+
+import logging
+import time
+from typing import List, Optional
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.preprocessing import normalize
+
+from .analysis_context import AnalysisContext
+from .corpus_idf import CorpusIDF
+
+logger = logging.getLogger(__name__)
+
+
+class TextRankSummarizer:
+    """
+    TextRank поверх TF-IDF векторов предложений.
+    
+    Векторы строятся тем же хеширующим векторизатором и IDF корпуса, что и
+    ключевые слова. Граф сходства разреженный (слабые ребра отбрасываются),
+    ранжирование - степенной итерацией в NumPy. Число предложений в графе и
+    время работы ограничены, поэтому на длинных документах сначала
+    отбираются кандидаты по близости к центроиду документа.
+    """
+    
+    def __init__(
+        self,
+        corpus_idf: CorpusIDF,
+        max_sentences: int = 1000,
+        time_budget: float = 0.5,
+        similarity_threshold: float = 0.05,
+        damping: float = 0.85,
+        max_iter: int = 50,
+        tol: float = 1e-4,
+    ):
+        """
+        Args:
+            corpus_idf: IDF-модель корпуса (векторизатор и веса термов)
+            max_sentences: Максимум предложений в графе TextRank
+            time_budget: Бюджет времени на ранжирование (секунды)
+            similarity_threshold: Минимальное сходство для ребра графа
+            damping: Коэффициент затухания PageRank
+            max_iter: Максимум итераций степенного метода
+            tol: Порог сходимости (L1)
+        """
+        self.corpus_idf = corpus_idf
+        self.max_sentences = max_sentences
+        self.time_budget = time_budget
+        self.similarity_threshold = similarity_threshold
+        self.damping = damping
+        self.max_iter = max_iter
+        self.tol = tol
+    
+    def summarize(self, ctx: AnalysisContext, sentences: int = 3) -> str:
+        """
+        Резюме из наиболее центральных предложений (в порядке следования).
+        
+        Args:
+            ctx: Контекст анализа документа
+            sentences: Количество предложений в резюме
+        
+        Returns:
+            Резюме
+        """
+        sents = ctx.sentences
+        if len(sents) <= sentences:
+            return ctx.text
+        
+        selected = self.select(ctx, sentences)
+        return ' '.join(sents[i] for i in selected)
+    
+    def select(self, ctx: AnalysisContext, sentences: int = 3) -> List[int]:
+        """
+        Индексы предложений для резюме.
+        
+        Args:
+            ctx: Контекст анализа документа
+            sentences: Количество предложений
+        
+        Returns:
+            Отсортированные индексы выбранных предложений
+        """
+        deadline = time.perf_counter() + self.time_budget
+        n_sents = len(ctx.sentence_spans)
+        
+        matrix = self._sentence_vectors(ctx)
+        if matrix is None or matrix.nnz == 0:
+            return list(range(min(sentences, n_sents)))
+        
+        # Кандидаты: предложения, ближайшие к центроиду документа
+        candidates = np.arange(n_sents)
+        centroid_scores = self._centroid_scores(matrix)
+        
+        if n_sents > self.max_sentences:
+            candidates = np.argpartition(-centroid_scores, self.max_sentences)[:self.max_sentences]
+            candidates.sort()
+            matrix = matrix[candidates]
+        
+        if time.perf_counter() > deadline:
+            logger.debug("Summary time budget exceeded before ranking, using centroid scores")
+            scores = centroid_scores[candidates]
+        else:
+            scores = self._textrank(matrix, deadline)
+            if scores is None:
+                scores = centroid_scores[candidates]
+        
+        top = np.argsort(-scores, kind='stable')[:sentences]
+        return sorted(int(candidates[i]) for i in top)
+    
+    def _sentence_vectors(self, ctx: AnalysisContext) -> Optional[sp.csr_matrix]:
+        """L2-нормированная TF-IDF матрица предложения x термы."""
+        token_spans = ctx.token_spans
+        sentence_spans = ctx.sentence_spans
+        if not token_spans or not sentence_spans:
+            return None
+        
+        stopwords = self.corpus_idf.analyzer.stopwords
+        lower_tokens = ctx.lower_tokens
+        
+        keep = [
+            i for i, token in enumerate(lower_tokens)
+            if len(token) >= 3 and token not in stopwords
+        ]
+        if not keep:
+            return None
+        
+        # Принадлежность токенов предложениям по смещениям
+        sentence_starts = np.fromiter((s for s, _ in sentence_spans), dtype=np.int64, count=len(sentence_spans))
+        token_starts = np.fromiter((token_spans[i][0] for i in keep), dtype=np.int64, count=len(keep))
+        rows = np.searchsorted(sentence_starts, token_starts, side='right') - 1
+        valid = rows >= 0
+        
+        # Термы -> хеш-корзины -> компактные номера столбцов
+        terms = [lower_tokens[i] for i in keep]
+        unique_terms = list(dict.fromkeys(terms))
+        term_index = {term: i for i, term in enumerate(unique_terms)}
+        buckets = self.corpus_idf.buckets(unique_terms)
+        cols = np.fromiter((term_index[t] for t in terms), dtype=np.int64, count=len(terms))
+        
+        matrix = sp.csr_matrix(
+            (np.ones(int(valid.sum())), (rows[valid], cols[valid])),
+            shape=(len(sentence_spans), len(unique_terms)),
+        )
+        matrix = matrix @ sp.diags(self.corpus_idf.idf(buckets))
+        
+        return normalize(matrix, norm='l2', copy=False).tocsr()
+    
+    def _centroid_scores(self, matrix: sp.csr_matrix) -> np.ndarray:
+        """Косинусная близость предложений к центроиду документа."""
+        centroid = np.asarray(matrix.sum(axis=0)).ravel()
+        norm = np.linalg.norm(centroid)
+        if norm > 0:
+            centroid /= norm
+        return matrix @ centroid
+    
+    def _textrank(self, matrix: sp.csr_matrix, deadline: float) -> Optional[np.ndarray]:
+        """Степенная итерация PageRank на разреженном графе сходства."""
+        n = matrix.shape[0]
+        
+        similarity = (matrix @ matrix.T).tocsr()
+        similarity.setdiag(0)
+        similarity.data[similarity.data < self.similarity_threshold] = 0
+        similarity.eliminate_zeros()
+        
+        if similarity.nnz == 0:
+            return None
+        
+        out_weight = np.asarray(similarity.sum(axis=1)).ravel()
+        dangling = out_weight == 0
+        inv_weight = np.divide(1.0, out_weight, out=np.zeros_like(out_weight), where=~dangling)
+        
+        # Транспонированная стохастическая матрица переходов
+        transition_t = (sp.diags(inv_weight) @ similarity).T.tocsr()
+        
+        scores = np.full(n, 1.0 / n)
+        teleport = (1.0 - self.damping) / n
+        
+        for _ in range(self.max_iter):
+            dangling_mass = scores[dangling].sum() / n
+            updated = teleport + self.damping * (transition_t @ scores + dangling_mass)
+            
+            delta = np.abs(updated - scores).sum()
+            scores = updated
+            
+            if delta < self.tol or time.perf_counter() > deadline:
+                break
+        
+        return scores
@@ -0,0 +1,376 @@
+"""
+Corpus-wide topic model.
+Онлайн-LDA по всему корпусу: обучение в фоне через partial_fit, на запрос - только transform.
+"""
+
+import copy
+import fcntl
+import logging
+import os
+import queue
+import threading
+from typing import Dict, Any, Callable, List, Optional, Iterable, Union
+
+import joblib
+import numpy as np
+from sklearn.decomposition import LatentDirichletAllocation
+from sklearn.feature_extraction.text import HashingVectorizer
+
+from .corpus_idf import TermAnalyzer, term_buckets
+
+logger = logging.getLogger(__name__)
+
+
+class TopicModel:
+    """
+    Онлайн LDA поверх хешированных признаков.
+    
+    Документы ставятся в очередь при парсинге, фоновый поток собирает их в батчи
+    и дообучает модель через partial_fit. Модель периодически сохраняется на диск,
+    поэтому после рестарта сервис сразу отвечает "теплой" моделью.
+    
+    Обучается копия модели; готовая копия подменяет текущую под коротким
+    захватом блокировки. Опубликованная модель и словарь больше не изменяются,
+    поэтому transform и save работают с ними без блокировки.
+    """
+    
+    def __init__(
+        self,
+        stopwords: Iterable[str],
+        model_path: Optional[str] = None,
+        n_topics: int = 10,
+        n_features: int = 2 ** 16,
+        batch_size: int = 16,
+        min_documents: int = 50,
+        checkpoint_every: int = 10,
+        max_queue_size: int = 1000,
+    ):
+        """
+        Инициализация модели.
+        
+        Args:
+            stopwords: Стоп-слова (нижний регистр)
+            model_path: Путь к чекпоинту модели; None - только в памяти
+            n_topics: Количество тем в корпусе
+            n_features: Размер хеш-пространства
+            batch_size: Документов в одном шаге partial_fit
+            min_documents: Минимум документов до выдачи тем
+            checkpoint_every: Сохранять модель каждые N батчей
+            max_queue_size: Размер очереди документов на обучение
+        """
+        self.model_path = model_path
+        self.n_topics = n_topics
+        self.n_features = n_features
+        self.batch_size = batch_size
+        self.min_documents = min_documents
+        self.checkpoint_every = checkpoint_every
+        
+        self.vectorizer = HashingVectorizer(
+            n_features=n_features,
+            alternate_sign=False,
+            norm=None,
+            analyzer=TermAnalyzer(stopwords),
+        )
+        self.analyzer = self.vectorizer.analyzer
+        
+        self.lda = self._new_lda()
+        self.n_docs = 0
+        # Обратное отображение корзина -> терм (для вывода слов тем)
+        self.vocabulary: Dict[int, str] = {}
+        self._topic_words: List[List[Dict[str, Any]]] = []
+        
+        self._lock = threading.Lock()
+        # Сериализует шаги обучения (копия -> partial_fit -> подмена)
+        self._train_lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._batches_since_checkpoint = 0
+        
+        self.load()
+    
+    def _new_lda(self) -> LatentDirichletAllocation:
+        return LatentDirichletAllocation(
+            n_components=self.n_topics,
+            learning_method='online',
+            learning_offset=10.0,
+            learning_decay=0.7,
+            total_samples=100000,
+            random_state=42,
+        )
+    
+    @property
+    def is_ready(self) -> bool:
+        """Модель обучена на достаточном количестве документов."""
+        return self.n_docs >= self.min_documents and bool(self._topic_words)
+    
+    def submit(self, text: Union[str, List[str]]) -> bool:
+        """
+        Постановка документа в очередь на дообучение (не блокирует).
+        
+        Args:
+            text: Текст документа или список токенов в нижнем регистре
+        
+        Returns:
+            True если документ принят в очередь
+        """
+        if not text:
+            return False
+        
+        self._ensure_worker()
+        
+        try:
+            self._queue.put_nowait(text)
+            return True
+        except queue.Full:
+            logger.debug("Topic model queue is full, document skipped")
+            return False
+    
+    def run_in_background(self, task: Callable[[], Any]) -> bool:
+        """
+        Выполнение задачи в фоновом потоке обучения (не блокирует).
+        
+        Используется для сохранения других моделей корпуса вне потока запроса.
+        
+        Args:
+            task: Функция без аргументов
+        
+        Returns:
+            True если задача принята в очередь
+        """
+        self._ensure_worker()
+        
+        try:
+            self._queue.put_nowait(task)
+            return True
+        except queue.Full:
+            logger.debug("Topic model queue is full, background task skipped")
+            return False
+    
+    def partial_fit(self, texts: List[Union[str, List[str]]]) -> None:
+        """
+        Синхронный шаг обучения на батче документов.
+        
+        Args:
+            texts: Тексты документов (или списки токенов)
+        """
+        texts = [t for t in texts if t]
+        if not texts:
+            return
+        
+        matrix = self.vectorizer.transform(texts)
+        if matrix.nnz == 0:
+            return
+        
+        with self._train_lock:
+            lda = copy.deepcopy(self.lda)
+            lda.partial_fit(matrix)
+            
+            new_terms = self._collect_terms(texts)
+            vocabulary = {**self.vocabulary, **new_terms} if new_terms else self.vocabulary
+            topic_words = self._compute_topic_words(lda, vocabulary)
+            
+            with self._lock:
+                self.lda = lda
+                self.n_docs += len(texts)
+                self.vocabulary = vocabulary
+                self._topic_words = topic_words
+    
+    def transform(self, text: Union[str, List[str]], n_topics: int = 3,
+                  words_per_topic: int = 10) -> List[Dict[str, Any]]:
+        """
+        Распределение тем документа по корпусной модели.
+        
+        Args:
+            text: Текст документа или список токенов в нижнем регистре
+            n_topics: Количество наиболее вероятных тем в ответе
+            words_per_topic: Слов в каждой теме
+        
+        Returns:
+            Список тем документа с весами и ключевыми словами
+        """
+        if not text or not self.is_ready:
+            return []
+        
+        matrix = self.vectorizer.transform([text])
+        if matrix.nnz == 0:
+            return []
+        
+        with self._lock:
+            lda = self.lda
+            topic_words = self._topic_words
+        
+        distribution = lda.transform(matrix)[0]
+        top_topics = np.argsort(-distribution)[:n_topics]
+        
+        return [
+            {
+                'topic_id': int(topic_idx) + 1,
+                'weight': float(distribution[topic_idx]),
+                'keywords': topic_words[topic_idx][:words_per_topic],
+            }
+            for topic_idx in top_topics
+        ]
+    
+    def save(self) -> bool:
+        """
+        Атомарное сохранение чекпоинта модели.
+        
+        Модель обучают несколько процессов (API и воркеры Celery), а состояния
+        онлайн-LDA не складываются - чекпоинт заменяется только моделью,
+        обученной не меньше чем на n_docs чекпоинта.
+        """
+        if not self.model_path or self.n_docs == 0:
+            return False
+        
+        try:
+            os.makedirs(os.path.dirname(self.model_path) or '.', exist_ok=True)
+            tmp_path = f"{self.model_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            
+            with self._lock:
+                state = {
+                    'lda': self.lda,
+                    'n_docs': self.n_docs,
+                    'n_features': self.n_features,
+                    'vocabulary': self.vocabulary,
+                }
+            
+            with open(f"{self.model_path}.lock", 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                
+                if os.path.exists(self.model_path) and joblib.load(self.model_path)['n_docs'] > state['n_docs']:
+                    logger.info("Topic model checkpoint is trained on more documents; not replaced")
+                    return False
+                
+                joblib.dump(state, tmp_path)
+                os.replace(tmp_path, self.model_path)
+            return True
+        
+        except Exception as e:
+            logger.error(f"Failed to save topic model: {e}")
+            return False
+    
+    def load(self) -> bool:
+        """Загрузка чекпоинта модели (если есть)."""
+        if not self.model_path or not os.path.exists(self.model_path):
+            return False
+        
+        try:
+            state = joblib.load(self.model_path)
+            
+            lda = state['lda']
+            if state.get('n_features') != self.n_features or lda.n_components != self.n_topics:
+                logger.warning("Topic model checkpoint does not match configuration; ignoring")
+                return False
+            
+            topic_words = self._compute_topic_words(lda, state['vocabulary'])
+            
+            with self._lock:
+                self.lda = lda
+                self.n_docs = state['n_docs']
+                self.vocabulary = state['vocabulary']
+                self._topic_words = topic_words
+            
+            logger.info(f"Loaded topic model: {self.n_docs} documents")
+            return True
+        
+        except Exception as e:
+            logger.error(f"Failed to load topic model: {e}")
+            return False
+    
+    def _collect_terms(self, texts: List[Union[str, List[str]]]) -> Dict[int, str]:
+        """Новые термы батча, отсутствующие в обратном словаре."""
+        terms = set()
+        for text in texts:
+            terms.update(self.analyzer(text))
+        
+        terms = sorted(terms)
+        buckets = term_buckets(self.vectorizer, terms)
+        
+        return {
+            int(bucket): term
+            for bucket, term in zip(buckets, terms)
+            if int(bucket) not in self.vocabulary
+        }
+    
+    @staticmethod
+    def _compute_topic_words(lda: LatentDirichletAllocation, vocabulary: Dict[int, str],
+                             words_per_topic: int = 20) -> List[List[Dict[str, Any]]]:
+        """Топ-слова каждой темы (пересчитываются после обучения, не на запрос)."""
+        if not hasattr(lda, 'components_'):
+            return []
+        
+        components = lda.components_
+        topics = []
+        
+        for topic in components:
+            # Берем с запасом: часть корзин может не иметь терма в словаре
+            candidates = np.argpartition(-topic, words_per_topic * 2)[:words_per_topic * 2]
+            candidates = candidates[np.argsort(-topic[candidates])]
+            
+            words = [
+                {
+                    'word': vocabulary[int(i)],
+                    'weight': float(topic[i]),
+                }
+                for i in candidates
+                if int(i) in vocabulary
+            ]
+            topics.append(words[:words_per_topic])
+        
+        return topics
+    
+    def _ensure_worker(self) -> None:
+        """Ленивый запуск фонового потока (в том числе после fork)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            
+            self._thread = threading.Thread(
+                target=self._worker_loop,
+                name='topic-model-trainer',
+                daemon=True,
+            )
+            self._thread.start()
+    
+    def _worker_loop(self) -> None:
+        """Фоновое обучение: батчи из очереди -> partial_fit -> чекпоинт; задачи - по мере поступления."""
+        while True:
+            batch = []
+            item = self._queue.get()
+            
+            while True:
+                if callable(item):
+                    self._run_task(item)
+                else:
+                    batch.append(item)
+                
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=1.0)
+                except queue.Empty:
+                    break
+            
+            if not batch:
+                continue
+            
+            try:
+                self.partial_fit(batch)
+                self._batches_since_checkpoint += 1
+                
+                if self._batches_since_checkpoint >= self.checkpoint_every:
+                    self._batches_since_checkpoint = 0
+                    self.save()
+            
+            except Exception as e:
+                logger.error(f"Topic model update failed: {e}")
+    
+    @staticmethod
+    def _run_task(task: Callable[[], Any]) -> None:
+        try:
+            task()
+        except Exception as e:
+            logger.error(f"Background task failed: {e}")
@@ -1,9 +1,20 @@
+import os
+
 from celery_app import app
 
+# Очереди и параллелизм пула: например WORKER_QUEUES=semantic WORKER_CONCURRENCY=2
+# для отдельного пула семантического анализа (по умолчанию - все очереди)
+WORKER_QUEUES = os.getenv('WORKER_QUEUES')
+WORKER_CONCURRENCY = os.getenv('WORKER_CONCURRENCY', '4')
+
 if __name__ == '__main__':
-    app.worker_main([
+    argv = [
         'worker',
         '--loglevel=info',
-        '--concurrency=4',
+        f'--concurrency={WORKER_CONCURRENCY}',
         '--max-tasks-per-child=100'
-    ])
+    ]
+    if WORKER_QUEUES:
+        argv.append(f'--queues={WORKER_QUEUES}')
+    
+    app.worker_main(argv)